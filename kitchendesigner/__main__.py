@@ -2,13 +2,47 @@ import process_args
 import load_input
 import find_solution
 import produce_output
+import batch
+import bench
+import service
+import result_cache
+import contextlib
+import sys
 
 def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch.run(process_args.process_batch(sys.argv[2:]))
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        service.serve(process_args.process_serve(sys.argv[2:]))
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        bench.run(process_args.process_bench(sys.argv[2:]))
+        return
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'cache':
+        result_cache.show(process_args.process_cache(sys.argv[2:]))
+        return
+
     args = process_args.process()
     kitchen = load_input.load(args.input)
-    find_solution.solve(kitchen, args)
-    produce_output.write(kitchen, args.output)
-    produce_output.draw(kitchen)
+
+    # the incumbents streamed to stdout stay parseable, the log of the solve (including the solver's) goes to stderr
+    with contextlib.redirect_stdout(sys.stderr if args.incumbents == '-' else sys.stdout):
+        designs = find_solution.solve(kitchen, args)
+
+    if args.solutions > 1:
+        produce_output.write_designs(designs, args.output)
+    else:
+        produce_output.write(kitchen, args.output)
+
+    if args.svg is not None:
+        produce_output.write_svg(kitchen, args.svg)
+
+    if args.draw:
+        produce_output.draw(kitchen)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,120 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from process_args import Args, BatchArgs
+from typing import Iterator
+import csv
+import os
+import pathlib
+import sys
+import traceback
+import find_solution
+import load_input
+import produce_output
+
+
+@dataclass
+class JobResult:
+    """row of the summary table"""
+    input: str
+    status: str
+    objective: float | None
+    gap: float | None
+    build_seconds: float
+    solve_seconds: float
+
+
+def run(args: BatchArgs) -> list[JobResult]:
+    """solves all the inputs in a process pool, writes the outputs, the solver logs and the summary to args.output \n
+    every job has its own time limit and uses args.threads solver threads, so by default the jobs fill all the cores"""
+    inputs = get_inputs(args.source)
+    output_dir = pathlib.Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    jobs = args.jobs if args.jobs is not None else max(1, (os.cpu_count() or 1) // args.threads)
+    job_args = [Args(input_file, str(output_dir / (pathlib.Path(input_file).stem + '.json')), args.solver, None, False,
+                     time_limit=args.time_limit, gap=args.gap, engine=args.engine, threads=args.threads,
+                     cache=args.cache, cache_size=args.cache_size)
+                for input_file in inputs]
+    print(f'solving {len(inputs)} kitchens, {jobs} at once with {args.threads} solver threads each')
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(solve_job, job_args))
+
+    write_summary(results, args.summary if args.summary is not None else str(output_dir / 'summary.csv'))
+    print_summary(results)
+    return results
+
+
+def get_inputs(source: str) -> list[str]:
+    """input files in the directory (sorted by name) or listed in the manifest (paths relative to the manifest) \n
+    empty lines and lines starting with # are skipped in the manifest"""
+    path = pathlib.Path(source)
+
+    if path.is_dir():
+        return [str(input_file) for input_file in sorted(path.glob('*.json'))]
+
+    with open(path) as manifest:
+        lines = [line.strip() for line in manifest]
+
+    return [str(path.parent / line) for line in lines if line != '' and not line.startswith('#')]
+
+
+def solve_job(args: Args) -> JobResult:
+    """solves one kitchen (in a worker process), the solver output goes to a log file next to the output"""
+    report = find_solution.SolveReport()
+
+    with open(pathlib.Path(args.output).with_suffix('.log'), 'w') as log_file, redirect_output(log_file.fileno()):
+        try:
+            kitchen = load_input.load(args.input)
+            find_solution.solve(kitchen, args, report)
+
+            if report.objective is not None:
+                produce_output.write(kitchen, args.output)
+        except Exception as error:
+            traceback.print_exc()
+            report.status = 'error: ' + str(error).splitlines()[0]
+
+    return JobResult(args.input, report.status, report.objective, report.gap, report.build_seconds, report.solve_seconds)
+
+
+@contextmanager
+def redirect_output(file_descriptor: int) -> Iterator[None]:
+    """redirects stdout and stderr on the file descriptor level, so the output of the solver libraries is captured too"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = [os.dup(1), os.dup(2)]
+    os.dup2(file_descriptor, 1)
+    os.dup2(file_descriptor, 2)
+
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        os.close(saved[0])
+        os.close(saved[1])
+
+
+def write_summary(results: list[JobResult], file_name: str) -> None:
+    with open(file_name, 'w', newline='') as summary_file:
+        writer = csv.writer(summary_file)
+        writer.writerow([field.name for field in fields(JobResult)])
+
+        for result in results:
+            writer.writerow([result.input, result.status, result.objective, result.gap,
+                             round(result.build_seconds, 3), round(result.solve_seconds, 3)])
+
+
+def print_summary(results: list[JobResult]) -> None:
+    def format_number(value: float | None, digits: int) -> str:
+        return '-' if value is None else f'{value:.{digits}f}'
+
+    rows = [[field.name for field in fields(JobResult)]]
+    rows += [[result.input, result.status, format_number(result.objective, 2), format_number(result.gap, 4),
+              format_number(result.build_seconds, 2), format_number(result.solve_seconds, 2)] for result in results]
+    column_widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, column_widths)))
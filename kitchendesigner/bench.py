@@ -0,0 +1,247 @@
+from dataclasses import dataclass, asdict, fields
+from multiprocessing.connection import Connection
+from process_args import Args, BenchArgs
+from typing import Any
+import csv
+import json
+import multiprocessing
+import os
+import pathlib
+import resource
+import time
+import batch
+import find_solution
+import load_input
+import model_structure
+import pyomo.environ as pyo
+
+# differences smaller than these are measurement noise, not regressions
+MIN_TIME_DIFFERENCE = 0.5
+MIN_MEMORY_DIFFERENCE = 20
+GAP_TOLERANCE = 1e-4
+OBJECTIVE_TOLERANCE = 1e-6
+
+
+@dataclass
+class BenchRun:
+    """measurements of one kitchen solved by one solver (the memory is the peak RSS in MB) \n
+    the build of the gurobipy backend includes passing the rows to gurobi, which the pyomo backend does in the solve, \n
+    so the backends are compared by the sums of the times"""
+    input: str
+    solver: str
+    status: str
+    zone_clustering: str = 'center'
+    backend: str = 'pyomo'
+    build_seconds: float | None = None
+    solve_seconds: float | None = None
+    variables: int | None = None
+    constraints: int | None = None
+    nonzeros: int | None = None
+    objective: float | None = None
+    bound: float | None = None
+    gap: float | None = None
+    peak_rss: float | None = None
+
+
+def run(args: BenchArgs) -> None:
+    """solves every input by every solver (each run in a new process, one at a time, so the times are comparable) \n
+    writes the JSON report and the CSV table, exits with 1 if there are regressions against the baseline"""
+    inputs = get_bench_inputs(args.sources)
+    solvers = args.solvers if args.solvers is not None else get_available_solvers()
+    zone_clusterings = args.zone_clusterings if args.zone_clusterings is not None else ['center']
+    backends = args.backends if args.backends is not None else ['pyomo']
+    runs = []
+
+    for input_file in inputs:
+        for solver in solvers:
+            for zone_clustering in zone_clusterings:
+                for backend in backends:
+                    if backend == 'gurobipy' and solver != 'gurobi_direct':
+                        # the gurobipy backend always solves by gurobi
+                        continue
+
+                    bench_run = measure(input_file, solver, args.time_limit, zone_clustering, backend)
+                    print(f'{get_run_name(bench_run)}: {bench_run.status}, build {format_value(bench_run.build_seconds)} s, '
+                          f'solve {format_value(bench_run.solve_seconds)} s, objective {format_value(bench_run.objective)}')
+                    runs.append(bench_run)
+
+    reference = (zone_clusterings[0], backends[0])
+    savings = get_savings(runs, reference)
+
+    for saving in savings:
+        print(f'{saving["input"]} {saving["solver"]}: {get_variant_name(saving["zone_clustering"], saving["backend"])} saves '
+              f'{format_value(saving["build_seconds"])} s of the build and {format_value(saving["solve_seconds"])} s of the solve '
+              f'against {get_variant_name(*reference)}')
+
+    write_report(runs, savings, args)
+
+    if args.baseline is not None:
+        regressions = compare(runs, load_report(args.baseline), args.threshold)
+
+        for regression in regressions:
+            print(f'regression: {regression}')
+
+        print(f'{len(regressions)} regressions against {args.baseline}')
+
+        if len(regressions) > 0:
+            raise SystemExit(1)
+
+
+def get_bench_inputs(sources: list[str]) -> list[str]:
+    """input files of the sources (input files, directories or manifests), data_input if there are no sources"""
+    if len(sources) == 0:
+        sources = [str(pathlib.Path(__file__).parent.parent / 'data_input')]
+
+    return [input_file for source in sources
+            for input_file in ([source] if source.endswith('.json') else batch.get_inputs(source))]
+
+
+def get_available_solvers() -> list[str]:
+    return [solver for solver in find_solution.SUPPORTED_SOLVERS if pyo.SolverFactory(solver).available(exception_flag=False)]
+
+
+def measure(input_file: str, solver: str, time_limit: float | None, zone_clustering: str = 'center', backend: str = 'pyomo') -> BenchRun:
+    """solves the kitchen in a new process (its peak RSS belongs to this run only)"""
+    connection, worker_connection = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=measure_worker,
+                                      args=(worker_connection, input_file, solver, time_limit, zone_clustering, backend))
+    process.start()
+    worker_connection.close()
+
+    try:
+        bench_run: BenchRun = connection.recv()
+    except EOFError:
+        bench_run = BenchRun(input_file, solver, 'error: the process failed', zone_clustering, backend)
+
+    process.join()
+    return bench_run
+
+
+def measure_worker(connection: Connection, input_file: str, solver: str, time_limit: float | None, zone_clustering: str,
+                   backend: str) -> None:
+    bench_run = BenchRun(input_file, solver, 'not solved', zone_clustering, backend)
+
+    # the solver log is not needed
+    with open(os.devnull, 'w') as devnull, batch.redirect_output(devnull.fileno()):
+        try:
+            args = Args(input_file, '', solver, None, False, time_limit=time_limit, zone_clustering=zone_clustering, backend=backend)
+            kitchen = load_input.load(input_file)
+
+            if backend == 'gurobipy':
+                start = time.perf_counter()
+                _, gurobi_model = find_solution.build_gurobi_model(kitchen, args)
+                bench_run.variables, bench_run.constraints, bench_run.nonzeros = gurobi_model.get_model_size()
+                bench_run.build_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                bench_run.status, bench_run.objective, bench_run.bound = gurobi_model.solve(
+                    find_solution.get_solver_options('gurobi_direct', args), False)
+                bench_run.solve_seconds = time.perf_counter() - start
+            else:
+                start = time.perf_counter()
+                model = find_solution.build_model(kitchen, args)
+                bench_run.build_seconds = time.perf_counter() - start
+                bench_run.variables, bench_run.constraints, bench_run.nonzeros = model_structure.get_model_size(model)
+                start = time.perf_counter()
+                results = find_solution.find_model(model, args)
+                bench_run.solve_seconds = time.perf_counter() - start
+                bench_run.status = str(results.solver.termination_condition)
+
+                if find_solution.has_solution(results):
+                    bench_run.objective = pyo.value(model.fitness, exception=False)
+                    bench_run.bound = results.problem.upper_bound
+
+            if bench_run.objective is not None:
+                bench_run.gap = find_solution.get_gap(bench_run.bound, bench_run.objective)
+        except Exception as error:
+            bench_run.status = 'error: ' + str(error).splitlines()[0]
+
+    # ru_maxrss is in kB on Linux
+    bench_run.peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    connection.send(bench_run)
+
+
+def get_savings(runs: list[BenchRun], reference: tuple[str, str]) -> list[dict[str, Any]]:
+    """build and solve seconds saved by every other zone clustering and backend against the reference (zone clustering, backend) \n
+    (negative if it is slower), the objectives of the clusterings differ, so only the times are compared"""
+    reference_runs = {(bench_run.input, bench_run.solver): bench_run for bench_run in runs
+                      if (bench_run.zone_clustering, bench_run.backend) == reference}
+    savings = []
+
+    def get_saving(value: float | None, reference_value: float | None) -> float | None:
+        return reference_value - value if value is not None and reference_value is not None else None
+
+    for bench_run in runs:
+        reference_run = reference_runs.get((bench_run.input, bench_run.solver))
+
+        if reference_run is not None and (bench_run.zone_clustering, bench_run.backend) != reference:
+            savings.append({'input': bench_run.input, 'solver': bench_run.solver, 'zone_clustering': bench_run.zone_clustering,
+                            'backend': bench_run.backend,
+                            'build_seconds': get_saving(bench_run.build_seconds, reference_run.build_seconds),
+                            'solve_seconds': get_saving(bench_run.solve_seconds, reference_run.solve_seconds)})
+
+    return savings
+
+
+def write_report(runs: list[BenchRun], savings: list[dict[str, Any]], args: BenchArgs) -> None:
+    with open(args.report, 'w') as report_file:
+        json.dump({'time_limit': args.time_limit, 'runs': [asdict(bench_run) for bench_run in runs], 'savings': savings},
+                  report_file, indent=4)
+
+    with open(pathlib.Path(args.report).with_suffix('.csv'), 'w', newline='') as table_file:
+        writer = csv.writer(table_file)
+        writer.writerow([field.name for field in fields(BenchRun)])
+
+        for bench_run in runs:
+            writer.writerow(asdict(bench_run).values())
+
+
+def load_report(file_name: str) -> list[BenchRun]:
+    with open(file_name) as report_file:
+        return [BenchRun(**bench_run) for bench_run in json.load(report_file)['runs']]
+
+
+def compare(runs: list[BenchRun], baseline: list[BenchRun], threshold: float) -> list[str]:
+    """descriptions of the regressions: slower build or solve, more memory, worse objective, bigger gap, lost solution \n
+    the times and the memory have to grow by more than the threshold (relative) and more than the noise"""
+    baseline_runs = {(bench_run.input, bench_run.solver, bench_run.zone_clustering, bench_run.backend): bench_run for bench_run in baseline}
+    regressions = []
+
+    def is_worse(value: float | None, old_value: float | None, min_difference: float) -> bool:
+        return (value is not None and old_value is not None
+                and value > old_value * (1 + threshold) and value - old_value > min_difference)
+
+    for bench_run in runs:
+        old_run = baseline_runs.get((bench_run.input, bench_run.solver, bench_run.zone_clustering, bench_run.backend))
+
+        if old_run is None:
+            continue
+
+        name = get_run_name(bench_run)
+
+        for metric, min_difference in [('build_seconds', MIN_TIME_DIFFERENCE), ('solve_seconds', MIN_TIME_DIFFERENCE),
+                                       ('peak_rss', MIN_MEMORY_DIFFERENCE), ('gap', GAP_TOLERANCE)]:
+            value, old_value = getattr(bench_run, metric), getattr(old_run, metric)
+
+            if is_worse(value, old_value, min_difference):
+                regressions.append(f'{name}: {metric} {format_value(old_value)} -> {format_value(value)}')
+
+        if old_run.objective is not None and bench_run.objective is None:
+            regressions.append(f'{name}: no solution ({bench_run.status}), the baseline found {format_value(old_run.objective)}')
+        elif (old_run.objective is not None and bench_run.objective is not None
+              and bench_run.objective < old_run.objective - OBJECTIVE_TOLERANCE * max(1, abs(old_run.objective))):
+            regressions.append(f'{name}: objective {format_value(old_run.objective)} -> {format_value(bench_run.objective)}')
+
+    return regressions
+
+
+def get_run_name(bench_run: BenchRun) -> str:
+    variant = get_variant_name(bench_run.zone_clustering, bench_run.backend)
+    return f'{bench_run.input} {bench_run.solver}' + (f' {variant}' if variant != 'center' else '')
+
+
+def get_variant_name(zone_clustering: str, backend: str) -> str:
+    return zone_clustering if backend == 'pyomo' else f'{zone_clustering} {backend}'
+
+
+def format_value(value: float | None) -> str:
+    return '-' if value is None else f'{value:.4g}'
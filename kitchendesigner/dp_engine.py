@@ -0,0 +1,290 @@
+from kitchen import *
+from presolve import get_fixture_classes
+from utility_functions import attr_matches, fixture_fits_part, get_sin_cos, round_width
+import math
+
+# the widths and positions are multiples of the grid, but they are compared as floats
+EPSILON = 1e-9
+
+# state of the dynamic programming after some fixtures were placed:
+# (position, last width, penultimate width, used fixtures of each class, satisfied requirements, worktop phase, last fixture allows edge)
+# the position and the widths are in grid steps
+State = tuple[int, int, int, tuple[int, ...], int, int, bool]
+
+# the widest worktop is one of the worktops, it is chosen while the fixtures are placed (see get_worktop_phases)
+WORKTOP_BEFORE = 0
+WORKTOP_INSIDE = 1
+WORKTOP_AFTER = 2
+
+
+def get_unsupported_feature(kitchen: Kitchen) -> str | None:
+    """the dynamic programming solves kitchens with one bottom part (an I-shaped kitchen without the top row) \n
+    returns the first feature it cannot handle (they are not separable along the part), None if the kitchen is supported"""
+    if len(kitchen.parts) != 1 or kitchen.parts[0].is_top:
+        return 'kitchen parts other than one bottom part'
+    elif any(zone.is_optimized and any(fixture.zone == zone.name for fixture in kitchen.fixtures) for zone in kitchen.zones):
+        return 'optimized zones'
+    elif len(kitchen.relation_rules.min_distances) > 0:
+        return 'min distance rules'
+    elif len(kitchen.relation_rules.min_worktops) > 0:
+        return 'min worktop rules'
+    elif kitchen.preferences.worktop < 0:
+        return 'negative worktop preference'
+    elif len(kitchen.preferences.tiers) > 0:
+        return 'objective tiers'
+    else:
+        return None
+
+
+def solve(kitchen: Kitchen, grid: float) -> float | None:
+    """finds the best layout whose widths and padding are multiples of the grid and saves it to the kitchen \n
+    the layout is scored the same way as in set_objective, returns its score (None if there is no layout on the grid) \n
+    the fixtures are placed left to right, interchangeable fixtures are counted instead of being told apart"""
+    part = kitchen.parts[0]
+    constants = kitchen.constants
+    preferences = kitchen.preferences
+    group = part.position.group_number
+    group_offset = part.position.group_offset
+    slot_count = len(part.segments)
+    position_count = math.floor(part.width/grid + EPSILON)
+
+    # tall fixtures need a top part and corner fixtures need a corner, so they are never used
+    classes = [fixtures for fixtures in get_fixture_classes(kitchen)
+               if fixture_fits_part(fixtures[0], part, kitchen.placement_rules, kitchen.corners)]
+    class_widths = [get_grid_widths(kitchen, fixtures[0], part, grid) for fixtures in classes]
+    class_scores = [get_fixture_base_score(kitchen, fixtures[0]) for fixtures in classes]
+
+    include_rules = [rule for rule in kitchen.placement_rules if rule.type == 'include']
+    one_wide_types = list(kitchen.relation_rules.one_wide)
+    all_requirements = (1 << (len(include_rules) + len(one_wide_types))) - 1
+
+    def get_requirements(fixture: Fixture, left: float, width: float) -> int:
+        """requirements (include rules, one_wide rules) satisfied by the fixture"""
+        requirements = 0
+
+        for index, rule in enumerate(include_rules):
+            if not attr_matches(rule, fixture) or (rule.area != 'kitchen' and rule.group != group):
+                continue
+
+            if rule.area != 'group_section' or (left >= rule.section_offset - EPSILON
+                                                and left + width <= rule.section_offset + rule.section_width + EPSILON):
+                requirements |= 1 << index
+
+        for index, fixture_type in enumerate(one_wide_types):
+            if fixture.type == fixture_type and width >= kitchen.relation_rules.one_wide[fixture_type] - EPSILON:
+                requirements |= 1 << (len(include_rules) + index)
+
+        return requirements
+
+    pattern_scores: dict[tuple[bool, int, int, int], float] = {}
+
+    def get_pattern_score(index: int, width: int, last_width: int, penult_width: int) -> float:
+        """score of the width pattern rules of the segment with the index (the widths are in grid steps)"""
+        if index == 0:
+            return 0
+
+        key = (index >= 2, width, last_width, penult_width)
+
+        if key not in pattern_scores:
+            pattern_scores[key] = get_indicator_score(index, abs(width - last_width)*grid, abs(width - penult_width)*grid)
+
+        return pattern_scores[key]
+
+    def get_indicator_score(index: int, difference: float, penult_difference: float) -> float:
+        """see is_previous_width_not_same and is_aba_pattern \n
+        the indicators are chosen the same way as by the solver: freely when the difference equals the tolerance"""
+        def options(value: float, tolerance: float) -> list[int]:
+            """values of the indicator (value >= tolerance)"""
+            return [indicator for indicator, possible in [(0, value <= tolerance + EPSILON), (1, value >= tolerance - EPSILON)] if possible]
+
+        # the ABA pattern needs two previous segments
+        similar_options = ([1-indicator for indicator in options(penult_difference, constants.width_penult_similar_tolerance)]
+                           if index >= 2 else [0])
+        return max(-10*not_same + 10*(similar*really_different)
+                   for not_same in options(difference, constants.width_same_tolerance)
+                   for really_different in options(difference, constants.width_different_tolerance) if really_different <= not_same
+                   for similar in similar_options)
+
+    placements: dict[tuple[int, int, int], tuple[float, int, bool] | None] = {}
+
+    def get_placement(class_index: int, position: int, width: int) -> tuple[float, int, bool] | None:
+        """score and satisfied requirements of the fixture placed at the position, None if a section excludes it"""
+        key = (class_index, position, width)
+
+        if key not in placements:
+            fixture = classes[class_index][0]
+            left = group_offset + position*grid
+            placements[key] = (None if is_excluded(kitchen, fixture, group, left, width*grid) else
+                               (class_scores[class_index] + get_position_score(kitchen, fixture, part, position*grid, width*grid),
+                                get_requirements(fixture, left, width*grid), fixture.has_worktop))
+
+        return placements[key]
+
+    # the padding matters only if the score or the rules depend on the positions of the fixtures
+    paddings = range(position_count + 1) if has_position_terms(kitchen, [fixtures[0] for fixtures in classes]) else range(1)
+    initial_counts = tuple(0 for _ in classes)
+    # layers[k] holds the states after k fixtures: score, previous state, class and width of the last fixture
+    layers: list[dict[State, tuple[float, State | None, int, int]]] = [
+        {(padding, 0, 0, initial_counts, 0, WORKTOP_BEFORE, True): (0, None, -1, 0) for padding in paddings}]
+
+    for index in range(slot_count):
+        layer: dict[State, tuple[float, State | None, int, int]] = {}
+
+        for state, (score, _, _, _) in layers[-1].items():
+            position, last_width, penult_width, counts, requirements, phase, _ = state
+
+            for class_index, fixtures in enumerate(classes):
+                fixture = fixtures[0]
+
+                if counts[class_index] == len(fixtures):
+                    continue
+
+                if not fixture.allow_edge and ((index == 0 and part.edge_left) or (index == slot_count - 1 and part.edge_right)):
+                    continue
+
+                new_counts = counts[:class_index] + (counts[class_index] + 1,) + counts[class_index+1:]
+
+                for width in class_widths[class_index]:
+                    if position + width > position_count:
+                        break
+
+                    placement = get_placement(class_index, position, width)
+
+                    if placement is None:
+                        continue
+
+                    fixture_score, fixture_requirements, has_worktop = placement
+                    new_score = (score + fixture_score + 5*width*grid
+                                 + get_pattern_score(index, width, last_width, penult_width))
+
+                    for new_phase, worktop_score in get_worktop_phases(phase, has_worktop, preferences.worktop*width*grid):
+                        new_state = (position + width, width, last_width, new_counts, requirements | fixture_requirements,
+                                     new_phase, fixture.allow_edge)
+
+                        if new_state not in layer or layer[new_state][0] < new_score + worktop_score:
+                            layer[new_state] = (new_score + worktop_score, state, class_index, width)
+
+        layers.append(layer)
+
+    best: tuple[float, int, State] | None = None
+
+    for index, layer in enumerate(layers):
+        for state, (score, _, _, _) in layer.items():
+            if state[4] != all_requirements or (part.edge_right and index > 0 and not state[6]):
+                continue
+
+            if best is None or score > best[0]:
+                best = (score, index, state)
+
+    print(f'dynamic programming: {sum(len(layer) for layer in layers)} states')
+
+    if best is None:
+        return None
+
+    # the layout is reconstructed from the last fixture
+    score, index, last_state = best
+    chosen: list[tuple[int, int]] = []
+    current: State | None = last_state
+
+    while index > 0 and current is not None:
+        _, previous, class_index, width = layers[index][current]
+        chosen.append((class_index, width))
+        current = previous
+        index -= 1
+
+    assert current is not None
+    save_layout(kitchen, classes, current[0]*grid, [(class_index, width*grid) for class_index, width in reversed(chosen)])
+    return score - 5*part.width
+
+
+def has_position_terms(kitchen: Kitchen, fixtures: list[Fixture]) -> bool:
+    """some of the fixtures have a target, a wall distance or a section rule"""
+    group = kitchen.parts[0].position.group_number
+    return any(fixture.type in kitchen.relation_rules.targets
+               or (group in kitchen.walls and fixture.type in kitchen.relation_rules.wall_distances)
+               or any(rule.area == 'group_section' and attr_matches(rule, fixture) for rule in kitchen.placement_rules)
+               for fixture in fixtures)
+
+
+def get_grid_widths(kitchen: Kitchen, fixture: Fixture, part: KitchenPart, grid: float) -> list[int]:
+    """widths of the fixture (in grid steps) allowed by the width rules and its width step"""
+    low = max(fixture.width_min, kitchen.constants.min_fixture_width)
+    high = min(fixture.width_max, kitchen.constants.max_fixture_width, part.width)
+    return [width for width in range(max(1, math.ceil(low/grid - EPSILON)), math.floor(high/grid + EPSILON) + 1)
+            if abs(round_width(fixture, width*grid) - width*grid) < EPSILON]
+
+
+def get_fixture_base_score(kitchen: Kitchen, fixture: Fixture) -> float:
+    """score of the present fixture which does not depend on its position (present, storage and worktop terms)"""
+    score = 10.0
+
+    if fixture.storage > 0:
+        score += fixture.storage * 2 * kitchen.preferences.storage
+
+    if fixture.has_worktop:
+        score += kitchen.preferences.worktop
+
+    return score
+
+
+def get_position_score(kitchen: Kitchen, fixture: Fixture, part: KitchenPart, start: float, width: float) -> float:
+    """target distance and wall terms of the fixture which starts at the start (relative to the part)"""
+    score = 0.0
+
+    if fixture.type in kitchen.relation_rules.targets:
+        sin_alpha, cos_alpha = get_sin_cos(part.position.angle)
+        horizontal = start + width/2
+        vertical = part.depth/2
+        x = part.position.x + horizontal * cos_alpha - vertical * sin_alpha
+        y = part.position.y + horizontal * sin_alpha + vertical * cos_alpha
+        target_x, target_y = kitchen.relation_rules.targets[fixture.type]
+        score -= abs(x - target_x) + abs(y - target_y)
+
+    group = part.position.group_number
+
+    if group in kitchen.walls and fixture.type in kitchen.relation_rules.wall_distances:
+        distance = kitchen.relation_rules.wall_distances[fixture.type]
+        left = part.position.group_offset + start
+
+        if kitchen.walls[group].left + distance > left + EPSILON or left + width + distance > kitchen.walls[group].right + EPSILON:
+            score -= 10
+
+    return score
+
+
+def is_excluded(kitchen: Kitchen, fixture: Fixture, group: int, left: float, width: float) -> bool:
+    """the fixture overlaps a section from which it is excluded (left is relative to the group)"""
+    return any(rule.type == 'exclude' and rule.area == 'group_section' and rule.group == group and attr_matches(rule, fixture)
+               and left + width > rule.section_offset + EPSILON and left < rule.section_offset + rule.section_width - EPSILON
+               for rule in kitchen.placement_rules)
+
+
+def get_worktop_phases(phase: int, has_worktop: bool, worktop_score: float) -> list[tuple[int, float]]:
+    """the widest worktop is counted as one chosen run of fixtures with worktop (a run can start at any of them) \n
+    the best layout chooses the widest run, so this is exact for non-negative worktop preference"""
+    if worktop_score == 0:
+        return [(phase, 0)]
+    elif not has_worktop:
+        return [(WORKTOP_AFTER if phase == WORKTOP_INSIDE else phase, 0)]
+    elif phase == WORKTOP_BEFORE:
+        return [(WORKTOP_BEFORE, 0), (WORKTOP_INSIDE, worktop_score)]
+    elif phase == WORKTOP_INSIDE:
+        return [(WORKTOP_INSIDE, worktop_score)]
+    else:
+        return [(WORKTOP_AFTER, 0)]
+
+
+def save_layout(kitchen: Kitchen, classes: list[list[Fixture]], padding: float, chosen: list[tuple[int, float]]) -> None:
+    """stores the layout (classes and widths of the fixtures from left to right) the same way as save_result"""
+    part = kitchen.parts[0]
+    part.position.padding = padding
+    used = [0 for _ in classes]
+
+    for segment in part.segments:
+        segment.fixture = None
+        segment.width = 0
+
+    for segment, (class_index, width) in zip(part.segments, chosen):
+        segment.fixture = classes[class_index][used[class_index]]
+        segment.width = width
+        used[class_index] += 1
@@ -1,35 +1,258 @@
 from kitchen import *
-from typing import Any, Iterable
-from utility_functions import attr_matches
+from typing import Any, Callable, Iterable
+from utility_functions import WIDTH_STEP_EPSILON, attr_matches, fixture_fits_segment, get_sin_cos, get_width_grid
+from presolve import get_bounds, get_continuity_ms, get_indicator_m, get_interchangeable_fixtures
 from process_args import Args
+from dataclasses import dataclass
+import dataclasses
+import dp_engine
+import heuristic
+import incremental
 import model_structure
+import load_input
+import produce_output
+import result_cache
 import pyomo.environ as pyo
 import math
+import time
+
+SUPPORTED_SOLVERS = ['glpk', 'cbc', 'gurobi_direct']
+# part of the result cache key, it has to be changed whenever a change of the model or the objective changes the results
+MODEL_VERSION = 2
+# part of the time limit left to the joint polish after the groups are solved separately (if --polish is not given)
+GROUP_POLISH_SHARE = 0.25
+# reward of two neighbouring fixtures of the same zone (see get_zone_adjacency), about the distance from the zone center it saves
+ZONE_ADJACENCY_REWARD = 30
+# a solved objective tier may lose at least this (relative) part of its value, so that its own design stays feasible despite rounding
+TIER_TOLERANCE = 1e-6
+# some solutions differ only in continuous variables or fixture copies, so the number of re-solves is limited by a multiple of the requested designs
+CANDIDATE_SOLUTIONS_MULTIPLIER = 5
+
+
+class NoSolutionError(Exception):
+    """the solver found no design (the kitchen is infeasible or the solve stopped at a limit before finding one)"""
+
+
+@dataclass
+class SolveReport:
+    """statistics of one solve (filled in by solve), the gap is relative to the objective"""
+    status: str = 'not solved'
+    objective: float | None = None
+    gap: float | None = None
+    build_seconds: float = 0
+    solve_seconds: float = 0
+
+
+def solve(kitchen: Kitchen, args: Args, report: SolveReport | None = None) -> list[dict[str, Any]]:
+    """finds the best design (or args.solutions best distinct designs) \n
+    the designs are returned in the output format, the best one is also saved to the kitchen \n
+    the status, the objective and the times are stored to the report (if given) \n
+    with args.cache, the designs of a kitchen which was already solved with the same settings are taken from the cache"""
+    if report is None:
+        report = SolveReport()
+
+    if args.cache is None or kitchen.source is None:
+        return solve_kitchen(kitchen, args, report)
+
+    with result_cache.ResultCache(args.cache, args.cache_size * 1e6) as cache:
+        key = result_cache.get_key(kitchen.source, get_cache_settings(kitchen, args))
+        cached = cache.get(key)
+
+        if cached is not None:
+            print('the result was found in the cache')
+            report.status, report.objective, report.gap = cached['status'], cached['objective'], cached['gap']
+            load_input.load_solution(kitchen, cached['designs'][0])
+
+            if args.incumbents is not None:
+                produce_output.clear_stream(args.incumbents)
+                produce_output.stream(kitchen, args.incumbents)
+
+            return list(cached['designs'])
+
+        designs = solve_kitchen(kitchen, args, report)
+
+        # a result found before the time limit could be improved by a longer solve, so it is not stored
+        if len(designs) > 0 and (report.status == 'optimal' or (args.solutions > 1 and args.time_limit is None)):
+            cache.put(key, {'designs': designs, 'status': report.status, 'objective': report.objective, 'gap': report.gap})
+
+        return designs
+
+
+def get_cache_settings(kitchen: Kitchen, args: Args) -> dict[str, Any]:
+    """everything except the input document which changes the result (the preferences might be changed after loading) \n
+    the time limit is left out, only the results which do not depend on it are stored"""
+    solver = get_solver_name(args)
+    options = get_solver_options(solver, dataclasses.replace(args, time_limit=None))
+    return {'version': MODEL_VERSION, 'solver': solver, 'options': options, 'engine': args.engine,
+            'grid': args.grid if args.engine == 'dp' else None, 'solutions': args.solutions,
+            'symmetry_breaking': args.symmetry_breaking, 'greedy_start': args.greedy_start, 'backend': args.backend,
+            'decompose': args.decompose, 'decompose_groups': args.decompose_groups, 'polish': args.polish,
+            'zone_clustering': args.zone_clustering,
+            'preferences': {'storage': kitchen.preferences.storage, 'worktop': kitchen.preferences.worktop,
+                            'tiers': [dataclasses.asdict(tier) for tier in kitchen.preferences.tiers]},
+            # the fixed parts (see set_previous) depend on the previous design and its input
+            'previous': ([load_input.load_output(args.previous), load_input.load_data_from_files(args.fix_unchanged)]
+                         if args.previous is not None and args.fix_unchanged is not None else None)}
+
+
+def solve_kitchen(kitchen: Kitchen, args: Args, report: SolveReport) -> list[dict[str, Any]]:
+    """solve without the cache"""
+    start = time.perf_counter()
+
+    if args.engine == 'dp':
+        score = solve_dp(kitchen, args)
+
+        if score is not None:
+            report.status, report.objective, report.gap = 'optimal', score, 0
+            report.solve_seconds = time.perf_counter() - start
+            return [produce_output.get_output(kitchen)]
+
+    # the merged design of the groups solved separately is polished by solving the whole model from it
+    groups_start = time.perf_counter()
+    merged = (args.decompose_groups and args.solutions == 1
+              and solve_groups(kitchen, dataclasses.replace(args, time_limit=get_groups_time_limit(args))))
+    groups_seconds = time.perf_counter() - groups_start
+    remaining = max(0, args.time_limit - groups_seconds) if args.time_limit is not None else None
+
+    if merged:
+        # the polish ends at the time limit, it is not limited if there is neither the limit nor args.polish
+        limits = [limit for limit in [args.polish, remaining] if limit is not None]
+        args = dataclasses.replace(args, time_limit=min(limits) if len(limits) > 0 else None, decompose=False)
+    elif args.decompose_groups:
+        args = dataclasses.replace(args, time_limit=remaining)
+
+    gurobi_model = None
+
+    if args.backend == 'gurobipy' and args.solutions == 1 and not args.decompose:
+        model, gurobi_model = build_gurobi_model(kitchen, args)
+    else:
+        model = build_model(kitchen, args)
+
+    if merged:
+        set_start(kitchen, model)
+        # the current values of the variables are the MIP start (see use_warmstart)
+        args = dataclasses.replace(args, greedy_start=True)
+    elif args.previous is not None:
+        set_previous(kitchen, model, args)
+    elif args.greedy_start:
+        heuristic.build_layout(kitchen, list(model.fixture_order_pairs))
+        set_start(kitchen, model)
+
+    # solving the groups is a part of the solve
+    report.build_seconds = time.perf_counter() - start - groups_seconds
+    start = time.perf_counter() - groups_seconds
+
+    # gurobi completes a partial start itself and discards an infeasible one
+    if merged and gurobi_model is None:
+        args = complete_start(kitchen, model, args, 'merged design', keep_partial=True)
+    elif args.greedy_start and args.previous is None and gurobi_model is None:
+        # the greedy layout does not check min distances and vertical continuity
+        args = complete_start(kitchen, model, args, 'greedy layout', keep_partial=False)
+
+    if len(kitchen.preferences.tiers) > 0 and (args.solutions > 1 or args.decompose):
+        print('the objective tiers are used only for one design without --decompose, maximizing the weighted sum instead')
+
+    if args.solutions > 1:
+        designs = find_designs(kitchen, model, args)
+        report.solve_seconds = time.perf_counter() - start
+        report.status = f'{len(designs)} designs'
+
+        if len(designs) == 0:
+            raise NoSolutionError(f'no solution found ({report.status})')
+
+        return designs
+
+    if gurobi_model is not None:
+        if len(kitchen.preferences.tiers) > 0:
+            gurobi_model.set_tiers(get_tier_objectives(kitchen, gurobi_model))
+
+        report.status, objective, bound = gurobi_model.solve(get_solver_options('gurobi_direct', args), wants_warmstart(args),
+                                                             get_incumbent_writer(kitchen, model, args))
+        report.solve_seconds = time.perf_counter() - start
+
+        if args.model:
+            gurobi_model.write(args.model)
+    elif args.decompose:
+        results, is_bound_valid = find_model_decomposed(kitchen, model, args, get_incumbent_writer(kitchen, model, args))
+        report.solve_seconds = time.perf_counter() - start
+        report.status = str(results.solver.termination_condition)
+        # the bound of a stage with fixed parts does not hold for the whole model
+        bound = results.problem.upper_bound if is_bound_valid else None
+        objective = pyo.value(model.fitness, exception=False) if has_solution(results) else None
+    elif len(kitchen.preferences.tiers) > 0:
+        results = find_model_hierarchical(kitchen, model, args, get_incumbent_writer(kitchen, model, args))
+        report.solve_seconds = time.perf_counter() - start
+        report.status = str(results.solver.termination_condition)
+        # the bound of the last tier does not hold for the weighted sum
+        bound = None
+        objective = pyo.value(model.fitness, exception=False) if has_solution(results) else None
+    else:
+        results = find_model(model, args, get_incumbent_writer(kitchen, model, args))
+        report.solve_seconds = time.perf_counter() - start
+        report.status = str(results.solver.termination_condition)
+        bound = results.problem.upper_bound
+        # the solver can stop (e.g. at the time limit) before it finds any solution
+        objective = pyo.value(model.fitness, exception=False) if has_solution(results) else None
 
-SIN_COS_DECIMAL_PLACES = 5
+    if objective is None:
+        raise NoSolutionError(f'no solution found ({report.status})')
 
+    report.objective, report.gap = objective, get_gap(bound, objective)
 
-def solve(kitchen: Kitchen, args: Args) -> None:
-    model = KitchenModel(kitchen)
-    set_constraints(kitchen, model)
-    set_objective(model)
-    deactivate_components(model)
-    model_structure.print_structure(model, args)
-    find_model(model, args)
     save_result(kitchen, model)
+    return [produce_output.get_output(kitchen)]
 
 
-class KitchenModel(pyo.ConcreteModel):  # type: ignore[misc]
-    def __init__(model: pyo.ConcreteModel, kitchen: Kitchen) -> None:
-        max_fixture_width = kitchen.constants.max_fixture_width
-        max_canvas_size = kitchen.constants.max_canvas_size
-        max_segment_count = kitchen.constants.max_segment_count
+def get_groups_time_limit(args: Args) -> float | None:
+    """the time limit of solving the groups separately, the rest of args.time_limit is left to the joint polish"""
+    if args.time_limit is None:
+        return None
+    elif args.polish is not None:
+        return max(0, args.time_limit - args.polish)
+    else:
+        return args.time_limit * (1 - GROUP_POLISH_SHARE)
+
+
+def solve_groups(kitchen: Kitchen, args: Args) -> bool:
+    import group_decomposition
+    return group_decomposition.solve_groups(kitchen, args)
+
 
+def solve_dp(kitchen: Kitchen, args: Args) -> float | None:
+    """solves the kitchen by the dynamic programming engine, returns None if the MIP has to be used instead"""
+    unsupported_feature = dp_engine.get_unsupported_feature(kitchen)
+
+    if args.solutions > 1:
+        unsupported_feature = 'multiple designs'
+
+    if unsupported_feature is not None:
+        print(f'dynamic programming does not support {unsupported_feature}, using the MIP')
+        return None
+
+    score = dp_engine.solve(kitchen, args.grid)
+
+    if score is None:
+        print('dynamic programming found no layout on the grid, using the MIP')
+        return None
+
+    print(f'dynamic programming: objective {score}')
+
+    if args.incumbents is not None:
+        produce_output.clear_stream(args.incumbents)
+        produce_output.stream(kitchen, args.incumbents)
+
+    return score
+
+
+class KitchenModel(pyo.ConcreteModel):  # type: ignore[misc]
+    def __init__(model: pyo.ConcreteModel, kitchen: Kitchen, symmetry_breaking: bool = True,
+                 profiler: model_structure.BuildProfiler | None = None, zone_clustering: str = 'center') -> None:
         super().__init__()
+        model.profiler = profiler
 
-        # parameters
-        model.param_storage = pyo.Param(initialize=kitchen.preferences.storage)
-        model.param_worktop = pyo.Param(initialize=kitchen.preferences.worktop)
+        # parameters (mutable, so that the preferences can be changed without rebuilding the model)
+        model.param_storage = pyo.Param(initialize=kitchen.preferences.storage, mutable=True)
+        model.param_worktop = pyo.Param(initialize=kitchen.preferences.worktop, mutable=True)
 
         # sets
         model.fixtures: Iterable[Fixture] = pyo.Set(initialize=kitchen.fixtures)
@@ -39,100 +262,273 @@ class KitchenModel(pyo.ConcreteModel):  # type: ignore[misc]
         model.rules_all: Iterable[PlacementRule] = pyo.Set(initialize=kitchen.placement_rules)
         model.rules_section: Iterable[PlacementRule] = pyo.Set(
             initialize=model.rules_all, filter=lambda _, rule: rule.area == 'group_section')
-        model.zones: Iterable[str] = pyo.Set(initialize=[zone.name for zone in kitchen.zones if zone.is_optimized])
+        # the optimized zones by the way their fixtures are kept together (see get_zone_clustering)
+        clustering = get_zone_clustering(kitchen, zone_clustering)
+        model.zones: Iterable[str] = pyo.Set(initialize=[zone for zone, mode in clustering.items() if mode == 'center'])
+        model.adjacency_zones: Iterable[str] = pyo.Set(initialize=[zone for zone, mode in clustering.items() if mode == 'adjacency'])
+        model.optimal_center_zones: Iterable[str] = pyo.Set(
+            initialize=[zone for zone, mode in clustering.items() if mode == 'optimal_center'])
         model.corners: Iterable[Corner] = pyo.Set(initialize=kitchen.corners)
+        # the widths of these fixtures are multiples of their width steps (see get_width_steps)
+        model.stepped_fixtures: Iterable[Fixture] = pyo.Set(
+            initialize=[fixture for fixture in kitchen.fixtures if fixture.width_step > 0 and fixture.count == 1])
+        # vertical continuity is only checked between different parts of the same group
+        model.segment_pairs: Iterable[tuple[Segment, Segment]] = pyo.Set(
+            dimen=2, initialize=get_segment_pairs(kitchen))
+        model.part_segment_pairs: Iterable[tuple[KitchenPart, Segment]] = pyo.Set(
+            dimen=2, initialize=get_part_segment_pairs(kitchen))
+        # fixtures can be assigned only to the segments they fit in (see get_compatible_pairs)
+        compatible_pairs = get_compatible_pairs(kitchen)
+        model.compatible_pairs: Iterable[tuple[Segment, Fixture]] = pyo.Set(dimen=2, initialize=compatible_pairs)
+        # the pooled fixtures have no width of their own, so the steps are counted in their segments (see get_pooled_width_steps)
+        model.stepped_pooled_pairs: Iterable[tuple[Segment, Fixture]] = pyo.Set(
+            dimen=2, initialize=[(segment, fixture) for segment, fixture in compatible_pairs if fixture.width_step > 0 and fixture.count > 1])
+        model.segment_fixtures: dict[Segment, list[Fixture]] = {segment: [] for segment in kitchen.segments}
+        model.fixture_segments: dict[Fixture, list[Segment]] = {fixture: [] for fixture in kitchen.fixtures}
+
+        for segment, fixture in compatible_pairs:
+            model.segment_fixtures[segment].append(fixture)
+            model.fixture_segments[fixture].append(segment)
+
+        # interchangeable fixtures are ordered by their segment numbers (see get_fixture_order_pairs)
+        model.fixture_order_pairs: Iterable[tuple[Fixture, Fixture]] = pyo.Set(
+            dimen=2, initialize=get_fixture_order_pairs(kitchen) if symmetry_breaking else [])
+
+        # bounds of the variables (also used as big-M constants in the constraints)
+        model.bounds = bounds = get_bounds(kitchen, model.segment_fixtures, model.fixture_segments, list(model.optimal_center_zones))
 
         # product variables
-        model.pairs = pyo.Var(model.segments, model.fixtures, domain=pyo.Binary)
-        model.present_groups = pyo.Var(model.groups, model.fixtures, domain=pyo.Binary)
+        model.pairs = pyo.Var(model.compatible_pairs, domain=pyo.Binary)
+        model.pairs_width_steps = pyo.Var(
+            model.stepped_pooled_pairs, domain=pyo.NonNegativeIntegers,
+            bounds=lambda _, segment, fixture: (0, get_max_width_steps(fixture, min(fixture.width_max, bounds.segments_width[segment]))))
+        # the pooled fixtures are counted (see Fixture.count)
+        model.present_groups = pyo.Var(model.groups, model.fixtures, domain=lambda _, group, fixture: get_count_domain(fixture),
+                                       bounds=lambda _, group, fixture: (0, fixture.count))
         model.rules_section_bin = pyo.Var(model.rules_section, model.fixtures, domain=pyo.Binary)
-        model.segment_begins_before = pyo.Var(model.segments, model.segments, domain=pyo.Binary, initialize=0)
-        model.segment_ends_after = pyo.Var(model.segments, model.segments, domain=pyo.Binary, initialize=0)
-        model.segment_intersects = pyo.Var(model.segments, model.segments, domain=pyo.Binary, initialize=0)
-        model.part_segment_begins_before = pyo.Var(model.parts, model.segments, domain=pyo.Binary, initialize=0)
-        model.part_segment_ends_after = pyo.Var(model.parts, model.segments, domain=pyo.Binary, initialize=0)
-        model.part_segment_intersects = pyo.Var(model.parts, model.segments, domain=pyo.Binary, initialize=0)
+        model.segment_begins_before = pyo.Var(model.segment_pairs, domain=pyo.Binary, initialize=0)
+        model.segment_ends_after = pyo.Var(model.segment_pairs, domain=pyo.Binary, initialize=0)
+        model.segment_intersects = pyo.Var(model.segment_pairs, domain=pyo.Binary, initialize=0)
+        model.part_segment_begins_before = pyo.Var(model.part_segment_pairs, domain=pyo.Binary, initialize=0)
+        model.part_segment_ends_after = pyo.Var(model.part_segment_pairs, domain=pyo.Binary, initialize=0)
+        model.part_segment_intersects = pyo.Var(model.part_segment_pairs, domain=pyo.Binary, initialize=0)
         model.min_dist_fixtures_order = pyo.Var(model.fixtures, model.fixtures, domain=pyo.Binary)
         model.corners_segment = pyo.Var(model.corners, model.segments, domain=pyo.Binary, initialize=0)
         model.corners_fixture = pyo.Var(model.corners, model.fixtures, domain=pyo.Binary, initialize=0)
 
         # segment variables
-        model.widths = pyo.Var(model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_fixture_width))
+        model.widths = pyo.Var(model.segments, domain=pyo.NonNegativeReals,
+                               bounds=lambda _, segment: (0, bounds.segments_width[segment]))
         model.used = pyo.Var(model.segments, domain=pyo.Binary)
-        model.segments_x = pyo.Var(model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
-        model.segments_y = pyo.Var(model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
-        model.segments_offset = pyo.Var(model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
+        model.segments_x = pyo.Var(model.segments, domain=pyo.NonNegativeReals,
+                                   bounds=lambda _, segment: bounds.segments_x[segment])
+        model.segments_y = pyo.Var(model.segments, domain=pyo.NonNegativeReals,
+                                   bounds=lambda _, segment: bounds.segments_y[segment])
+        model.segments_offset = pyo.Var(model.segments, domain=pyo.NonNegativeReals,
+                                        bounds=lambda _, segment: bounds.segments_offset[segment])
         model.segments_continuous_worktop_left = pyo.Var(
-            model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
+            model.segments, domain=pyo.NonNegativeReals, bounds=lambda _, segment: (0, min(bounds.worktop, segment.part.width)))
         model.segments_continuous_worktop_right = pyo.Var(
-            model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
+            model.segments, domain=pyo.NonNegativeReals, bounds=lambda _, segment: (0, min(bounds.worktop, segment.part.width)))
         model.segments_continuous_worktop_left_max = pyo.Var(model.segments, domain=pyo.Binary, initialize=0)
         model.segments_continuous_worktop_required_left = pyo.Var(model.segments, domain=pyo.Binary, initialize=0)
         # pattern detection
         model.segments_width_difference = pyo.Var(
-            model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_fixture_width))
+            model.segments, domain=pyo.NonNegativeReals, bounds=lambda _, segment: (0, bounds.segments_width_difference[segment]))
         model.segments_previous_larger = pyo.Var(model.segments, domain=pyo.Binary)
         model.segments_width_not_same = pyo.Var(model.segments, domain=pyo.Binary)
         model.segments_width_really_different = pyo.Var(model.segments, domain=pyo.Binary)
         model.segments_penult_width_difference = pyo.Var(
-            model.segments, domain=pyo.NonNegativeReals, bounds=(0, max_fixture_width))
+            model.segments, domain=pyo.NonNegativeReals, bounds=lambda _, segment: (0, bounds.segments_penult_width_difference[segment]))
         model.segments_penult_previous_larger = pyo.Var(model.segments, domain=pyo.Binary)
         model.segments_penult_similar = pyo.Var(model.segments, domain=pyo.Binary)
         model.segments_pattern_aba = pyo.Var(model.segments, domain=pyo.Binary)
 
         # fixture variables
-        model.present = pyo.Var(model.fixtures, domain=pyo.Binary)
-        model.fixtures_x = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
-        model.fixtures_y = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
-        model.fixtures_width = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals, bounds=(0, max_fixture_width))
-        model.fixtures_offset = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
-        model.fixtures_segment_number = pyo.Var(
-            model.fixtures, domain=pyo.NonNegativeIntegers, bounds=(0, max_segment_count))
+        model.present = pyo.Var(model.fixtures, domain=lambda _, fixture: get_count_domain(fixture), bounds=lambda _, fixture: (0, fixture.count))
+        model.fixtures_x = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
+                                   bounds=lambda _, fixture: (0, bounds.fixtures_x[fixture]))
+        model.fixtures_y = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
+                                   bounds=lambda _, fixture: (0, bounds.fixtures_y[fixture]))
+        model.fixtures_width = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
+                                       bounds=lambda _, fixture: (0, bounds.fixtures_width[fixture]))
+        model.fixtures_width_steps = pyo.Var(model.stepped_fixtures, domain=pyo.NonNegativeIntegers,
+                                             bounds=lambda _, fixture: (0, get_max_width_steps(fixture, bounds.fixtures_width[fixture])))
+        model.fixtures_offset = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
+                                        bounds=lambda _, fixture: (0, bounds.fixtures_offset[fixture]))
+        model.fixtures_segment_number = pyo.Var(model.fixtures, domain=pyo.NonNegativeIntegers,
+                                                bounds=lambda _, fixture: (0, bounds.fixtures_segment_number[fixture]))
         model.fixtures_close_to_wall = pyo.Var(model.fixtures, domain=pyo.Binary, initialize=0)
         model.fixtures_wide_enough = pyo.Var(model.fixtures, domain=pyo.Binary, initialize=0)
         # position detection
-        model.zones_x_helper = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
-        model.zones_y_helper = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
+        model.zones_x_helper = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
+                                       bounds=lambda _, fixture: (0, bounds.zones_x[fixture.zone]))
+        model.zones_y_helper = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
+                                       bounds=lambda _, fixture: (0, bounds.zones_y[fixture.zone]))
         model.fixtures_zone_x_dist = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
-                                             bounds=(0, max_canvas_size), initialize=0)
+                                             bounds=lambda _, fixture: (0, bounds.fixtures_zone_distance[fixture][0]), initialize=0)
         model.fixtures_zone_x_further = pyo.Var(model.fixtures, domain=pyo.Binary, initialize=0)
         model.fixtures_zone_y_dist = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
-                                             bounds=(0, max_canvas_size), initialize=0)
+                                             bounds=lambda _, fixture: (0, bounds.fixtures_zone_distance[fixture][1]), initialize=0)
         model.fixtures_zone_y_further = pyo.Var(model.fixtures, domain=pyo.Binary, initialize=0)
         model.fixtures_target_x_dist = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
-                                               bounds=(0, max_canvas_size), initialize=0)
+                                               bounds=lambda _, fixture: (0, bounds.fixtures_target_distance[fixture][0]), initialize=0)
         model.fixtures_target_x_further = pyo.Var(model.fixtures, domain=pyo.Binary, initialize=0)
         model.fixtures_target_y_dist = pyo.Var(model.fixtures, domain=pyo.NonNegativeReals,
-                                               bounds=(0, max_canvas_size), initialize=0)
+                                               bounds=lambda _, fixture: (0, bounds.fixtures_target_distance[fixture][1]), initialize=0)
         model.fixtures_target_y_further = pyo.Var(model.fixtures, domain=pyo.Binary, initialize=0)
 
         # zone variables
-        model.zones_x = pyo.Var(model.zones, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
-        model.zones_y = pyo.Var(model.zones, domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
+        model.zones_x = pyo.Var(model.zones, domain=pyo.NonNegativeReals, bounds=lambda _, zone: (0, bounds.zones_x[zone]))
+        model.zones_y = pyo.Var(model.zones, domain=pyo.NonNegativeReals, bounds=lambda _, zone: (0, bounds.zones_y[zone]))
         model.zones_x_dist = pyo.Var(model.zones, domain=pyo.NonNegativeReals,
-                                     bounds=(0, max_canvas_size), initialize=0)
+                                     bounds=lambda _, zone: (0, bounds.zones_distance[zone][0]), initialize=0)
         model.zones_x_further = pyo.Var(model.zones, domain=pyo.Binary, initialize=0)
         model.zones_y_dist = pyo.Var(model.zones, domain=pyo.NonNegativeReals,
-                                     bounds=(0, max_canvas_size), initialize=0)
+                                     bounds=lambda _, zone: (0, bounds.zones_distance[zone][1]), initialize=0)
         model.zones_y_further = pyo.Var(model.zones, domain=pyo.Binary, initialize=0)
+        # continuous, the pairs bound them by 0 or 1 (see get_zone_adjacency)
+        model.zones_adjacent = pyo.Var(model.segments, model.adjacency_zones, domain=pyo.NonNegativeReals, bounds=(0, 1), initialize=0)
 
         # part variables
         model.parts_padding = pyo.Var(model.parts, domain=pyo.NonNegativeReals,
-                                      bounds=(0, max_canvas_size), initialize=0)
+                                      bounds=lambda _, part: (0, part.width), initialize=0)
 
         # individual variables
-        model.widest_worktop = pyo.Var(domain=pyo.NonNegativeReals, bounds=(0, max_canvas_size))
+        model.widest_worktop = pyo.Var(domain=pyo.NonNegativeReals, bounds=(0, bounds.worktop))
+
+        # expressions (prefix sums shared by the constraints)
+        segments_left_offset, parts_right_offset = get_offset_expressions(kitchen, model)
+        model.segments_left_offset = pyo.Expression(model.segments, initialize=segments_left_offset)
+        model.parts_right_offset = pyo.Expression(model.parts, initialize=parts_right_offset)
+
+
+    def add_component(model: pyo.ConcreteModel, name: str, val: Any) -> None:
+        """the components of a concrete model are constructed when they are added, so this is where they are profiled"""
+        if getattr(model, 'profiler', None) is None:
+            super().add_component(name, val)
+        else:
+            with model.profiler.measure(name):
+                super().add_component(name, val)
+
+
+def get_count_domain(fixture: Fixture) -> Any:
+    return pyo.Binary if fixture.count == 1 else pyo.NonNegativeIntegers
+
+
+def get_max_width_steps(fixture: Fixture, width: float) -> int:
+    return math.floor(width / fixture.width_step + WIDTH_STEP_EPSILON)
+
+
+def get_offset_expressions(kitchen: Kitchen, model: KitchenModel) -> tuple[dict[Segment, Any], dict[KitchenPart, Any]]:
+    """offsets of the left edges of segments and of the right edges of parts relative to the group \n
+    each expression extends the previous one, so all of them are built in linear time"""
+    segments_left_offset: dict[Segment, Any] = {}
+    parts_right_offset: dict[KitchenPart, Any] = {}
+
+    for part in kitchen.parts:
+        offset = part.position.group_offset + model.parts_padding[part]
+
+        for segment in part.segments:
+            segments_left_offset[segment] = offset
+            offset = offset + model.widths[segment]
+
+        parts_right_offset[part] = offset
+
+    return segments_left_offset, parts_right_offset
+
+
+def build_model(kitchen: Kitchen, args: Args) -> KitchenModel:
+    profiler = model_structure.BuildProfiler() if args.profile is not None else None
+    model = KitchenModel(kitchen, args.symmetry_breaking, profiler, args.zone_clustering)
+    set_constraints(kitchen, model)
+    set_objective(model)
+    deactivate_components(model)
+    model_structure.print_structure(model, args)
+
+    if profiler is not None and args.profile is not None:
+        model.profiler = None
+        model_structure.print_profile(profiler.finish(model), args.profile)
+
+    return model
+
+
+def build_gurobi_model(kitchen: Kitchen, args: Args) -> tuple[KitchenModel, Any]:
+    """the Pyomo model with the sets and the variables and the gurobipy model with the same variables, the constraints and the objective \n
+    the main constraint families are assembled as sparse matrices (see gurobi_backend.MATRIX_FAMILIES), \n
+    the other rules of set_constraints and set_objective are evaluated on the gurobipy variables (see gurobi_backend.GurobiModel)"""
+    import gurobi_backend
+    model = KitchenModel(kitchen, args.symmetry_breaking, zone_clustering=args.zone_clustering)
+    # the rules use it as a KitchenModel
+    gurobi_model: Any = gurobi_backend.GurobiModel(model, kitchen)
+    set_constraints(kitchen, gurobi_model)
+    set_objective(gurobi_model)
+    model_structure.print_structure(model, args)
+    return model, gurobi_model
+
+
+def get_zone_clustering(kitchen: Kitchen, default: str) -> dict[str, str]:
+    """how the fixtures of every optimized zone are kept together (the clustering of the zone or the default): \n
+    center - distances from the zone center (the average of the fixture coordinates) and of the center from the optimal center, \n
+    adjacency - neighbouring segments with fixtures of the zone, \n
+    optimal_center - distances from the optimal center only (zones without it use adjacency)"""
+    clustering = {}
+
+    for zone in kitchen.zones:
+        if zone.is_optimized:
+            mode = zone.clustering if zone.clustering is not None else default
+            clustering[zone.name] = 'adjacency' if mode == 'optimal_center' and zone.optimal_center is None else mode
+
+    return clustering
+
+
+def get_compatible_pairs(kitchen: Kitchen) -> list[tuple[Segment, Fixture]]:
+    """(segment, fixture) pairs which are not ruled out by the level, edges, corners or group exclude rules"""
+    return [(segment, fixture) for segment in kitchen.segments for fixture in kitchen.fixtures
+            if fixture_fits_segment(fixture, segment, kitchen.placement_rules, kitchen.corners)]
+
+
+def get_group_segments(kitchen: Kitchen) -> dict[int, list[Segment]]:
+    group_segments: dict[int, list[Segment]] = {group: [] for group in kitchen.groups}
+
+    for segment in kitchen.segments:
+        group_segments[segment.part.position.group_number].append(segment)
+
+    return group_segments
+
+
+def get_segment_pairs(kitchen: Kitchen) -> list[tuple[Segment, Segment]]:
+    """pairs of segments which are in different parts of the same group"""
+    group_segments = get_group_segments(kitchen)
+    return [(segment1, segment2) for segment1 in kitchen.segments
+            for segment2 in group_segments[segment1.part.position.group_number] if segment2.part is not segment1.part]
+
+
+def get_fixture_order_pairs(kitchen: Kitchen) -> list[tuple[Fixture, Fixture]]:
+    """consecutive fixtures of each class of interchangeable fixtures (clones are already ordered by their older_sibling)"""
+    return [(fixture1, fixture2) for fixtures in get_interchangeable_fixtures(kitchen)
+            for fixture1, fixture2 in zip(fixtures, fixtures[1:]) if fixture2.older_sibling is not fixture1]
+
+
+def get_part_segment_pairs(kitchen: Kitchen) -> list[tuple[KitchenPart, Segment]]:
+    """pairs of kitchen parts and segments of other kitchen parts in the same group"""
+    group_segments = get_group_segments(kitchen)
+    return [(part, segment) for part in kitchen.parts
+            for segment in group_segments[part.position.group_number] if segment.part is not part]
 
 
 def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
+    """the constraints of the model, the families in gurobi_backend.MATRIX_FAMILIES are also assembled there as sparse matrices \n
+    (the gurobipy backend), so a change of their rules has to be made in both places"""
     min_fixture_width = kitchen.constants.min_fixture_width
-    max_fixture_width = kitchen.constants.max_fixture_width
-    max_canvas_size = kitchen.constants.max_canvas_size
-    max_segment_count = kitchen.constants.max_segment_count
+    # the big-M constants are derived from the bounds of the variables in the constraint (see presolve)
+    bounds = model.bounds
     vertical_continuity_tolerance = kitchen.constants.vertical_continuity_tolerance
     width_same_tolerance = kitchen.constants.width_same_tolerance
     width_different_tolerance = kitchen.constants.width_different_tolerance
     width_penult_similar_tolerance = kitchen.constants.width_penult_similar_tolerance
+    # the width differences are multiples of the grid if every fixture has a width step (None otherwise)
+    width_grid = get_width_grid(kitchen.fixtures)
 
     clause_count = 0
 
@@ -147,14 +543,15 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     def presence_pairs_pairing(model: KitchenModel, fixture: Fixture) -> Any:
         """fixture is present <=> it belongs to exactly one pair \n
-        fixture is not present <=> it does not belong to any pair"""
-        return model.present[fixture] == sum(model.pairs[segment, fixture] for segment in model.segments)
+        fixture is not present <=> it does not belong to any pair \n
+        a pooled fixture is present as many times as it has pairs"""
+        return model.present[fixture] == sum(model.pairs[segment, fixture] for segment in model.fixture_segments[fixture])
 
     model.presence_pairs_pairing = pyo.Constraint(model.fixtures, rule=presence_pairs_pairing)
 
     def segment_used(model: KitchenModel, segment: Segment) -> Any:
         """check if segment is used"""
-        return model.used[segment] == sum(model.pairs[segment, fixture] for fixture in model.fixtures)
+        return model.used[segment] == sum(model.pairs[segment, fixture] for fixture in model.segment_fixtures[segment])
 
     model.segment_used = pyo.Constraint(model.segments, rule=segment_used)
 
@@ -170,7 +567,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     def no_empty_nonzero_segments(model: KitchenModel, segment: Segment) -> Any:
         """segment has width => it contains a fixture"""
-        return model.widths[segment] <= max_fixture_width * model.used[segment]
+        return model.widths[segment] <= bounds.segments_width[segment] * model.used[segment]
 
     model.no_empty_nonzero_segments = pyo.Constraint(model.segments, rule=no_empty_nonzero_segments)
 
@@ -180,26 +577,36 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     model.no_zero_nonempty_segments = pyo.Constraint(model.segments, rule=no_zero_nonempty_segments)
 
-    def correct_vertical_placement(model: KitchenModel, segment: Segment, fixture: Fixture) -> Any:
-        """ensure that the vertical placement of fixtures is correct (in the pair, is_top of the fixture should equal is_top of the segment)"""
-        if segment.part.is_top == fixture.is_top:
-            return pyo.Constraint.Skip
-        else:
-            return model.pairs[segment, fixture] == 0
-
-    model.correct_vertical_placement = pyo.Constraint(model.segments, model.fixtures, rule=correct_vertical_placement)
-
     # WIDTH RULES
 
     def width_rules(model: KitchenModel, segment: Segment, fixture: Fixture, current_clause: int) -> Any:
         """ensure that the fixture width is between the lower and upper bounds"""
+        M = bounds.segments_width[segment] - fixture.width_max
         return get_clause([
             model.widths[segment] >= (fixture.width_min*model.pairs[segment, fixture]),
-            model.widths[segment] <= fixture.width_max + max_fixture_width * (1-model.pairs[segment, fixture])
+            model.widths[segment] <= fixture.width_max + M * (1-model.pairs[segment, fixture]) if M > 0 else pyo.Constraint.Skip
         ], current_clause)
 
-    model.width_rules = pyo.Constraint(model.segments, model.fixtures,
-                                       pyo.RangeSet(clause_count := 2), rule=width_rules)
+    model.width_rules = pyo.Constraint(model.compatible_pairs, pyo.RangeSet(clause_count := 2), rule=width_rules)
+
+    def get_width_steps(model: KitchenModel, fixture: Fixture) -> Any:
+        """the width of the fixture is a whole number of its width steps"""
+        return model.fixtures_width[fixture] == fixture.width_step * model.fixtures_width_steps[fixture]
+
+    model.get_width_steps = pyo.Constraint(model.stepped_fixtures, rule=get_width_steps)
+
+    def get_pooled_width_steps(model: KitchenModel, segment: Segment, fixture: Fixture, current_clause: int) -> Any:
+        """the segment with a cabinet of the pooled fixture is a whole number of its width steps (no steps if it is not paired)"""
+        steps = model.pairs_width_steps[segment, fixture]
+        p = model.pairs[segment, fixture]
+        return get_clause([
+            model.widths[segment] >= fixture.width_step * steps,
+            model.widths[segment] <= fixture.width_step * steps + bounds.segments_width[segment] * (1-p),
+            steps <= steps.ub * p,
+        ], current_clause)
+
+    model.get_pooled_width_steps = pyo.Constraint(
+        model.stepped_pooled_pairs, pyo.RangeSet(clause_count := 3), rule=get_pooled_width_steps)
 
     def part_width(model: KitchenModel, part: KitchenPart) -> Any:
         """total width of the kitchen part should be less than or equal to the sum of the widths of the fixtures"""
@@ -209,39 +616,22 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     # EDGE RULES
 
-    def edge_fixture(model: KitchenModel, segment: Segment, fixture: Fixture) -> Any:
-        """first edge segment cannot contain a non-edge fixture"""
-        if segment.is_first and segment.part.edge_left and not fixture.allow_edge:
-            return model.pairs[segment, fixture] == 0
-        else:
-            return pyo.Constraint.Skip
-
-    model.edge_fixture = pyo.Constraint(model.segments, model.fixtures, rule=edge_fixture)
-
-    def edge_fixture_last_segment(model: KitchenModel, segment: Segment, fixture: Fixture) -> Any:
-        """last edge segment cannot contain a non-edge fixture"""
-        if segment.is_last and segment.part.edge_right and not fixture.allow_edge:
-            return model.pairs[segment, fixture] == 0
-        else:
-            return pyo.Constraint.Skip
-
-    model.edge_fixture_last_segment = pyo.Constraint(model.segments, model.fixtures, rule=edge_fixture_last_segment)
+    # the first and the last edge segment cannot contain a non-edge fixture (see get_compatible_pairs)
 
     def edge_fixture_empty_segment(model: KitchenModel, segment: Segment, fixture: Fixture) -> Any:
         """non-edge fixture has to be succeeded by another fixture"""
-        if not segment.is_first and segment.part.edge_right and not fixture.allow_edge:
-            return model.pairs[segment.previous, fixture] <= model.used[segment]
+        if not segment.is_last and segment.part.edge_right and not fixture.allow_edge:
+            return model.pairs[segment, fixture] <= model.used[segment.next]
         else:
             return pyo.Constraint.Skip
 
-    model.edge_fixture_empty_segment = pyo.Constraint(model.segments, model.fixtures, rule=edge_fixture_empty_segment)
+    model.edge_fixture_empty_segment = pyo.Constraint(model.compatible_pairs, rule=edge_fixture_empty_segment)
 
     # POSITION RULES
 
     def get_segments_x(model: KitchenModel, segment: Segment) -> Any:
         """determines x coordinate of the *center* of the segment"""
-        sin_alpha = round(math.sin(math.radians(segment.part.position.angle)), SIN_COS_DECIMAL_PLACES)
-        cos_alpha = round(math.cos(math.radians(segment.part.position.angle)), SIN_COS_DECIMAL_PLACES)
+        sin_alpha, cos_alpha = get_sin_cos(segment.part.position.angle)
 
         if segment.is_first:
             horizontal = model.parts_padding[segment.part] + model.widths[segment]/2
@@ -254,8 +644,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     def get_segments_y(model: KitchenModel, segment: Segment) -> Any:
         """determines y coordinate of the *center* of the segment"""
-        sin_alpha = round(math.sin(math.radians(segment.part.position.angle)), SIN_COS_DECIMAL_PLACES)
-        cos_alpha = round(math.cos(math.radians(segment.part.position.angle)), SIN_COS_DECIMAL_PLACES)
+        sin_alpha, cos_alpha = get_sin_cos(segment.part.position.angle)
 
         if segment.is_first:
             horizontal = model.parts_padding[segment.part] + model.widths[segment]/2
@@ -277,10 +666,13 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     def get_fixtures_width_position(model: KitchenModel, segment: Segment, fixture: Fixture, current_clause: int) -> Any:
         """propagates width and coordinates from segments to their assigned fixtures \n
-        absent fixtures should have only zeroes"""
-        MW = max_fixture_width
-        MC = max_canvas_size
-        MN = max_segment_count
+        absent fixtures should have only zeroes \n
+        the fixture variables are non-negative, so the upper bound of the segment variable relaxes the lower bound clauses \n
+        the clauses are built only when selected (the rule is called for each of them) \n
+        the pooled fixtures have no variables of their own (see Fixture.count)"""
+        if fixture.count > 1:
+            return pyo.Constraint.Skip
+
         p = model.pairs[segment, fixture]
 
         sw = model.widths[segment]
@@ -294,40 +686,50 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         sn = segment.number
         fn = model.fixtures_segment_number[fixture]
 
+        sw_max = bounds.segments_width[segment]
+        fw_max = bounds.fixtures_width[fixture]
+        sx_min, sx_max = bounds.segments_x[segment]
+        fx_max = bounds.fixtures_x[fixture]
+        sy_min, sy_max = bounds.segments_y[segment]
+        fy_max = bounds.fixtures_y[fixture]
+        so_min, so_max = bounds.segments_offset[segment]
+        fo_max = bounds.fixtures_offset[fixture]
+        fn_max = bounds.fixtures_segment_number[fixture]
+
         clauses = [
             # segment width -> fixture width
-            sw-MW*(1-p) <= fw,  # lower bound
-            fw <= sw+MW*(1-p),  # upper bound
-            fw <= MW*model.present[fixture],  # zero if absent
+            lambda: sw-sw_max*(1-p) <= fw,  # lower bound
+            lambda: fw <= sw+fw_max*(1-p),  # upper bound
+            lambda: fw <= fw_max*model.present[fixture],  # zero if absent
 
             # segment x -> fixture x
-            sx-MC*(1-p) <= fx,
-            fx <= sx+MC*(1-p),
-            fx <= MC*model.present[fixture],
+            lambda: sx-sx_max*(1-p) <= fx,
+            lambda: fx <= sx+max(0, fx_max-sx_min)*(1-p),
+            lambda: fx <= fx_max*model.present[fixture],
 
             # segment y -> fixture y
-            sy-MC*(1-p) <= fy,
-            fy <= sy+MC*(1-p),
-            fy <= MC*model.present[fixture],
+            lambda: sy-sy_max*(1-p) <= fy,
+            lambda: fy <= sy+max(0, fy_max-sy_min)*(1-p),
+            lambda: fy <= fy_max*model.present[fixture],
 
             # segment offset -> fixture offset
-            so-MC*(1-p) <= fo,
-            fo <= so+MC*(1-p),
-            fo <= MC*model.present[fixture],
+            lambda: so-so_max*(1-p) <= fo,
+            lambda: fo <= so+max(0, fo_max-so_min)*(1-p),
+            lambda: fo <= fo_max*model.present[fixture],
 
             # segment number -> fixture segment_number
-            sn-MN*(1-p) <= fn,
-            fn <= sn+MN*(1-p),
-            fn <= MN*model.present[fixture],
+            lambda: sn-sn*(1-p) <= fn,
+            lambda: fn <= sn+max(0, fn_max-sn)*(1-p),
+            lambda: fn <= fn_max*model.present[fixture],
         ]
-        return get_clause(clauses, current_clause)
+        return get_clause(clauses, current_clause)()
 
     model.get_fixtures_width_coords_offset = pyo.Constraint(
-        model.segments, model.fixtures, pyo.RangeSet(clause_count := 15), rule=get_fixtures_width_position)
+        model.compatible_pairs, pyo.RangeSet(clause_count := 15), rule=get_fixtures_width_position)
 
     def get_present_groups(model: KitchenModel, group: int, fixture: Fixture) -> Any:
         """checks if the fixture is present in the group"""
-        return sum(model.pairs[segment, fixture] for segment in model.segments if segment.part.position.group_number == group) == model.present_groups[group, fixture]
+        return sum(model.pairs[segment, fixture] for segment in model.fixture_segments[fixture] if segment.part.position.group_number == group) == model.present_groups[group, fixture]
 
     model.get_present_groups = pyo.Constraint(model.groups, model.fixtures, rule=get_present_groups)
 
@@ -381,9 +783,11 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     def evaluate_user_rules_section(model: KitchenModel, rule: PlacementRule, fixture: Fixture, current_clause: int) -> Any:
         """applies the user-defined rules that use sections"""
         if attr_matches(rule, fixture):
-            M = max_canvas_size
             b = model.rules_section_bin[rule, fixture]
             correct_group = model.present_groups[rule.group, fixture]
+            fixture_right_max = bounds.fixtures_offset[fixture] + bounds.fixtures_width[fixture]
+            M_right = max(0, fixture_right_max - rule.section_offset)  # fixture ends before the section begins
+            M_left = max(0, rule.section_offset + rule.section_width)  # fixture begins after the section
 
             match rule.type:
                 case 'include':
@@ -392,14 +796,14 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
                         correct_group >= b,
                         model.fixtures_offset[fixture] >= rule.section_offset*b,
                         model.fixtures_offset[fixture] + model.fixtures_width[fixture]
-                        <= rule.section_offset + rule.section_width + (1-b)*M
+                        <= rule.section_offset + rule.section_width + (1-b)*max(0, M_right - rule.section_width)
                     ]
                 case 'exclude':
                     clauses = [
                         model.fixtures_offset[fixture] + model.fixtures_width[fixture]
-                        <= rule.section_offset + M*b + M*(1-correct_group),
+                        <= rule.section_offset + M_right*b + M_right*(1-correct_group),
                         rule.section_offset + rule.section_width
-                        <= model.fixtures_offset[fixture] + M*(1-b) + M*(1-correct_group),
+                        <= model.fixtures_offset[fixture] + M_left*(1-b) + M_left*(1-correct_group),
                         pyo.Constraint.Skip
                     ]
 
@@ -422,6 +826,13 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     model.sort_multiple_same_fixtures = pyo.Constraint(model.fixtures, rule=sort_multiple_same_fixtures)
 
+    def sort_interchangeable_fixtures(model: KitchenModel, fixture1: Fixture, fixture2: Fixture) -> Any:
+        """the same as sort_multiple_same_fixtures, but for different fixtures which the model cannot tell apart \n
+        absent fixtures (segment number 0) come first, so the present fixtures of a class are always the last ones"""
+        return model.fixtures_segment_number[fixture1] <= model.fixtures_segment_number[fixture2]
+
+    model.sort_interchangeable_fixtures = pyo.Constraint(model.fixture_order_pairs, rule=sort_interchangeable_fixtures)
+
     # WIDTH DIFFERENCE RULES
 
     def get_width_difference(model: KitchenModel, segment: Segment, current_clause: int) -> Any:
@@ -434,15 +845,16 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
             else:
                 return pyo.Constraint.Skip
         else:
-            M = max_fixture_width
+            M = bounds.segments_width_difference[segment]
             current_width = model.widths[segment]
             previous_width = model.widths[segment.previous]
 
+            # |a-b| - (a-b) can be up to 2*M, so the relaxed upper bounds need 2*M
             clauses = [
                 width_difference >= previous_width - current_width - M*(1-model.used[segment]),
                 width_difference >= current_width - previous_width - M*(1-model.used[segment]),
-                width_difference <= previous_width - current_width + M*(1-model.segments_previous_larger[segment]),
-                width_difference <= current_width - previous_width + M*model.segments_previous_larger[segment],
+                width_difference <= previous_width - current_width + 2*M*(1-model.segments_previous_larger[segment]),
+                width_difference <= current_width - previous_width + 2*M*model.segments_previous_larger[segment],
                 width_difference <= M*model.used[segment]
             ]
             return get_clause(clauses, current_clause)
@@ -460,16 +872,16 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
             else:
                 return pyo.Constraint.Skip
         else:
-            M = max_fixture_width
+            M = bounds.segments_penult_width_difference[segment]
             current_width = model.widths[segment]
             previous_width = model.widths[segment.previous.previous]
 
             clauses = [
                 width_difference >= previous_width - current_width - M*(1-model.used[segment]),
                 width_difference >= current_width - previous_width - M*(1-model.used[segment]),
-                width_difference <= previous_width - current_width + M *
+                width_difference <= previous_width - current_width + 2*M *
                 (1-model.segments_penult_previous_larger[segment]),
-                width_difference <= current_width - previous_width + M*model.segments_penult_previous_larger[segment],
+                width_difference <= current_width - previous_width + 2*M*model.segments_penult_previous_larger[segment],
                 width_difference <= M*model.used[segment]
             ]
             return get_clause(clauses, current_clause)
@@ -484,7 +896,8 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         zone = fixture.zone
 
         if zone in model.zones:
-            M = max_canvas_size
+            MX = bounds.zones_x[zone]
+            MY = bounds.zones_y[zone]
             x = model.zones_x[zone]
             xf = model.zones_x_helper[fixture]
             y = model.zones_y[zone]
@@ -492,12 +905,12 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
             pf = model.present[fixture]
 
             clauses = [
-                xf <= pf*M,
-                xf >= x-M*(1-pf),
+                xf <= pf*MX,
+                xf >= x-MX*(1-pf),
                 xf <= x,
 
-                yf <= pf*M,
-                yf >= y-M*(1-pf),
+                yf <= pf*MY,
+                yf >= y-MY*(1-pf),
                 yf <= y
             ]
             return get_clause(clauses, current_clause)
@@ -520,34 +933,41 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     model.get_zone_coordinates_sums = pyo.Constraint(
         model.zones, pyo.RangeSet(clause_count := 2), rule=get_zone_coordinates_sums)
 
+    optimal_centers = {zone.name: zone.optimal_center for zone in kitchen.zones if zone.optimal_center is not None}
+
     def get_fixture_zone_distance(model: KitchenModel, fixture: Fixture, current_clause: int) -> Any:
-        """calculates the distance each fixture has from the zone center"""
+        """calculates the distance each fixture has from the zone center (or from the optimal center)"""
         p = model.present[fixture]
-        M = max_canvas_size
+        MX, MY = bounds.fixtures_zone_distance[fixture]
 
         x_dist = model.fixtures_zone_x_dist[fixture]
         x_further = model.fixtures_zone_x_further[fixture]
         y_dist = model.fixtures_zone_y_dist[fixture]
         y_further = model.fixtures_zone_y_further[fixture]
 
-        if fixture.zone in model.zones:
+        if fixture.zone in model.zones or fixture.zone in model.optimal_center_zones:
             fixture_x = model.fixtures_x[fixture]
-            zone_x = model.zones_x[fixture.zone]
             fixture_y = model.fixtures_y[fixture]
-            zone_y = model.zones_y[fixture.zone]
 
+            if fixture.zone in model.zones:
+                zone_x, zone_y = model.zones_x[fixture.zone], model.zones_y[fixture.zone]
+            else:
+                # the optimal center replaces the zone center (no zone variables, see get_zone_clustering)
+                zone_x, zone_y = optimal_centers[fixture.zone]
+
+            # the relaxed upper bounds need 2*M (see get_width_difference)
             clauses = [
-                x_dist >= zone_x - fixture_x - M*(1-p),
-                x_dist >= fixture_x - zone_x - M*(1-p),
-                x_dist <= zone_x - fixture_x + M*x_further,
-                x_dist <= fixture_x - zone_x + M*(1-x_further),
-                x_dist <= M*p,
-
-                y_dist >= zone_y - fixture_y - M*(1-p),
-                y_dist >= fixture_y - zone_y - M*(1-p),
-                y_dist <= zone_y - fixture_y + M*y_further,
-                y_dist <= fixture_y - zone_y + M*(1-y_further),
-                y_dist <= M*p,
+                x_dist >= zone_x - fixture_x - MX*(1-p),
+                x_dist >= fixture_x - zone_x - MX*(1-p),
+                x_dist <= zone_x - fixture_x + 2*MX*x_further,
+                x_dist <= fixture_x - zone_x + 2*MX*(1-x_further),
+                x_dist <= MX*p,
+
+                y_dist >= zone_y - fixture_y - MY*(1-p),
+                y_dist >= fixture_y - zone_y - MY*(1-p),
+                y_dist <= zone_y - fixture_y + 2*MY*y_further,
+                y_dist <= fixture_y - zone_y + 2*MY*(1-y_further),
+                y_dist <= MY*p,
             ]
             return get_clause(clauses, current_clause)
         elif current_clause == 1:
@@ -563,7 +983,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     def get_zone_center_distance(model: KitchenModel, zone: str, current_clause: int) -> Any:
         """how far is the zone center from the optimum"""
         zone_obj = next(z for z in kitchen.zones if z.name == zone)
-        M = max_canvas_size
+        MX, MY = bounds.zones_distance[zone]
 
         x_dist = model.zones_x_dist[zone]
         x_further = model.zones_x_further[zone]
@@ -579,13 +999,13 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
             clauses = [
                 x_dist >= optimal_x - zone_x,
                 x_dist >= zone_x - optimal_x,
-                x_dist <= optimal_x - zone_x + M*x_further,
-                x_dist <= zone_x - optimal_x + M*(1-x_further),
+                x_dist <= optimal_x - zone_x + 2*MX*x_further,
+                x_dist <= zone_x - optimal_x + 2*MX*(1-x_further),
 
                 y_dist >= optimal_y - zone_y,
                 y_dist >= zone_y - optimal_y,
-                y_dist <= optimal_y - zone_y + M*y_further,
-                y_dist <= zone_y - optimal_y + M*(1-y_further),
+                y_dist <= optimal_y - zone_y + 2*MY*y_further,
+                y_dist <= zone_y - optimal_y + 2*MY*(1-y_further),
             ]
             return get_clause(clauses, current_clause)
         else:
@@ -594,99 +1014,145 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     model.get_zone_center_distance = pyo.Constraint(
         model.zones, pyo.RangeSet(clause_count := 8), rule=get_zone_center_distance)
 
+    def get_zone_adjacency(model: KitchenModel, segment: Segment, zone: str, current_clause: int) -> Any:
+        """the segment and the previous one both hold a fixture of the zone (a cheaper measure of the clustering than the zone center) \n
+        zones_adjacent can only be 1 if both sums of the pairs are 1, the objective rewards it"""
+        if segment.is_first or segment.previous is None:
+            return model.zones_adjacent[segment, zone] <= 0 if current_clause == 1 else pyo.Constraint.Skip
+
+        return get_clause([
+            model.zones_adjacent[segment, zone]
+            <= sum(model.pairs[segment, fixture] for fixture in model.segment_fixtures[segment] if fixture.zone == zone),
+            model.zones_adjacent[segment, zone]
+            <= sum(model.pairs[segment.previous, fixture] for fixture in model.segment_fixtures[segment.previous] if fixture.zone == zone),
+        ], current_clause)
+
+    model.get_zone_adjacency = pyo.Constraint(
+        model.segments, model.adjacency_zones, pyo.RangeSet(clause_count := 2), rule=get_zone_adjacency)
+
     # VERTICAL CONTINUITY RULES
     # for some reason, these constraints perform poorly on glpk
 
     def vertical_continuity_segments_beginning(model: KitchenModel, segment1: Segment, segment2: Segment, current_clause: int) -> Any:
         """keeps a record of segments (segment1) which begin *in the middle* of the segment (segment2) above/below them \n
-        vertical continuity is broken <=> segment1.used & segment1.offset > segment2.offset & segment1.offset < segment2.offst + segment2.width"""
+        vertical continuity is broken <=> segment1.used & segment1.offset > segment2.offset & segment1.offset < segment2.offst + segment2.width \n
+        the segments are in different parts of the same group (see get_segment_pairs)"""
         begins = model.segment_begins_before[segment1, segment2]
         ends = model.segment_ends_after[segment1, segment2]
         intersects = model.segment_intersects[segment1, segment2]
         # the approach below seems to be more effective (in CBC) than using model.segments_offset[segmentX] directly
-        offset1 = segment1.part.position.group_offset + model.parts_padding[segment1.part] + \
-            sum(model.widths[s] for s in segment1.part.segments if s.number < segment1.number)
-        offset2 = segment2.part.position.group_offset + model.parts_padding[segment2.part] + \
-            sum(model.widths[s] for s in segment2.part.segments if s.number < segment2.number)
+        offset1 = model.segments_left_offset[segment1]
+        offset2 = model.segments_left_offset[segment2]
         width2 = model.widths[segment2]
-        M = max_canvas_size
+        M_begins, M_ends = get_continuity_ms(segment1.part, segment2.part, vertical_continuity_tolerance)
 
-        if segment1 is not segment2 and segment1.part is not segment2.part and segment1.part.position.group_number == segment2.part.position.group_number:
-            return get_clause([
-                (0, - offset1 + (offset2 + vertical_continuity_tolerance) + M*begins, M),
-                (0, offset1 - (offset2 + width2 - vertical_continuity_tolerance) + M*ends, M),
-                (0, begins + ends + model.used[segment1] - 3*intersects, 2),
-                # in CBC, the clauses below make it faster (but when all four are active, it becomes slower)
-                # model.segment_begins_before[segment1, segment2.previous] >= model.segment_begins_before[segment1, segment2] if not segment2.is_first else pyo.Constraint.Skip,
-                model.segment_begins_before[segment1.previous, segment2]
-                <= model.segment_begins_before[segment1, segment2] if not segment1.is_first else pyo.Constraint.Skip,
-                model.segment_ends_after[segment1, segment2.previous]
-                <= model.segment_ends_after[segment1, segment2] if not segment2.is_first else pyo.Constraint.Skip,
-                model.segment_ends_after[segment1.previous, segment2]
-                >= model.segment_ends_after[segment1, segment2] if not segment1.is_first else pyo.Constraint.Skip,
-            ], current_clause)
-        else:
-            return pyo.Constraint.Skip
+        return get_clause([
+            (0, - offset1 + (offset2 + vertical_continuity_tolerance) + M_begins*begins, M_begins),
+            (0, offset1 - (offset2 + width2 - vertical_continuity_tolerance) + M_ends*ends, M_ends),
+            (0, begins + ends + model.used[segment1] - 3*intersects, 2),
+            # in CBC, the clauses below make it faster (but when all four are active, it becomes slower)
+            # model.segment_begins_before[segment1, segment2.previous] >= model.segment_begins_before[segment1, segment2] if not segment2.is_first else pyo.Constraint.Skip,
+            model.segment_begins_before[segment1.previous, segment2]
+            <= model.segment_begins_before[segment1, segment2] if not segment1.is_first else pyo.Constraint.Skip,
+            model.segment_ends_after[segment1, segment2.previous]
+            <= model.segment_ends_after[segment1, segment2] if not segment2.is_first else pyo.Constraint.Skip,
+            model.segment_ends_after[segment1.previous, segment2]
+            >= model.segment_ends_after[segment1, segment2] if not segment1.is_first else pyo.Constraint.Skip,
+        ], current_clause)
 
     model.vertical_continuity_segments_beginning = pyo.Constraint(
-        model.segments, model.segments, pyo.RangeSet(clause_count := 6), rule=vertical_continuity_segments_beginning)
+        model.segment_pairs, pyo.RangeSet(clause_count := 6), rule=vertical_continuity_segments_beginning)
 
     def vertical_continuity_part_ending(model: KitchenModel, part: KitchenPart, segment: Segment, current_clause: int) -> Any:
-        """notes that the part ending is situated in the middle of the segment above/below"""
+        """notes that the part ending is situated in the middle of the segment above/below \n
+        the segment is in a different part of the same group (see get_part_segment_pairs)"""
         begins = model.part_segment_begins_before[part, segment]
         ends = model.part_segment_ends_after[part, segment]
         intersects = model.part_segment_intersects[part, segment]
-        offset1 = part.position.group_offset + model.parts_padding[part] + sum(model.widths[s] for s in part.segments)
-        offset2 = segment.part.position.group_offset + model.parts_padding[segment.part] + \
-            sum(model.widths[s] for s in segment.part.segments if s.number < segment.number)
+        offset1 = model.parts_right_offset[part]
+        offset2 = model.segments_left_offset[segment]
         width2 = model.widths[segment]
-        M = max_canvas_size
+        M_begins, M_ends = get_continuity_ms(part, segment.part, vertical_continuity_tolerance)
 
-        if part is not segment.part and part.position.group_number == segment.part.position.group_number:
-            return get_clause([
-                (0, - offset1 + (offset2 + vertical_continuity_tolerance) + M*begins, M),
-                (0, offset1 - (offset2 + width2 - vertical_continuity_tolerance) + M*ends, M),
-                (0, begins + ends - 2*intersects, 1),
-                model.part_segment_begins_before[part, segment.previous]
-                >= model.part_segment_begins_before[part, segment] if not segment.is_first else pyo.Constraint.Skip,
-                model.part_segment_ends_after[part, segment.previous]
-                <= model.part_segment_ends_after[part, segment] if not segment.is_first else pyo.Constraint.Skip
-            ], current_clause)
-        else:
-            return pyo.Constraint.Skip
+        return get_clause([
+            (0, - offset1 + (offset2 + vertical_continuity_tolerance) + M_begins*begins, M_begins),
+            (0, offset1 - (offset2 + width2 - vertical_continuity_tolerance) + M_ends*ends, M_ends),
+            (0, begins + ends - 2*intersects, 1),
+            model.part_segment_begins_before[part, segment.previous]
+            >= model.part_segment_begins_before[part, segment] if not segment.is_first else pyo.Constraint.Skip,
+            model.part_segment_ends_after[part, segment.previous]
+            <= model.part_segment_ends_after[part, segment] if not segment.is_first else pyo.Constraint.Skip
+        ], current_clause)
 
     model.vertical_continuity_part_ending = pyo.Constraint(
-        model.parts, model.segments, pyo.RangeSet(clause_count := 5), rule=vertical_continuity_part_ending)
+        model.part_segment_pairs, pyo.RangeSet(clause_count := 5), rule=vertical_continuity_part_ending)
 
     # WIDTH PATTERN RULES
 
-    def is_previous_width_not_same(model: KitchenModel, segment: Segment) -> Any:
+    def get_grid_indicator(difference: Any, difference_max: float, threshold: float, binary: Any, current_clause: int) -> Any:
+        """binary <=> (difference >= threshold) for the differences which are multiples of the width grid (so is the threshold) \n
+        binary = 0 => difference <= the previous multiple, so no tolerance is needed between the two cases"""
+        assert width_grid is not None
+        below = threshold - width_grid
+        return get_clause([difference >= threshold * binary, difference <= below + (difference_max - below) * binary], current_clause)
+
+    def get_grid_threshold(tolerance: float, inclusive: bool) -> float:
+        """the smallest multiple of the width grid which is at least (or above, if not inclusive) the tolerance"""
+        assert width_grid is not None
+        steps = tolerance / width_grid
+        return (math.ceil(steps - WIDTH_STEP_EPSILON) if inclusive else math.floor(steps + WIDTH_STEP_EPSILON) + 1) * width_grid
+
+    def is_previous_width_not_same(model: KitchenModel, segment: Segment, current_clause: int) -> Any:
         """does the previous segment have almost the same width as the current segment? (we use negation here) \n
         segments_width_not_same <=> (segments_width_difference >= width_same_tolerance)"""
-        M = max_fixture_width
+        if width_grid is not None:
+            return get_grid_indicator(model.segments_width_difference[segment], bounds.segments_width_difference[segment],
+                                      get_grid_threshold(width_same_tolerance, True), model.segments_width_not_same[segment], current_clause)
+        elif current_clause > 1:
+            return pyo.Constraint.Skip
+
+        M = get_indicator_m(width_same_tolerance - bounds.segments_width_difference[segment], width_same_tolerance)
         return (0, width_same_tolerance - model.segments_width_difference[segment] + M * model.segments_width_not_same[segment], M)
 
-    model.is_previous_width_not_same = pyo.Constraint(model.segments, rule=is_previous_width_not_same)
+    model.is_previous_width_not_same = pyo.Constraint(
+        model.segments, pyo.RangeSet(clause_count := 2), rule=is_previous_width_not_same)
 
-    def is_previous_width_different(model: KitchenModel, segment: Segment) -> Any:
+    def is_previous_width_different(model: KitchenModel, segment: Segment, current_clause: int) -> Any:
         """does the previous segment have different width than the current segment? \n
         segments_width_really_different <=> (segments_width_difference >= width_different_tolerance)"""
-        M = max_fixture_width
+        if width_grid is not None:
+            return get_grid_indicator(model.segments_width_difference[segment], bounds.segments_width_difference[segment],
+                                      get_grid_threshold(width_different_tolerance, True),
+                                      model.segments_width_really_different[segment], current_clause)
+        elif current_clause > 1:
+            return pyo.Constraint.Skip
+
+        M = get_indicator_m(width_different_tolerance - bounds.segments_width_difference[segment], width_different_tolerance)
         return (0, width_different_tolerance - model.segments_width_difference[segment] + M * model.segments_width_really_different[segment], M)
 
-    model.is_previous_width_different = pyo.Constraint(model.segments, rule=is_previous_width_different)
+    model.is_previous_width_different = pyo.Constraint(
+        model.segments, pyo.RangeSet(clause_count := 2), rule=is_previous_width_different)
 
     def different_implies_not_same(model: KitchenModel, segment: Segment) -> Any:
         return model.segments_width_really_different[segment] <= model.segments_width_not_same[segment]
 
     model.different_implies_not_same = pyo.Constraint(model.segments, rule=different_implies_not_same)
 
-    def is_penultimate_width_similar(model: KitchenModel, segment: Segment) -> Any:
+    def is_penultimate_width_similar(model: KitchenModel, segment: Segment, current_clause: int) -> Any:
         """segments_penult_similar <=> (segments_penult_width_difference <= width_penult_similar_tolerance)"""
-        M = max_fixture_width
+        if width_grid is not None:
+            return get_grid_indicator(model.segments_penult_width_difference[segment], bounds.segments_penult_width_difference[segment],
+                                      get_grid_threshold(width_penult_similar_tolerance, False),
+                                      1 - model.segments_penult_similar[segment], current_clause)
+        elif current_clause > 1:
+            return pyo.Constraint.Skip
+
+        M = get_indicator_m(-width_penult_similar_tolerance,
+                            bounds.segments_penult_width_difference[segment] - width_penult_similar_tolerance)
         return (0, model.segments_penult_width_difference[segment] - width_penult_similar_tolerance + M * model.segments_penult_similar[segment], M)
 
-    model.is_penultimate_width_similar = pyo.Constraint(model.segments, rule=is_penultimate_width_similar)
+    model.is_penultimate_width_similar = pyo.Constraint(
+        model.segments, pyo.RangeSet(clause_count := 2), rule=is_penultimate_width_similar)
 
     def is_aba_pattern(model: KitchenModel, segment: Segment) -> Any:
         """segments form ABA pattern <=> the A segments have similar width & the B segment has distinct width"""
@@ -702,7 +1168,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     def get_fixture_target_distance(model: KitchenModel, fixture: Fixture, current_clause: int) -> Any:
         """calculates the distance each fixture has from the target (plumbing etc.)"""
         p = model.present[fixture]
-        M = max_canvas_size
+        MX, MY = bounds.fixtures_target_distance[fixture]
 
         x_dist = model.fixtures_target_x_dist[fixture]
         x_further = model.fixtures_target_x_further[fixture]
@@ -713,20 +1179,21 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
             fixture_x = model.fixtures_x[fixture]
             target_x = kitchen.relation_rules.targets[fixture.type][0]
             fixture_y = model.fixtures_y[fixture]
-            target_y = kitchen.relation_rules.targets[fixture.type][0]
+            target_y = kitchen.relation_rules.targets[fixture.type][1]
 
+            # the relaxed upper bounds need 2*M (see get_width_difference)
             clauses = [
-                x_dist >= target_x - fixture_x - M*(1-p),
-                x_dist >= fixture_x - target_x - M*(1-p),
-                x_dist <= target_x - fixture_x + M*x_further,
-                x_dist <= fixture_x - target_x + M*(1-x_further),
-                x_dist <= M*p,
-
-                y_dist >= target_y - fixture_y - M*(1-p),
-                y_dist >= fixture_y - target_y - M*(1-p),
-                y_dist <= target_y - fixture_y + M*y_further,
-                y_dist <= fixture_y - target_y + M*(1-y_further),
-                y_dist <= M*p,
+                x_dist >= target_x - fixture_x - MX*(1-p),
+                x_dist >= fixture_x - target_x - MX*(1-p),
+                x_dist <= target_x - fixture_x + 2*MX*x_further,
+                x_dist <= fixture_x - target_x + 2*MX*(1-x_further),
+                x_dist <= MX*p,
+
+                y_dist >= target_y - fixture_y - MY*(1-p),
+                y_dist >= fixture_y - target_y - MY*(1-p),
+                y_dist <= target_y - fixture_y + 2*MY*y_further,
+                y_dist <= fixture_y - target_y + 2*MY*(1-y_further),
+                y_dist <= MY*p,
             ]
             return get_clause(clauses, current_clause)
         elif current_clause == 1:
@@ -751,10 +1218,12 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
             present1 = model.present_groups[group, fixture1]
             present2 = model.present_groups[group, fixture2]
             fo = model.min_dist_fixtures_order[fixture1, fixture2]
-            M = max_canvas_size
+            # the offsets are non-negative
+            M1 = bounds.fixtures_offset[fixture1] + bounds.fixtures_width[fixture1] + md
+            M2 = bounds.fixtures_offset[fixture2] + bounds.fixtures_width[fixture2] + md
             return get_clause([
-                offset1 + width1 + md <= offset2 + M*fo + M*(2-present1-present2),
-                offset2 + width2 + md <= offset1 + M*(1-fo) + M*(2-present1-present2)
+                offset1 + width1 + md <= offset2 + M1*fo + M1*(2-present1-present2),
+                offset2 + width2 + md <= offset1 + M2*(1-fo) + M2*(2-present1-present2)
             ], current_clause)
         else:
             return pyo.Constraint.Skip
@@ -768,16 +1237,17 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         if group in kitchen.walls and fixture.type in kitchen.relation_rules.wall_distances:
             suggested_min_dist = kitchen.relation_rules.wall_distances[fixture.type]
             wrong_group = 1-model.present_groups[group, fixture]
-            M = max_canvas_size
             fixture_left = model.fixtures_offset[fixture]
             fixture_right = fixture_left + model.fixtures_width[fixture]
             wall_left = kitchen.walls[group].left
             wall_right = kitchen.walls[group].right
             close_to_wall = model.fixtures_close_to_wall[fixture]
+            M_left = max(0, wall_left + suggested_min_dist)
+            M_right = max(0, bounds.fixtures_offset[fixture] + bounds.fixtures_width[fixture] + suggested_min_dist - wall_right)
 
             return get_clause([
-                wall_left + suggested_min_dist <= fixture_left + M*wrong_group + M*close_to_wall,
-                fixture_right + suggested_min_dist <= wall_right + M*wrong_group + M*close_to_wall,
+                wall_left + suggested_min_dist <= fixture_left + M_left*wrong_group + M_left*close_to_wall,
+                fixture_right + suggested_min_dist <= wall_right + M_right*wrong_group + M_right*close_to_wall,
             ], current_clause)
         else:
             return pyo.Constraint.Skip
@@ -788,7 +1258,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     def is_wide_enough(model: KitchenModel, fixture: Fixture) -> Any:
         if fixture.type in kitchen.relation_rules.one_wide:
             required_width = kitchen.relation_rules.one_wide[fixture.type]
-            M = max_fixture_width
+            M = get_indicator_m(required_width - bounds.fixtures_width[fixture], required_width)
             return (0, required_width - model.fixtures_width[fixture] + M * model.fixtures_wide_enough[fixture], M)
         else:
             return pyo.Constraint.Skip
@@ -802,10 +1272,13 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
     # WORKTOP RULES
 
+    # the continuous worktop cannot be longer than its part (see the bounds of segments_continuous_worktop_left/right)
+
     def worktop_width_unused_segments(model: KitchenModel, segment: Segment, current_clause: int) -> Any:
+        M = model.segments_continuous_worktop_left[segment].ub
         return get_clause([
-            model.segments_continuous_worktop_left[segment] <= max_canvas_size * model.used[segment],
-            model.segments_continuous_worktop_right[segment] <= max_canvas_size * model.used[segment],
+            model.segments_continuous_worktop_left[segment] <= M * model.used[segment],
+            model.segments_continuous_worktop_right[segment] <= M * model.used[segment],
         ], current_clause)
 
     model.worktop_width_unused_segments = pyo.Constraint(
@@ -814,29 +1287,30 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     def worktop_width_fixtures(model: KitchenModel, segment: Segment, fixture: Fixture, current_clause: int) -> Any:
         wl = model.segments_continuous_worktop_left[segment]
         wr = model.segments_continuous_worktop_right[segment]
+        M = wl.ub
 
         if fixture.has_worktop:
             previous = 0 if segment.is_first else model.segments_continuous_worktop_left[segment.previous]
             next = 0 if segment.is_last else model.segments_continuous_worktop_right[segment.next]
             return get_clause([
-                previous + model.widths[segment] <= wl + (1-model.pairs[segment, fixture])*max_canvas_size,
-                wl <= previous + model.widths[segment] + (1-model.pairs[segment, fixture])*max_canvas_size,
-                next + model.widths[segment] <= wr + (1-model.pairs[segment, fixture])*max_canvas_size,
-                wr <= next + model.widths[segment] + (1-model.pairs[segment, fixture])*max_canvas_size,
+                previous + model.widths[segment] <= wl + (1-model.pairs[segment, fixture])*M,
+                wl <= previous + model.widths[segment] + (1-model.pairs[segment, fixture])*M,
+                next + model.widths[segment] <= wr + (1-model.pairs[segment, fixture])*M,
+                wr <= next + model.widths[segment] + (1-model.pairs[segment, fixture])*M,
             ], current_clause)
         else:
             return get_clause([
-                wl <= (1-model.pairs[segment, fixture])*max_canvas_size,
-                wr <= (1-model.pairs[segment, fixture])*max_canvas_size,
+                wl <= (1-model.pairs[segment, fixture])*M,
+                wr <= (1-model.pairs[segment, fixture])*M,
                 pyo.Constraint.Skip,
                 pyo.Constraint.Skip,
             ], current_clause)
 
     model.worktop_width_fixtures = pyo.Constraint(
-        model.segments, model.fixtures, pyo.RangeSet(clause_count := 4), rule=worktop_width_fixtures)
+        model.compatible_pairs, pyo.RangeSet(clause_count := 4), rule=worktop_width_fixtures)
 
     def worktop_max_segments(model: KitchenModel, segment: Segment, current_clause: int) -> Any:
-        M = max_canvas_size
+        M = bounds.worktop
         return get_clause([
             model.segments_continuous_worktop_left[segment] <= model.widest_worktop,
             model.widest_worktop <= model.segments_continuous_worktop_left[segment] + (
@@ -849,12 +1323,12 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         expr=sum(model.segments_continuous_worktop_left_max[s] for s in model.segments) >= 1)
 
     def worktop_required(model: KitchenModel, segment: Segment, fixture: Fixture, current_clause: int) -> Any:
-        M = max_canvas_size
         is_left = model.segments_continuous_worktop_required_left[segment]
         p = model.pairs[segment, fixture]
 
         if fixture.type in kitchen.relation_rules.min_worktops:
             rw = kitchen.relation_rules.min_worktops[fixture.type]
+            M = max(0, rw)  # the worktops are non-negative
             left_rule = (is_left <= 0 if segment.is_first else
                          rw <= model.segments_continuous_worktop_left[segment.previous] + (1-is_left)*M + (1-p)*M)
             right_rule = (is_left >= 1 if segment.is_last else
@@ -863,8 +1337,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         else:
             return pyo.Constraint.Skip
 
-    model.worktop_required = pyo.Constraint(model.segments, model.fixtures,
-                                            pyo.RangeSet(clause_count := 2), rule=worktop_required)
+    model.worktop_required = pyo.Constraint(model.compatible_pairs, pyo.RangeSet(clause_count := 2), rule=worktop_required)
 
     # CORNER RULES
 
@@ -886,10 +1359,10 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
     model.corner_not_empty = pyo.Constraint(model.corners, pyo.RangeSet(clause_count := 4), rule=corner_not_empty)
 
     def segment_check_corner(model: KitchenModel, corner: Corner, segment: Segment, current_clause: int) -> Any:
-        M = max_canvas_size
-
         def corner_clause(part: KitchenPart, part2: KitchenPart, left: bool, number: int) -> Any:
-            release = M*(1-model.corners_segment[corner, segment])
+            # a - b lies in [-part2.depth, part.width - part2.depth], the segment lies in the part
+            M = get_indicator_m(-part2.depth, part.width - part2.depth)
+            release = part.width*(1-model.corners_segment[corner, segment])
 
             if left:
                 a = model.segments_offset[segment]
@@ -931,7 +1404,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         else:
             return model.pairs[segment, fixture] <= 1-segment_is_corner
 
-    model.fixture_in_corner = pyo.Constraint(model.segments, model.fixtures, rule=fixture_in_corner)
+    model.fixture_in_corner = pyo.Constraint(model.compatible_pairs, rule=fixture_in_corner)
 
     def corner_order(model: KitchenModel, corner: Corner, segment: Segment, fixture: Fixture) -> Any:
         if segment.part is corner.part1 and fixture.second_corner_fixture is None and fixture.is_corner:
@@ -941,7 +1414,7 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         else:
             return pyo.Constraint.Skip
 
-    model.corner_order = pyo.Constraint(model.corners, model.segments, model.fixtures, rule=corner_order)
+    model.corner_order = pyo.Constraint(model.corners, model.compatible_pairs, rule=corner_order)
 
     def get_corner_fixture(model: KitchenModel, corner: Corner, segment: Segment, fixture: Fixture, current_clause: int) -> Any:
         p = model.pairs[segment, fixture]
@@ -949,11 +1422,15 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
         return get_clause([
             model.corners_segment[corner, segment] <= model.corners_fixture[corner, fixture] + (1-p),
             model.corners_fixture[corner, fixture] <= model.corners_segment[corner, segment] + (1-p),
-            model.corners_fixture[corner, fixture] <= model.present[fixture]
         ], current_clause)
 
-    model.get_corner_fixture = pyo.Constraint(model.corners, model.segments,
-                                              model.fixtures, pyo.RangeSet(clause_count := 3), rule=get_corner_fixture)
+    model.get_corner_fixture = pyo.Constraint(model.corners, model.compatible_pairs,
+                                              pyo.RangeSet(clause_count := 2), rule=get_corner_fixture)
+
+    def corner_fixture_present(model: KitchenModel, corner: Corner, fixture: Fixture) -> Any:
+        return model.corners_fixture[corner, fixture] <= model.present[fixture]
+
+    model.corner_fixture_present = pyo.Constraint(model.corners, model.fixtures, rule=corner_fixture_present)
 
     def sync_corner_fixtures(model: KitchenModel, corner: Corner, fixture: Fixture) -> Any:
         if fixture.is_corner and fixture.second_corner_fixture is not None:
@@ -966,49 +1443,59 @@ def set_constraints(kitchen: Kitchen, model: KitchenModel) -> None:
 
 def set_objective(model: KitchenModel) -> None:
     def fitness(model: KitchenModel) -> Any:
-        # maximize present fixtures
-        present = sum(model.present[fixture] for fixture in model.fixtures) * 10
+        return sum(get_objective_terms(model).values())
 
-        # maximize total width
-        width = (sum(model.widths[segment] for segment in model.segments) -
-                 sum(part.width for part in model.parts)) * 5
+    model.fitness = pyo.Objective(rule=fitness, sense=pyo.maximize)
 
-        # maximize storage (width can be multiplied instead of present?)
-        storage = sum(model.present[fixture] * fixture.storage for fixture in model.fixtures if fixture.storage > 0) * 2
-        storage *= model.param_storage
 
-        # maximize worktop (width can be multiplied instead of present?)
-        worktop = sum(model.present[fixture] for fixture in model.fixtures if fixture.has_worktop) * 1
-        # maximize the widest worktop; expensive (7)
-        worktop += model.widest_worktop * 1
-        worktop *= model.param_worktop
+def get_objective_terms(model: KitchenModel) -> dict[str, Any]:
+    """the terms of the objective by their names (used by the objective tiers, see ObjectiveTier), fitness is their sum"""
+    # maximize present fixtures
+    present = sum(model.present[fixture] for fixture in model.fixtures) * 10
 
-        # minimize width differences
-        width_patterns = sum(model.segments_width_not_same[segment] for segment in model.segments) * -10
-        width_patterns += sum(model.segments_pattern_aba[segment] for segment in model.segments) * 10
+    # maximize total width
+    width = (sum(model.widths[segment] for segment in model.segments) -
+             sum(part.width for part in model.parts)) * 5
 
-        # minimize vertical non-continuities
-        intersections = sum(model.segment_intersects[s, t] for s in model.segments for t in model.segments) * -2
-        intersections += sum(model.part_segment_intersects[p, s] for s in model.segments for p in model.parts) * -2
+    # maximize storage (width can be multiplied instead of present?)
+    storage = sum(model.present[fixture] * fixture.storage for fixture in model.fixtures if fixture.storage > 0) * 2
+    storage *= model.param_storage
 
-        # minimize zone distances; expensive (3)
-        zone_dist = sum(model.fixtures_zone_x_dist[fixture] +
-                        model.fixtures_zone_y_dist[fixture] for fixture in model.fixtures) * -1
+    # maximize worktop (width can be multiplied instead of present?)
+    worktop = sum(model.present[fixture] for fixture in model.fixtures if fixture.has_worktop) * 1
+    # maximize the widest worktop; expensive (7)
+    worktop += model.widest_worktop * 1
+    worktop *= model.param_worktop
 
-        # minimize distance from optimal centers
-        center_dist = sum(model.zones_x_dist[zone] + model.zones_y_dist[zone] for zone in model.zones) * -1
+    # minimize width differences
+    width_patterns = sum(model.segments_width_not_same[segment] for segment in model.segments) * -10
+    width_patterns += sum(model.segments_pattern_aba[segment] for segment in model.segments) * 10
 
-        # minimize target distances
-        target_dist = sum(model.fixtures_target_x_dist[fixture] +
-                          model.fixtures_target_y_dist[fixture] for fixture in model.fixtures) * -1
+    # minimize vertical non-continuities
+    intersections = sum(model.segment_intersects[s, t] for s, t in model.segment_pairs) * -2
+    intersections += sum(model.part_segment_intersects[p, s] for p, s in model.part_segment_pairs) * -2
 
-        # minimize fixtures too close to wall
-        close_to_wall = sum(model.fixtures_close_to_wall[fixture] for fixture in model.fixtures) * -10
+    # minimize zone distances; expensive (3)
+    zone_dist = sum(model.fixtures_zone_x_dist[fixture] +
+                    model.fixtures_zone_y_dist[fixture] for fixture in model.fixtures) * -1
 
-        return (present + width + width_patterns + target_dist + zone_dist + center_dist + storage + worktop
-                + intersections + close_to_wall)
+    # minimize distance from optimal centers
+    center_dist = sum(model.zones_x_dist[zone] + model.zones_y_dist[zone] for zone in model.zones) * -1
 
-    model.fitness = pyo.Objective(rule=fitness, sense=pyo.maximize)
+    # maximize neighbouring fixtures of the same zone
+    zone_adjacency = sum(model.zones_adjacent[segment, zone] for segment in model.segments for zone in model.adjacency_zones)
+    zone_adjacency *= ZONE_ADJACENCY_REWARD
+
+    # minimize target distances
+    target_dist = sum(model.fixtures_target_x_dist[fixture] +
+                      model.fixtures_target_y_dist[fixture] for fixture in model.fixtures) * -1
+
+    # minimize fixtures too close to wall
+    close_to_wall = sum(model.fixtures_close_to_wall[fixture] for fixture in model.fixtures) * -10
+
+    return {'present': present, 'width': width, 'width_patterns': width_patterns, 'targets': target_dist,
+            'zones': zone_dist + center_dist + zone_adjacency, 'storage': storage, 'worktop': worktop,
+            'intersections': intersections, 'close_to_wall': close_to_wall}
 
 
 def deactivate_components(model: KitchenModel) -> None:
@@ -1022,6 +1509,7 @@ def deactivate_components(model: KitchenModel) -> None:
     # model.get_zone_coordinates_sums.deactivate()
     # model.get_fixture_zone_distance.deactivate()
     # model.get_zone_center_distance.deactivate()
+    # model.get_zone_adjacency.deactivate()
     # VERTICAL CONTINUITY RULES
     # model.vertical_continuity_segments_beginning.deactivate()
     # model.vertical_continuity_part_ending.deactivate()
@@ -1050,25 +1538,415 @@ def deactivate_components(model: KitchenModel) -> None:
     # model.fixture_in_corner.deactivate()
     # model.corner_order.deactivate()
     # model.get_corner_fixture.deactivate()
+    # model.corner_fixture_present.deactivate()
     # model.sync_corner_fixtures.deactivate()
     return
 
 
-def find_model(model: KitchenModel, args: Args) -> None:
-    SUPPORTED_SOLVERS = ['glpk', 'cbc', 'gurobi_direct']
+def get_incumbent_writer(kitchen: Kitchen, model: KitchenModel, args: Args) -> Callable[[], None] | None:
+    """returns a function streaming the solution currently loaded in the model (if requested by args)"""
+    destination = args.incumbents
+
+    if destination is None:
+        return None
+
+    produce_output.clear_stream(destination)
+
+    def write_incumbent() -> None:
+        save_result(kitchen, model)
+        produce_output.stream(kitchen, destination)
+
+    return write_incumbent
+
 
-    if args.solver in SUPPORTED_SOLVERS:
-        solver = args.solver
+def find_model(model: KitchenModel, args: Args, on_incumbent: Callable[[], None] | None = None) -> Any:
+    """solves the model; on_incumbent is called whenever an improved solution is loaded into the model \n
+    the incumbents are reported during the solve only by gurobi, other solvers report just the final solution"""
+    solver = get_solver_name(args)
+    options = get_solver_options(solver, args)
+
+    if on_incumbent is not None and solver == 'gurobi_direct':
+        # callbacks are available only in the persistent interface
+        opt = pyo.SolverFactory('gurobi_persistent')
+        opt.set_instance(model)
+        opt.set_callback(get_incumbent_callback(model, on_incumbent))
+        results = opt.solve(tee=True, options=options, warmstart=use_warmstart(opt, args))
     else:
-        solver = 'gurobi_direct'
+        opt = pyo.SolverFactory(solver)
+        results = opt.solve(model, tee=True, options=options, warmstart=use_warmstart(opt, args))
 
-    opt = pyo.SolverFactory(solver)
-    result_obj = opt.solve(model, tee=True)
+        if on_incumbent is not None and has_solution(results):
+            on_incumbent()
 
     if args.model:
         with open(args.model, 'w') as model_file:
             model.pprint(model_file)
 
+    return results
+
+
+def find_model_decomposed(kitchen: Kitchen, model: KitchenModel, args: Args,
+                          on_incumbent: Callable[[], None] | None = None) -> tuple[Any, bool]:
+    """solves the bottom row first and then the top row (args.decompose) \n
+    1. the model without vertical continuity (the tall fixtures still join the bottom and the top parts), \n
+    2. the bottom parts are fixed, so the continuity constraints only bound the top segments by constants, \n
+    3. with args.polish, the whole model is solved from the combined design for args.polish seconds \n
+    the stages share the time limit (the first one gets at most a half), \n
+    returns the results of the last stage and whether its bound holds for the whole model"""
+    bottom_parts = [part for part in kitchen.parts if not part.is_top]
+
+    if len(bottom_parts) == len(kitchen.parts) or len(get_segment_pairs(kitchen)) + len(get_part_segment_pairs(kitchen)) == 0:
+        print('the kitchen has no top parts joined to the bottom ones by vertical continuity, solving the whole model')
+        return find_model(model, args, on_incumbent), True
+
+    deadline = time.perf_counter() + args.time_limit if args.time_limit is not None else None
+
+    def get_stage_args(share: float) -> Args:
+        # the current values of the variables (the result of the previous stage) are the MIP start (see use_warmstart)
+        time_limit = max(0, deadline - time.perf_counter()) * share if deadline is not None else None
+        return dataclasses.replace(args, time_limit=time_limit, greedy_start=args.greedy_start or share == 1)
+
+    continuity_vars = [var for component in [model.segment_begins_before, model.segment_ends_after, model.segment_intersects,
+                                             model.part_segment_begins_before, model.part_segment_ends_after,
+                                             model.part_segment_intersects]
+                       for var in component.values() if not var.fixed]
+    continuity_constraints = [model.vertical_continuity_segments_beginning, model.vertical_continuity_part_ending]
+
+    for constraint in continuity_constraints:
+        constraint.deactivate()
+    for var in continuity_vars:
+        var.fix(0)
+
+    results = find_model(model, get_stage_args(0.5), on_incumbent)
+    print(f'decomposition, both rows without vertical continuity: {results.solver.termination_condition}')
+
+    for constraint in continuity_constraints:
+        constraint.activate()
+    for var in continuity_vars:
+        # left to the solver to complete the MIP start
+        var.unfix()
+        var.set_value(None)
+
+    if not has_solution(results):
+        return results, False
+
+    bottom_vars = fix_design(model, bottom_parts)
+    results = find_model(model, get_stage_args(1), on_incumbent)
+    print(f'decomposition, top row with the bottom row fixed: {results.solver.termination_condition}')
+
+    for var in bottom_vars:
+        var.unfix()
+
+    if args.polish is None or not has_solution(results):
+        return results, False
+
+    results = find_model(model, dataclasses.replace(args, time_limit=args.polish, greedy_start=True), on_incumbent)
+    print(f'decomposition, polish of the whole model: {results.solver.termination_condition}')
+    return results, True
+
+
+def find_model_hierarchical(kitchen: Kitchen, model: KitchenModel, args: Args,
+                            on_incumbent: Callable[[], None] | None = None) -> Any:
+    """maximizes the objective tiers (preferences.tiers) one by one, a solved tier is bounded from below by its value \n
+    less its gap, so the lower tiers only choose among its (nearly) best designs \n
+    the tiers share the time limit equally, returns the results of the last tier solved"""
+    deadline = time.perf_counter() + args.time_limit if args.time_limit is not None else None
+    tiers = get_tier_objectives(kitchen, model)
+    model.fitness.deactivate()
+    model.tier_bounds = pyo.ConstraintList()
+    solved = None
+
+    for number, (objective, gap) in enumerate(tiers):
+        if isinstance(objective, (int, float)):
+            # e.g. a tier of the intersections in a kitchen without the top row
+            continue
+
+        # the design of the previous tier is the MIP start (see use_warmstart)
+        time_limit = max(0, deadline - time.perf_counter()) / (len(tiers) - number) if deadline is not None else None
+        tier_args = dataclasses.replace(args, time_limit=time_limit, greedy_start=args.greedy_start or solved is not None)
+        model.tier_objective = pyo.Objective(expr=objective, sense=pyo.maximize)
+        results = find_model(model, tier_args, on_incumbent)
+        model.del_component(model.tier_objective)
+        print(f'objective tier {number + 1}: {results.solver.termination_condition}')
+
+        value = pyo.value(objective, exception=False) if has_solution(results) else None
+
+        if value is None:
+            break
+
+        solved = results
+        model.tier_bounds.add(objective >= value - max(gap * abs(value), TIER_TOLERANCE * max(1, abs(value))))
+
+    model.del_component(model.tier_bounds)
+    model.fitness.activate()
+    # a tier which is not solved leaves the design of the previous one
+    return solved if solved is not None else results
+
+
+def get_tier_objectives(kitchen: Kitchen, model: KitchenModel) -> list[tuple[Any, float]]:
+    """objectives of the tiers with their gaps, the terms in no tier form the last one (model can be the gurobipy view)"""
+    terms = get_objective_terms(model)
+    tiers = kitchen.preferences.tiers
+    rest = [name for name in terms if all(name not in tier.terms for tier in tiers)]
+    return [(sum(terms[name] for name in tier.terms), tier.gap) for tier in tiers + ([ObjectiveTier(rest)] if len(rest) > 0 else [])]
+
+
+def fix_design(model: KitchenModel, parts: list[KitchenPart]) -> list[Any]:
+    """fixes the fixtures, the widths and the padding of the parts to the current values of the variables, \n
+    returns the variables fixed (the ones which were not fixed before)"""
+    segments = [segment for part in parts for segment in part.segments]
+    variables = [var for var in ([model.pairs[segment, fixture] for segment in segments for fixture in model.segment_fixtures[segment]]
+                                 + [model.used[segment] for segment in segments] + [model.widths[segment] for segment in segments]
+                                 + [model.parts_padding[part] for part in parts]) if not var.fixed]
+
+    for var in variables:
+        var.fix(round(var.value) if var.is_integer() else var.value)
+
+    return variables
+
+
+def complete_start(kitchen: Kitchen, model: KitchenModel, args: Args, name: str, keep_partial: bool) -> Args:
+    """the design stored in the kitchen (set_start) becomes a complete MIP start: the model is solved with the design fixed \n
+    (in at most a half of the time limit), as not every solver completes a partial start, returns the arguments of the solve from it \n
+    if the design is not feasible (e.g. it breaks a rule coupling the groups or a min distance), \n
+    the partial start is left to the solver (keep_partial) or the solve does not start from it"""
+    deadline = time.perf_counter() + args.time_limit if args.time_limit is not None else None
+    fixed = fix_design(model, kitchen.parts)
+    results = find_model(model, dataclasses.replace(args, time_limit=args.time_limit / 2 if args.time_limit is not None else None,
+                                                    greedy_start=True))
+    print(f'completion of the {name}: {results.solver.termination_condition}')
+
+    for var in fixed:
+        var.unfix()
+
+    time_limit = max(0, deadline - time.perf_counter()) if deadline is not None else None
+
+    if has_solution(results):
+        return dataclasses.replace(args, time_limit=time_limit, greedy_start=True)
+    elif keep_partial:
+        set_start(kitchen, model)
+        return dataclasses.replace(args, time_limit=time_limit, greedy_start=True)
+    else:
+        print(f'the {name} is not feasible, solving without a start')
+        return dataclasses.replace(args, time_limit=time_limit, greedy_start=False)
+
+
+def use_warmstart(opt: Any, args: Args) -> bool:
+    return wants_warmstart(args) and bool(opt.warm_start_capable())
+
+
+def wants_warmstart(args: Args) -> bool:
+    """the current values of the variables are passed to the solver as a MIP start (see set_start)"""
+    return args.greedy_start or args.previous is not None
+
+
+def set_previous(kitchen: Kitchen, model: KitchenModel, args: Args) -> None:
+    """the previous design (args.previous) is the MIP start, with args.fix_unchanged (the input of the previous design) \n
+    the parts which are not affected by the changes of the input keep their fixtures (their widths can still change)"""
+    assert args.previous is not None
+    load_input.load_solution(kitchen, load_input.load_output(args.previous))
+    set_start(kitchen, model)
+
+    if args.fix_unchanged is None or kitchen.source is None:
+        return
+
+    parts = incremental.get_unchanged_parts(kitchen, load_input.load_data_from_files(args.fix_unchanged))
+    fixed_parts = [part for part in parts if fix_assignments(model, part)]
+    print(f'fixed the fixtures of the unchanged parts: {", ".join(part.name for part in fixed_parts) or "none"}')
+
+
+def fix_assignments(model: KitchenModel, part: KitchenPart) -> bool:
+    """fixes the fixtures of the part to the values of the MIP start, False if they do not fit the segments any more"""
+    if any(segment.fixture is not None and segment.fixture not in model.segment_fixtures[segment] for segment in part.segments):
+        return False
+
+    for segment in part.segments:
+        model.used[segment].fix(int(segment.fixture is not None))
+
+        for fixture in model.segment_fixtures[segment]:
+            model.pairs[segment, fixture].fix(int(segment.fixture is fixture))
+
+    return True
+
+
+def set_start(kitchen: Kitchen, model: KitchenModel) -> None:
+    """loads the layout stored in the kitchen (the inverse of save_result) as values of the variables \n
+    the values of other variables are cleared, so the solver completes them instead of checking their initial values"""
+    for var in model.component_data_objects(pyo.Var):
+        var.set_value(None)
+
+    for part in kitchen.parts:
+        model.parts_padding[part].set_value(part.position.padding)
+
+    for segment in kitchen.segments:
+        model.used[segment].set_value(int(segment.fixture is not None))
+        model.widths[segment].set_value(segment.width)
+
+        for fixture in model.segment_fixtures[segment]:
+            model.pairs[segment, fixture].set_value(int(segment.fixture is fixture))
+
+    for fixture in kitchen.fixtures:
+        model.present[fixture].set_value(sum(segment.fixture is fixture for segment in kitchen.segments))
+
+
+def has_solution(results: Any) -> bool:
+    """the solver found a solution (it is loaded into the model), a solver stopped by a limit might have none \n
+    (only gurobi reports the number of the solutions found)"""
+    return (results.solver.termination_condition not in [pyo.TerminationCondition.infeasible,
+                                                         pyo.TerminationCondition.infeasibleOrUnbounded,
+                                                         pyo.TerminationCondition.noSolution,
+                                                         pyo.TerminationCondition.error]
+            and getattr(results.problem, 'number_of_solutions', 1) > 0)
+
+
+def get_gap(bound: float | None, objective: float) -> float | None:
+    """relative gap between the objective and the bound reported by the solver (the objective is maximized)"""
+    if bound is None or not math.isfinite(bound):
+        return None
+
+    return abs(bound - objective) / max(abs(objective), 1e-10)
+
+
+def get_solver_name(args: Args) -> str:
+    if args.backend == 'gurobipy':
+        return 'gurobi_direct'
+    elif args.solver in SUPPORTED_SOLVERS:
+        return args.solver
+    else:
+        return 'gurobi_direct'
+
+
+def get_solver_options(solver: str, args: Args) -> dict[str, Any]:
+    """translates the solver-independent limits to the solver options"""
+    options: dict[str, Any] = {}
+
+    match solver:
+        case 'glpk':
+            if args.time_limit is not None:
+                options['tmlim'] = math.ceil(args.time_limit)
+            if args.gap is not None:
+                options['mipgap'] = args.gap
+        case 'cbc':
+            if args.time_limit is not None:
+                options['sec'] = args.time_limit
+            if args.gap is not None:
+                options['ratioGap'] = args.gap
+            if args.threads is not None:
+                options['threads'] = args.threads
+        case 'gurobi_direct':
+            if args.time_limit is not None:
+                options['TimeLimit'] = args.time_limit
+            if args.gap is not None:
+                options['MIPGap'] = args.gap
+            if args.threads is not None:
+                options['Threads'] = args.threads
+
+    return options
+
+
+def get_result_vars(model: KitchenModel) -> list[Any]:
+    """variables needed by save_result"""
+    return list(model.pairs.values()) + list(model.widths.values()) + list(model.parts_padding.values())
+
+
+def get_incumbent_callback(model: KitchenModel, on_incumbent: Callable[[], None]) -> Callable[[Any, Any, Any], None]:
+    from gurobipy import GRB
+    result_vars = get_result_vars(model)
+
+    def callback(cb_model: KitchenModel, cb_opt: Any, cb_where: Any) -> None:
+        if cb_where == GRB.Callback.MIPSOL:
+            cb_opt.cbGetSolution(vars=result_vars)
+            on_incumbent()
+
+    return callback
+
+
+def find_designs(kitchen: Kitchen, model: KitchenModel, args: Args) -> list[dict[str, Any]]:
+    """finds up to args.solutions best designs which differ in the order of fixtures in some kitchen part \n
+    the model is re-solved with no-good cuts excluding the designs found so far \n
+    gurobi also collects the designs from its solution pool, so it usually needs fewer re-solves, \n
+    its model is built once (gurobi_persistent) and only the cuts are added to it \n
+    the re-solves share the time limit, each one gets the time left"""
+    deadline = time.perf_counter() + args.time_limit if args.time_limit is not None else None
+    designs: list[dict[str, Any]] = []
+    signatures: set[tuple[tuple[str, ...], ...]] = set()
+    model.design_cuts = pyo.ConstraintList()
+    solver = get_solver_name(args)
+    opt = None
+
+    if solver == 'gurobi_direct':
+        opt = pyo.SolverFactory('gurobi_persistent')
+        opt.set_instance(model)
+        result_vars = get_result_vars(model)
+
+    def add_design() -> None:
+        save_result(kitchen, model)
+        signature = get_layout_signature(kitchen)
+
+        if signature not in signatures and len(designs) < args.solutions:
+            signatures.add(signature)
+            designs.append(produce_output.get_output(kitchen))
+
+        # no-good cut: the next designs have to use different pairs or more segments
+        cut = model.design_cuts.add(
+            sum(1-model.pairs[segment, segment.fixture] for segment in kitchen.segments if segment.fixture is not None)
+            + sum(model.used[segment] for segment in kitchen.segments if segment.fixture is None) >= 1)
+
+        if opt is not None:
+            opt.add_constraint(cut)
+
+    for solve_number in range(args.solutions * CANDIDATE_SOLUTIONS_MULTIPLIER):
+        time_limit = max(0, deadline - time.perf_counter()) if deadline is not None else None
+
+        if solve_number > 0 and time_limit == 0:
+            break
+
+        solve_args = dataclasses.replace(args, time_limit=time_limit)
+
+        if opt is not None:
+            options = get_solver_options(solver, solve_args)
+            options['PoolSolutions'] = args.solutions
+            options['PoolSearchMode'] = 2  # systematic search for the best solutions
+            results = opt.solve(tee=True, options=options, warmstart=use_warmstart(opt, args))
+
+            if not has_solution(results):
+                break
+
+            # the pool is read before the cuts are added, which discards it
+            pool = []
+
+            for solution_number in range(opt.get_model_attr('SolCount')):
+                opt.set_gurobi_param('SolutionNumber', solution_number)
+                pool.append([opt.get_var_attr(var, 'Xn') for var in result_vars])
+
+            for values in pool:
+                for var, value in zip(result_vars, values):
+                    var.set_value(value, skip_validation=True)
+
+                add_design()
+        else:
+            results = find_model(model, solve_args)
+
+            if not has_solution(results):
+                break
+
+            add_design()
+
+        if len(designs) == args.solutions:
+            break
+
+    if len(designs) > 0:
+        # the best design is the first one
+        load_input.load_solution(kitchen, designs[0])
+
+    return designs
+
+
+def get_layout_signature(kitchen: Kitchen) -> tuple[tuple[str, ...], ...]:
+    """designs with the same signature have the same fixtures in the same order (copies of fixtures are not distinguished)"""
+    return tuple(tuple(segment.fixture.catalog_name for segment in part.segments if segment.fixture is not None)
+                 for part in kitchen.parts)
+
 
 def save_result(kitchen: Kitchen, model: KitchenModel) -> None:
     for part in kitchen.parts:
@@ -1080,6 +1958,9 @@ def save_result(kitchen: Kitchen, model: KitchenModel) -> None:
         if segment.width is None:
             segment.width = 0
 
-        for fixture in kitchen.fixtures:
-            if pyo.value(model.pairs[segment, fixture], exception=False):
+        # the result might be saved repeatedly (for every incumbent)
+        segment.fixture = None
+
+        for fixture in model.segment_fixtures[segment]:
+            if (pyo.value(model.pairs[segment, fixture], exception=False) or 0) > 0.5:
                 segment.fixture = fixture
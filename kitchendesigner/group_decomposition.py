@@ -0,0 +1,234 @@
+from concurrent.futures import ProcessPoolExecutor
+from kitchen import Kitchen
+from process_args import Args
+from typing import Any
+import dataclasses
+import os
+import re
+import time
+import batch
+import find_solution
+import load_input
+import produce_output
+
+# rounds of solving the clusters and removing the fixtures used by more of them (see solve_groups)
+MAX_ROUNDS = 3
+
+
+def solve_groups(kitchen: Kitchen, args: Args) -> bool:
+    """solves the clusters of groups (groups joined by corners) separately in up to args.group_jobs processes, \n
+    then loads the merged design to the kitchen (the MIP start of the joint polish), False if it cannot be used \n
+    the kitchen include rules are given to the widest cluster, the other rules which couple the clusters (one_wide) are left to the polish, \n
+    the fixtures used by more clusters than they have copies are kept in the cluster using the most of them and \n
+    the other clusters are solved again without them (a cluster which is not solved again keeps its previous design)"""
+    clusters = get_clusters(kitchen)
+
+    if len(clusters) < 2 or kitchen.source is None:
+        print('the kitchen has only one cluster of groups, solving the whole model')
+        return False
+
+    deadline = time.perf_counter() + args.time_limit if args.time_limit is not None else None
+    widest = max(range(len(clusters)), key=lambda index: get_cluster_width(kitchen, clusters[index]))
+    removed: list[set[str]] = [set() for _ in clusters]
+    designs: list[dict[str, Any] | None] = [None] * len(clusters)
+    previous_designs: dict[int, dict[str, Any]] = {}
+    jobs = args.group_jobs if args.group_jobs is not None else min(len(clusters), os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for round_number in range(1, MAX_ROUNDS + 1):
+            # the first round gets a half of the time limit, the other rounds share the rest
+            share = 0.5 if round_number == 1 else 1 / (MAX_ROUNDS - round_number + 1)
+            time_limit = max(0, deadline - time.perf_counter()) * share if deadline is not None else None
+            cluster_args = dataclasses.replace(args, time_limit=time_limit, decompose_groups=False, solutions=1, cache=None,
+                                               incumbents=None, model=None, structure=False, profile=None, previous=None,
+                                               fix_unchanged=None)
+            pending = [index for index, design in enumerate(designs) if design is None]
+            futures = {index: executor.submit(solve_cluster, get_cluster_document(kitchen.source, clusters[index], removed[index],
+                                                                                    includes=index == widest), cluster_args)
+                       for index in pending}
+
+            for index, future in futures.items():
+                designs[index], status = future.result()
+                print(f'groups {", ".join(str(group) for group in clusters[index])}: {status}')
+
+                if designs[index] is None and index in previous_designs:
+                    # the merge leaves out the copies above the count
+                    designs[index] = previous_designs[index]
+                    print('keeping the previous design of the groups')
+
+            if any(design is None for design in designs):
+                print('some groups were not solved, solving the whole model')
+                return False
+
+            conflicts = get_conflicts(kitchen, designs)
+
+            if len(conflicts) == 0 or round_number == MAX_ROUNDS:
+                break
+
+            for catalog_name, keeping in conflicts.items():
+                for index in range(len(clusters)):
+                    design = designs[index]
+
+                    if index != keeping and design is not None and catalog_name in get_used_copies(kitchen, design):
+                        removed[index].add(catalog_name)
+                        previous_designs[index] = design
+                        designs[index] = None
+
+            print(f'fixtures used by more groups than they have copies: {", ".join(conflicts)}')
+
+    load_input.load_solution(kitchen, merge_designs(kitchen, designs))
+    return True
+
+
+def solve_cluster(document: Any, args: Args) -> tuple[dict[str, Any] | None, str]:
+    """solves the kitchen made of one cluster (in a worker process, without the solver output), returns its design and the status"""
+    report = find_solution.SolveReport()
+
+    with open(os.devnull, 'w') as devnull, batch.redirect_output(devnull.fileno()):
+        try:
+            kitchen = load_input.load_document(document)
+            find_solution.solve_kitchen(kitchen, args, report)
+            return produce_output.get_output(kitchen), f'{report.status}, objective {report.objective}'
+        except Exception as error:
+            return None, 'error: ' + str(error).splitlines()[0]
+
+
+def get_clusters(kitchen: Kitchen) -> list[list[int]]:
+    """groups joined by corners (a corner fixture belongs to both parts), sorted by their group numbers"""
+    clusters = {group: {group} for group in kitchen.groups}
+
+    for corner in kitchen.corners:
+        cluster = clusters[corner.part1.position.group_number] | clusters[corner.part2.position.group_number]
+
+        for group in cluster:
+            clusters[group] = cluster
+
+    return [list(cluster) for cluster in sorted({tuple(sorted(cluster)) for cluster in clusters.values()})]
+
+
+def get_cluster_width(kitchen: Kitchen, groups: list[int]) -> float:
+    return sum(part.width for part in kitchen.parts if part.position.group_number in groups and not part.is_top)
+
+
+def get_cluster_document(document: Any, groups: list[int], removed: set[str], includes: bool) -> Any:
+    """input document of the kitchen made of the groups, without the rules coupling it with the other groups \n
+    (the kitchen include rules are kept if includes) and without the available fixtures with the names in removed"""
+    parts = [part for part in document['kitchen_parts'] if part['position']['group_number'] in groups]
+    names = {part['name'] for part in parts}
+    return {**document,
+            'kitchen_parts': parts,
+            'walls': [wall for wall in document.get('walls', []) if wall['group'] in groups],
+            'corners': [corner for corner in document.get('corners', []) if corner['part1_name'] in names],
+            'placement_rules': [rule for rule in document.get('placement_rules', [])
+                                if (rule['area'] == 'kitchen' and (rule['rule_type'] == 'exclude' or includes))
+                                or rule.get('group') in groups],
+            'relation_rules': [rule for rule in document.get('relation_rules', []) if rule['rule_type'] != 'one_wide'],
+            'available_fixtures': [fixture for fixture in document['available_fixtures'] if fixture['name'] not in removed]}
+
+
+def get_copy(name: str, catalog_name: str) -> tuple[int, str]:
+    """number of the copy of the fixture (see load_input.load_fixtures) and the rest of its name (e.g. T, B, + for the corner copy)"""
+    rest = name[len(catalog_name):]
+    match = re.match(r'_(\d+)', rest)
+    return (int(match.group(1)), rest[match.end():]) if match is not None else (0, rest)
+
+
+def get_catalog_names(kitchen: Kitchen) -> dict[str, str]:
+    names = {fixture.name: fixture.catalog_name for fixture in kitchen.fixtures}
+    names.update({f'{fixture.name}_{i}': fixture.catalog_name for fixture in kitchen.fixtures for i in range(1, fixture.count)})
+    return names
+
+
+def get_used_copies(kitchen: Kitchen, design: dict[str, Any]) -> dict[str, list[int]]:
+    """numbers of the copies of every catalog fixture used by the design, in the order of the segments"""
+    catalog_names = get_catalog_names(kitchen)
+    copies: dict[str, list[int]] = {}
+
+    for part in kitchen.parts:
+        for fixture_data in design.get(part.name, {'fixtures': []})['fixtures']:
+            catalog_name = catalog_names.get(fixture_data['fixture'])
+
+            if catalog_name is not None:
+                copy, _ = get_copy(fixture_data['fixture'], catalog_name)
+                copies.setdefault(catalog_name, [])
+
+                if copy not in copies[catalog_name]:
+                    copies[catalog_name].append(copy)
+
+    return copies
+
+
+def get_copy_counts(kitchen: Kitchen) -> dict[str, int]:
+    copies: dict[str, set[int]] = {}
+
+    for fixture in kitchen.fixtures:
+        # a pooled fixture stands for all its cabinets (see produce_output.get_output)
+        copies.setdefault(fixture.catalog_name, set()).update(range(fixture.count) if fixture.count > 1 else
+                                                              [get_copy(fixture.name, fixture.catalog_name)[0]])
+
+    return {catalog_name: len(numbers) for catalog_name, numbers in copies.items()}
+
+
+def get_conflicts(kitchen: Kitchen, designs: list[dict[str, Any] | None]) -> dict[str, int]:
+    """catalog fixtures used by the clusters more times than they have copies, with the index of the cluster which keeps them \n
+    (the one using the most copies, the first one on a tie)"""
+    copy_counts = get_copy_counts(kitchen)
+    used: dict[str, list[int]] = {}
+
+    for design in designs:
+        copies = get_used_copies(kitchen, design) if design is not None else {}
+
+        for catalog_name in copy_counts:
+            used.setdefault(catalog_name, []).append(len(copies.get(catalog_name, [])))
+
+    return {catalog_name: counts.index(max(counts)) for catalog_name, counts in used.items() if sum(counts) > copy_counts[catalog_name]}
+
+
+def merge_designs(kitchen: Kitchen, designs: list[dict[str, Any] | None]) -> dict[str, Any]:
+    """one design of the whole kitchen, the copies of each catalog fixture are renumbered in the order of their segments \n
+    and the used copies are the last ones (absent copies come first, see sort_multiple_same_fixtures), \n
+    the segments of the copies above the count of the catalog fixture are left empty (the polish completes the design)"""
+    catalog_names = get_catalog_names(kitchen)
+    copy_counts = get_copy_counts(kitchen)
+    parts = {part.name: part for part in kitchen.parts}
+    # segment numbers of the copies of every cluster (the top halves of tall fixtures and the second corner copies are not sorted)
+    placements: dict[str, dict[tuple[int, int], int]] = {}
+
+    for index, design in enumerate(designs):
+        for part_name, part_data in (design or {}).items():
+            for fixture_data, segment in zip(part_data['fixtures'], parts[part_name].segments):
+                catalog_name = catalog_names[fixture_data['fixture']]
+                copy, rest = get_copy(fixture_data['fixture'], catalog_name)
+
+                if rest in ['', 'B']:
+                    placements.setdefault(catalog_name, {})[index, copy] = segment.number
+
+    renumbered: dict[tuple[str, int, int], int] = {}
+
+    for catalog_name, copies in placements.items():
+        kept = sorted(copies, key=lambda key: copies[key])[:copy_counts[catalog_name]]
+
+        for number, (index, copy) in enumerate(kept, start=copy_counts[catalog_name] - len(kept)):
+            renumbered[catalog_name, index, copy] = number
+
+    merged: dict[str, Any] = {}
+
+    for index, design in enumerate(designs):
+        for part_name, part_data in (design or {}).items():
+            fixtures = []
+
+            for fixture_data in part_data['fixtures']:
+                catalog_name = catalog_names[fixture_data['fixture']]
+                copy, rest = get_copy(fixture_data['fixture'], catalog_name)
+                new_copy = renumbered.get((catalog_name, index, copy))
+
+                if new_copy is not None:
+                    name = catalog_name + (f'_{new_copy}' if new_copy > 0 else '') + rest
+                    fixtures.append({**fixture_data, 'fixture': name})
+                else:
+                    # the fixtures are matched with the segments by their order (see load_input.load_solution)
+                    fixtures.append({'fixture': None, 'width': 0})
+
+            merged[part_name] = {**part_data, 'fixtures': fixtures}
+
+    return merged
@@ -0,0 +1,477 @@
+from dataclasses import dataclass
+from kitchen import Kitchen
+from presolve import get_continuity_ms
+from typing import Any, Callable
+from pyomo.repn import generate_standard_repn
+import gurobipy as gp
+from gurobipy import GRB
+import numpy as np
+import pyomo.environ as pyo
+import scipy.sparse as sp
+
+# names of the gurobi statuses in the pyomo format (see pyo.TerminationCondition)
+STATUS_NAMES = {GRB.OPTIMAL: 'optimal', GRB.TIME_LIMIT: 'maxTimeLimit', GRB.INFEASIBLE: 'infeasible',
+                GRB.INF_OR_UNBD: 'infeasibleOrUnbounded', GRB.UNBOUNDED: 'unbounded', GRB.INTERRUPTED: 'userInterrupt'}
+
+
+@dataclass
+class Clause:
+    """one row for every index of a constraint family: the sum of the terms (sparse matrices with a row for every index) \n
+    compared with the bound by the sense ('<', '>' or '='), the bound, the sense and keep can be given for every index, \n
+    the rows of the indices which are not kept are skipped"""
+    terms: list[Any]
+    sense: Any
+    bound: Any
+    keep: Any = True
+
+
+class GurobiModel:
+    """the KitchenModel as seen by the rules in set_constraints and set_objective, with gurobipy variables \n
+    the Pyomo model provides the sets and the variables (their domains and bounds), but no constraints are constructed in it: \n
+    the rows of the large families (MATRIX_FAMILIES) are assembled as sparse matrices and added at once, \n
+    the rules of the other constraints are evaluated directly to gurobipy rows, so no Pyomo expression trees are built \n
+    the solution is copied back to the Pyomo variables, so everything else (save_result, set_start) works as with Pyomo"""
+
+    def __init__(self, model: Any, kitchen: Kitchen) -> None:
+        self.__dict__['model'] = model
+        self.__dict__['kitchen'] = kitchen
+        self.__dict__['gurobi'] = gp.Model()
+        self.__dict__['variables'] = []
+        self.__dict__['gurobi_variables'] = []
+        # the columns of the variables by the names of their components and their indices
+        self.__dict__['columns'] = {}
+        self.__dict__['expression_rows'] = {}
+
+        for var in model.component_objects(pyo.Var):
+            self.add_variables(var)
+
+        self.__dict__['var_columns'] = {id(var): column for column, var in enumerate(self.variables)}
+        # the rules read the bounds of some variables
+        self.gurobi.update()
+
+    def add_variables(self, var: Any) -> None:
+        """adds all the variables of the Pyomo component at once (as one MVar)"""
+        data = list(var.values())
+        infinity = GRB.INFINITY
+        gurobi_variables = self.gurobi.addMVar(
+            len(data),
+            lb=np.array([-infinity if item.lb is None else item.lb for item in data]),
+            ub=np.array([infinity if item.ub is None else item.ub for item in data]),
+            vtype=np.array([GRB.BINARY if item.is_binary() else GRB.INTEGER if item.is_integer() else GRB.CONTINUOUS
+                            for item in data]),
+            name=var.local_name).tolist()
+        self.columns[var.local_name] = dict(zip(var.keys(), range(len(self.variables), len(self.variables) + len(data))))
+        self.variables.extend(data)
+        self.gurobi_variables.extend(gurobi_variables)
+        self.__dict__[var.local_name] = dict(zip(var.keys(), gurobi_variables)) if var.is_indexed() else gurobi_variables[0]
+
+    def __getattr__(self, name: str) -> Any:
+        """parameters are replaced by their values and expressions are translated, other attributes belong to the Pyomo model"""
+        component = self.model.component(name)
+
+        if isinstance(component, pyo.Param):
+            value = {index: pyo.value(item) for index, item in component.items()} if component.is_indexed() else pyo.value(component)
+        elif isinstance(component, pyo.Expression):
+            variables = {id(var): gurobi_var for var, gurobi_var in zip(self.variables, self.gurobi_variables)}
+            value = {index: self.translate(item.expr, variables) for index, item in component.items()}
+        else:
+            return getattr(self.model, name)
+
+        self.__dict__[name] = value
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if isinstance(value, pyo.Constraint) and name in MATRIX_FAMILIES:
+            self.add_matrix_rows(*MATRIX_FAMILIES[name](self))
+        elif isinstance(value, pyo.Constraint):
+            self.add_constraints(value)
+        elif isinstance(value, pyo.Objective):
+            # the kitchen is always maximized (see set_objective)
+            self.__dict__['fitness'] = value.rule(self, None)
+            self.gurobi.setObjective(self.fitness, GRB.MAXIMIZE)
+        else:
+            setattr(self.model, name, value)
+
+    def translate(self, expression: Any, variables: dict[int, Any]) -> Any:
+        """linear Pyomo expression to a gurobipy expression, variables maps the ids of the Pyomo variables to the gurobipy ones"""
+        repn = generate_standard_repn(expression, compute_values=True)
+        return gp.LinExpr(list(repn.linear_coefs), [variables[id(var)] for var in repn.linear_vars]) + repn.constant
+
+    def add_constraints(self, constraint: Any) -> None:
+        """evaluates the rule for every index of the declared Pyomo constraint (it is not constructed)"""
+        for index in constraint.index_set() if constraint.is_indexed() else [None]:
+            row = constraint.rule(self, index)
+
+            if row is pyo.Constraint.Skip:
+                continue
+            elif isinstance(row, tuple):
+                lower, body, upper = row
+
+                if lower is not None:
+                    self.gurobi.addLConstr(body >= lower)
+                if upper is not None:
+                    self.gurobi.addLConstr(body <= upper)
+            else:
+                self.gurobi.addLConstr(row)
+
+    def select(self, name: str, keys: list[Any], coefficients: Any = 1.0, rows: list[int] | None = None,
+               count: int | None = None) -> Any:
+        """sparse matrix with the coefficient of the variable name[key] in the row of every key (a key None has no variable), \n
+        with rows, the keys belong to the given rows (of count), so the variables of a row are summed"""
+        columns = self.columns[name]
+        present = np.array([key is not None for key in keys], dtype=bool)
+        values = np.broadcast_to(np.asarray(coefficients, dtype=float), (len(keys),))[present]
+        row_numbers = np.arange(len(keys))[present] if rows is None else np.array(rows, dtype=np.int64)[present]
+        column_numbers = np.array([columns[key] for key in keys if key is not None], dtype=np.int64)
+        return sp.csr_matrix((values, (row_numbers, column_numbers)),
+                             shape=(len(keys) if count is None else count, len(self.variables)))
+
+    def get_expression_rows(self, name: str, keys: list[Any]) -> tuple[Any, Any]:
+        """sparse matrix with the coefficients of the linear Pyomo expression name[key] in the row of every key and the constants"""
+        if name not in self.expression_rows:
+            component = self.model.component(name)
+            rows: list[int] = []
+            columns: list[int] = []
+            values: list[float] = []
+            item_constants: list[float] = []
+
+            for row, item in enumerate(component.values()):
+                repn = generate_standard_repn(item.expr, compute_values=True)
+                rows.extend([row] * len(repn.linear_vars))
+                columns.extend(self.var_columns[id(var)] for var in repn.linear_vars)
+                values.extend(repn.linear_coefs)
+                item_constants.append(repn.constant)
+
+            self.expression_rows[name] = ({key: row for row, key in enumerate(component.keys())},
+                                          sp.csr_matrix((values, (rows, columns)), shape=(len(item_constants), len(self.variables))),
+                                          np.array(item_constants, dtype=float))
+
+        index, matrix, constants = self.expression_rows[name]
+        selected = [index[key] for key in keys]
+        return matrix[selected], constants[selected]
+
+    def add_matrix_rows(self, count: int, clauses: list[Clause]) -> None:
+        """adds the clauses of a constraint family for all its count indices by one addMConstr, \n
+        the rows are ordered by the index and then by the clause (as add_constraints adds them)"""
+        if count == 0:
+            return
+
+        matrix = sp.vstack([sum(clause.terms[1:], clause.terms[0]) for clause in clauses], format='csr')
+        # the stacked row clause * count + index is moved to index * len(clauses) + clause
+        order = np.arange(len(clauses) * count).reshape(len(clauses), count).T.ravel()
+        keep = np.concatenate([np.broadcast_to(np.asarray(clause.keep, dtype=bool), (count,)) for clause in clauses])[order]
+        bounds = np.concatenate([np.broadcast_to(np.asarray(clause.bound, dtype=float), (count,)) for clause in clauses])[order]
+        senses = np.concatenate([np.broadcast_to(np.asarray(clause.sense), (count,)) for clause in clauses])[order]
+        matrix = matrix[order[keep]]
+        matrix.eliminate_zeros()
+        self.gurobi.addMConstr(matrix, None, senses[keep], bounds[keep])
+
+    def set_tiers(self, tiers: list[tuple[Any, float]]) -> None:
+        """replaces the objective by the hierarchical one (gurobi multi-objective), the first tier has the highest priority \n
+        a tier can lose its relative gap of its best value when the lower tiers are optimized"""
+        for index, (objective, gap) in enumerate(tiers):
+            self.gurobi.setObjectiveN(gp.LinExpr() + objective, index, priority=len(tiers) - index, reltol=gap, name=f'tier{index + 1}')
+
+    def solve(self, options: dict[str, Any], warmstart: bool,
+              on_incumbent: Callable[[], None] | None = None) -> tuple[str, float | None, float | None]:
+        """solves the model, the values of the Pyomo variables are the MIP start (if warmstart) and fixed variables stay fixed \n
+        returns the status, the objective and the bound, the solution is loaded to the Pyomo variables"""
+        for name, value in options.items():
+            self.gurobi.setParam(name, value)
+
+        for var, gurobi_var in zip(self.variables, self.gurobi_variables):
+            if var.fixed:
+                gurobi_var.LB = gurobi_var.UB = var.value
+            elif warmstart and var.value is not None:
+                gurobi_var.Start = var.value
+
+        def callback(_: Any, where: int) -> None:
+            if on_incumbent is not None and where == GRB.Callback.MIPSOL:
+                self.load_values(self.gurobi.cbGetSolution(self.gurobi_variables))
+                on_incumbent()
+
+        self.gurobi.optimize(callback)
+        status = STATUS_NAMES.get(self.gurobi.Status, 'other')
+
+        if self.gurobi.SolCount == 0:
+            return status, None, None
+
+        self.load_values(self.gurobi.getAttr('X', self.gurobi_variables))
+
+        if self.gurobi.NumObj > 1:
+            # the bound of the hierarchical objective does not hold for the weighted sum
+            return status, self.fitness.getValue(), None
+
+        return status, self.gurobi.ObjVal, self.gurobi.ObjBound
+
+    def load_values(self, values: list[float]) -> None:
+        for var, value in zip(self.variables, values):
+            var.set_value(value, skip_validation=True)
+
+    def get_model_size(self) -> tuple[int, int, int]:
+        """numbers of the variables, the constraints and the nonzero coefficients (see model_structure.get_model_size)"""
+        self.gurobi.update()
+        return self.gurobi.NumVars, self.gurobi.NumConstrs, self.gurobi.NumNZs
+
+    def write(self, file_name: str) -> None:
+        """writes the model in the format given by the extension (e.g. .lp, .mps)"""
+        self.gurobi.update()
+        self.gurobi.write(file_name)
+
+
+# the families of constraints assembled as sparse matrices, they are the same rows as the rules in find_solution.set_constraints
+# would add (with the same names), each family returns the number of its indices and its clauses
+
+def presence_pairs_pairing(model: GurobiModel) -> tuple[int, list[Clause]]:
+    fixtures = list(model.fixtures)
+    pairs = list(model.compatible_pairs)
+    index = {fixture: row for row, fixture in enumerate(fixtures)}
+    pairs_sums = model.select('pairs', pairs, rows=[index[fixture] for _, fixture in pairs], count=len(fixtures))
+    return len(fixtures), [Clause([model.select('present', fixtures), -pairs_sums], '=', 0)]
+
+
+def segment_used(model: GurobiModel) -> tuple[int, list[Clause]]:
+    segments = list(model.segments)
+    pairs = list(model.compatible_pairs)
+    index = {segment: row for row, segment in enumerate(segments)}
+    pairs_sums = model.select('pairs', pairs, rows=[index[segment] for segment, _ in pairs], count=len(segments))
+    return len(segments), [Clause([model.select('used', segments), -pairs_sums], '=', 0)]
+
+
+def width_rules(model: GurobiModel) -> tuple[int, list[Clause]]:
+    pairs = list(model.compatible_pairs)
+    segments = [segment for segment, _ in pairs]
+    width_min = np.array([fixture.width_min for _, fixture in pairs], dtype=float)
+    width_max = np.array([fixture.width_max for _, fixture in pairs], dtype=float)
+    M = np.array([model.bounds.segments_width[segment] for segment in segments], dtype=float) - width_max
+    widths = model.select('widths', segments)
+    return len(pairs), [
+        Clause([widths, model.select('pairs', pairs, -width_min)], '>', 0),
+        Clause([widths, model.select('pairs', pairs, M)], '<', width_max + M, keep=M > 0),
+    ]
+
+
+def get_fixtures_width_coords_offset(model: GurobiModel) -> tuple[int, list[Clause]]:
+    pairs = list(model.compatible_pairs)
+    segments = [segment for segment, _ in pairs]
+    fixtures = [fixture for _, fixture in pairs]
+    bounds = model.bounds
+    # the pooled fixtures have no variables of their own
+    keep = np.array([fixture.count == 1 for fixture in fixtures], dtype=bool)
+    clauses = []
+
+    def get_array(values: list[float]) -> Any:
+        return np.array(values, dtype=float)
+
+    # segment width, x, y and offset -> fixture width, x, y and offset (the width of a segment is at least 0)
+    for segment_name, fixture_name, segment_min, segment_max, fixture_max in [
+        ('widths', 'fixtures_width', get_array([0] * len(pairs)), get_array([bounds.segments_width[segment] for segment in segments]),
+         get_array([bounds.fixtures_width[fixture] for fixture in fixtures])),
+        ('segments_x', 'fixtures_x', get_array([bounds.segments_x[segment][0] for segment in segments]),
+         get_array([bounds.segments_x[segment][1] for segment in segments]), get_array([bounds.fixtures_x[fixture] for fixture in fixtures])),
+        ('segments_y', 'fixtures_y', get_array([bounds.segments_y[segment][0] for segment in segments]),
+         get_array([bounds.segments_y[segment][1] for segment in segments]), get_array([bounds.fixtures_y[fixture] for fixture in fixtures])),
+        ('segments_offset', 'fixtures_offset', get_array([bounds.segments_offset[segment][0] for segment in segments]),
+         get_array([bounds.segments_offset[segment][1] for segment in segments]),
+         get_array([bounds.fixtures_offset[fixture] for fixture in fixtures])),
+    ]:
+        segment_var = model.select(segment_name, segments)
+        fixture_var = model.select(fixture_name, fixtures)
+        M = np.maximum(0, fixture_max - segment_min)
+        clauses += [
+            Clause([segment_var, model.select('pairs', pairs, segment_max), -fixture_var], '<', segment_max, keep),
+            Clause([fixture_var, -segment_var, model.select('pairs', pairs, M)], '<', M, keep),
+            Clause([fixture_var, model.select('present', fixtures, -fixture_max)], '<', 0, keep),
+        ]
+
+    # segment number -> fixture segment_number
+    number = get_array([segment.number for segment in segments])
+    number_max = get_array([bounds.fixtures_segment_number[fixture] for fixture in fixtures])
+    fixture_number = model.select('fixtures_segment_number', fixtures)
+    M = np.maximum(0, number_max - number)
+    clauses += [
+        Clause([model.select('pairs', pairs, number), -fixture_number], '<', 0, keep),
+        Clause([fixture_number, model.select('pairs', pairs, M)], '<', number + M, keep),
+        Clause([fixture_number, model.select('present', fixtures, -number_max)], '<', 0, keep),
+    ]
+    return len(pairs), clauses
+
+
+def get_width_difference_clauses(model: GurobiModel, difference_name: str, larger_name: str, previous: list[Any],
+                                 Ms: list[float]) -> tuple[int, list[Clause]]:
+    """the width difference of every segment from the previous (or penultimate) one, which is 0 without the previous one"""
+    segments = list(model.segments)
+    has_previous = np.array([segment is not None for segment in previous], dtype=bool)
+    # the segments without the previous one only have the first clause (difference <= 0)
+    M = np.where(has_previous, np.array(Ms, dtype=float), 0)
+    difference = model.select(difference_name, segments)
+    larger = model.select(larger_name, segments)
+    current_width = model.select('widths', segments, has_previous.astype(float))
+    previous_width = model.select('widths', previous)
+    used = model.select('used', segments)
+    return len(segments), [
+        # difference >= previous - current - M*(1-used)
+        Clause([difference, -previous_width, current_width, used.multiply(-M[:, np.newaxis])], np.where(has_previous, '>', '<'), -M),
+        # difference >= current - previous - M*(1-used)
+        Clause([difference, -current_width, previous_width, used.multiply(-M[:, np.newaxis])], '>', -M, has_previous),
+        # the relaxed upper bounds need 2*M: difference <= previous - current + 2*M*(1-larger)
+        Clause([difference, -previous_width, current_width, larger.multiply(2*M[:, np.newaxis])], '<', 2*M, has_previous),
+        # difference <= current - previous + 2*M*larger
+        Clause([difference, -current_width, previous_width, larger.multiply(-2*M[:, np.newaxis])], '<', 0, has_previous),
+        Clause([difference, used.multiply(-M[:, np.newaxis])], '<', 0, has_previous),
+    ]
+
+
+def get_width_difference(model: GurobiModel) -> tuple[int, list[Clause]]:
+    segments = list(model.segments)
+    return get_width_difference_clauses(model, 'segments_width_difference', 'segments_previous_larger',
+                                        [segment.previous if not segment.is_first else None for segment in segments],
+                                        [model.bounds.segments_width_difference[segment] for segment in segments])
+
+
+def get_width_difference_penult(model: GurobiModel) -> tuple[int, list[Clause]]:
+    segments = list(model.segments)
+    return get_width_difference_clauses(model, 'segments_penult_width_difference', 'segments_penult_previous_larger',
+                                        [segment.previous.previous if not (segment.is_first or segment.previous is None
+                                                                           or segment.previous.is_first) else None
+                                         for segment in segments],
+                                        [model.bounds.segments_penult_width_difference[segment] for segment in segments])
+
+
+def get_fixture_zone_distance(model: GurobiModel) -> tuple[int, list[Clause]]:
+    fixtures = list(model.fixtures)
+    zones, center_zones = set(model.zones), set(model.optimal_center_zones)
+    centers = {zone.name: zone.optimal_center for zone in model.kitchen.zones if zone.optimal_center is not None}
+    has_zone = np.array([fixture.zone in zones for fixture in fixtures], dtype=bool)
+    # the optimal center replaces the zone center (no zone variables, see find_solution.get_zone_clustering)
+    has_center = np.array([fixture.zone in center_zones for fixture in fixtures], dtype=bool)
+    measured = has_zone | has_center
+    distances = []
+    clauses = []
+
+    for axis, (distance_name, further_name, position_name, zone_name) in enumerate([
+            ('fixtures_zone_x_dist', 'fixtures_zone_x_further', 'fixtures_x', 'zones_x'),
+            ('fixtures_zone_y_dist', 'fixtures_zone_y_further', 'fixtures_y', 'zones_y')]):
+        M = np.where(measured, np.array([model.bounds.fixtures_zone_distance[fixture][axis] for fixture in fixtures], dtype=float), 0)
+        center = np.array([centers[fixture.zone][axis] if fixture.zone in center_zones else 0 for fixture in fixtures], dtype=float)
+        distance = model.select(distance_name, fixtures)
+        further = model.select(further_name, fixtures, 2*M)
+        position = model.select(position_name, fixtures, measured.astype(float))
+        zone = model.select(zone_name, [fixture.zone if fixture.zone in zones else None for fixture in fixtures])
+        present = model.select('present', fixtures, -M)
+        distances.append(distance)
+        # the relaxed upper bounds need 2*M (see get_width_difference_clauses)
+        clauses += [
+            Clause([distance, -zone, position, present], '>', -M + center, measured),
+            Clause([distance, zone, -position, present], '>', -M - center, measured),
+            Clause([distance, -zone, position, -further], '<', center, measured),
+            Clause([distance, zone, -position, further], '<', 2*M - center, measured),
+            Clause([distance, present], '<', 0, measured),
+        ]
+
+    # the fixtures in no measured zone have the distances 0 (by the first two clauses)
+    x_distance, y_distance = distances
+    first, second = clauses[0], clauses[1]
+    clauses[0] = Clause(first.terms, np.where(measured, '>', '<'), np.where(measured, first.bound, 0))
+    clauses[1] = Clause([x_distance.multiply(measured[:, np.newaxis]), y_distance.multiply(~measured[:, np.newaxis])] + second.terms[1:],
+                        np.where(measured, '>', '<'), np.where(measured, second.bound, 0))
+    return len(fixtures), clauses
+
+
+def get_continuity_clauses(model: GurobiModel, offset1: tuple[Any, Any], offset2: tuple[Any, Any], width2: Any,
+                           begins: tuple[str, list[Any]], ends: tuple[str, list[Any]], Ms: list[tuple[float, float]]) -> list[Clause]:
+    """the "begins before" and "ends after" indicators of offset1 against the segment with offset2 and width2 (two rows each)"""
+    tolerance = model.kitchen.constants.vertical_continuity_tolerance
+    (matrix1, constant1), (matrix2, constant2) = offset1, offset2
+    M_begins = np.array([M for M, _ in Ms], dtype=float)
+    M_ends = np.array([M for _, M in Ms], dtype=float)
+    # 0 <= - offset1 + (offset2 + tolerance) + M_begins*begins <= M_begins
+    begins_terms = [-matrix1, matrix2, model.select(*begins, M_begins)]
+    begins_constant = - constant1 + constant2 + tolerance
+    # 0 <= offset1 - (offset2 + width2 - tolerance) + M_ends*ends <= M_ends
+    ends_terms = [matrix1, -matrix2, -width2, model.select(*ends, M_ends)]
+    ends_constant = constant1 - constant2 + tolerance
+    return [Clause(begins_terms, '>', -begins_constant), Clause(begins_terms, '<', M_begins - begins_constant),
+            Clause(ends_terms, '>', -ends_constant), Clause(ends_terms, '<', M_ends - ends_constant)]
+
+
+def vertical_continuity_segments_beginning(model: GurobiModel) -> tuple[int, list[Clause]]:
+    pairs = list(model.segment_pairs)
+    segments1 = [segment1 for segment1, _ in pairs]
+    segments2 = [segment2 for _, segment2 in pairs]
+    tolerance = model.kitchen.constants.vertical_continuity_tolerance
+    begins = model.select('segment_begins_before', pairs)
+    ends = model.select('segment_ends_after', pairs)
+    intersects_terms = [begins, ends, model.select('used', segments1), model.select('segment_intersects', pairs, -3)]
+    first1 = np.array([segment1.is_first for segment1 in segments1], dtype=bool)
+    first2 = np.array([segment2.is_first for segment2 in segments2], dtype=bool)
+    previous1 = [(segment1.previous, segment2) if not segment1.is_first else None for segment1, segment2 in pairs]
+    previous2 = [(segment1, segment2.previous) if not segment2.is_first else None for segment1, segment2 in pairs]
+    return len(pairs), get_continuity_clauses(
+        model, model.get_expression_rows('segments_left_offset', segments1), model.get_expression_rows('segments_left_offset', segments2),
+        model.select('widths', segments2), ('segment_begins_before', pairs), ('segment_ends_after', pairs),
+        [get_continuity_ms(segment1.part, segment2.part, tolerance) for segment1, segment2 in pairs]) + [
+        Clause(intersects_terms, '>', 0), Clause(intersects_terms, '<', 2),
+        Clause([model.select('segment_begins_before', previous1), -begins], '<', 0, ~first1),
+        Clause([model.select('segment_ends_after', previous2), -ends], '<', 0, ~first2),
+        Clause([model.select('segment_ends_after', previous1), -ends], '>', 0, ~first1),
+    ]
+
+
+def vertical_continuity_part_ending(model: GurobiModel) -> tuple[int, list[Clause]]:
+    pairs = list(model.part_segment_pairs)
+    parts = [part for part, _ in pairs]
+    segments = [segment for _, segment in pairs]
+    tolerance = model.kitchen.constants.vertical_continuity_tolerance
+    begins = model.select('part_segment_begins_before', pairs)
+    ends = model.select('part_segment_ends_after', pairs)
+    intersects_terms = [begins, ends, model.select('part_segment_intersects', pairs, -2)]
+    first = np.array([segment.is_first for segment in segments], dtype=bool)
+    previous = [(part, segment.previous) if not segment.is_first else None for part, segment in pairs]
+    return len(pairs), get_continuity_clauses(
+        model, model.get_expression_rows('parts_right_offset', parts), model.get_expression_rows('segments_left_offset', segments),
+        model.select('widths', segments), ('part_segment_begins_before', pairs), ('part_segment_ends_after', pairs),
+        [get_continuity_ms(part, segment.part, tolerance) for part, segment in pairs]) + [
+        Clause(intersects_terms, '>', 0), Clause(intersects_terms, '<', 1),
+        Clause([model.select('part_segment_begins_before', previous), -begins], '>', 0, ~first),
+        Clause([model.select('part_segment_ends_after', previous), -ends], '<', 0, ~first),
+    ]
+
+
+def worktop_width_fixtures(model: GurobiModel) -> tuple[int, list[Clause]]:
+    pairs = list(model.compatible_pairs)
+    segments = [segment for segment, _ in pairs]
+    has_worktop = np.array([fixture.has_worktop for _, fixture in pairs], dtype=bool)
+    # the fixtures without a worktop have no continuous worktop (the terms with the coefficient 0 are left out)
+    worktop = has_worktop.astype(float)
+    M = np.array([model.model.segments_continuous_worktop_left[segment].ub for segment in segments], dtype=float)
+    left = model.select('segments_continuous_worktop_left', segments)
+    right = model.select('segments_continuous_worktop_right', segments)
+    previous = model.select('segments_continuous_worktop_left',
+                            [segment.previous if not segment.is_first else None for segment in segments], worktop)
+    next = model.select('segments_continuous_worktop_right', [segment.next if not segment.is_last else None for segment in segments], worktop)
+    widths = model.select('widths', segments, worktop)
+    pairs_M = model.select('pairs', pairs, M)
+    return len(pairs), [
+        # previous + width <= left + (1-pair)*M, or left <= (1-pair)*M without a worktop
+        Clause([previous, widths, model.select('segments_continuous_worktop_left', segments, np.where(has_worktop, -1, 1)), pairs_M], '<', M),
+        # left <= previous + width + (1-pair)*M, or right <= (1-pair)*M without a worktop
+        Clause([model.select('segments_continuous_worktop_left', segments, worktop), -previous, -widths,
+                model.select('segments_continuous_worktop_right', segments, 1 - worktop), pairs_M], '<', M),
+        Clause([next, widths, -right, pairs_M], '<', M, has_worktop),
+        Clause([right, -next, -widths, pairs_M], '<', M, has_worktop),
+    ]
+
+
+MATRIX_FAMILIES: dict[str, Callable[[GurobiModel], tuple[int, list[Clause]]]] = {
+    'presence_pairs_pairing': presence_pairs_pairing,
+    'segment_used': segment_used,
+    'width_rules': width_rules,
+    'get_fixtures_width_coords_offset': get_fixtures_width_coords_offset,
+    'get_width_difference': get_width_difference,
+    'get_width_difference_penult': get_width_difference_penult,
+    'get_fixture_zone_distance': get_fixture_zone_distance,
+    'vertical_continuity_segments_beginning': vertical_continuity_segments_beginning,
+    'vertical_continuity_part_ending': vertical_continuity_part_ending,
+    'worktop_width_fixtures': worktop_width_fixtures,
+}
@@ -0,0 +1,403 @@
+from kitchen import *
+import dataclasses
+from utility_functions import attr_matches, fixture_fits_segment, round_width
+
+
+def build_layout(kitchen: Kitchen, fixture_order_pairs: list[tuple[Fixture, Fixture]]) -> None:
+    """greedily builds a layout, which is stored in the kitchen the same way as a solution (used as a MIP start) \n
+    corner fixtures, the fixtures required in sections and the tall fixtures required by rules are placed first, \n
+    then the parts are filled left to right (other tall fixtures are not used) \n
+    width ranges and steps, edges, corners, include/exclude rules and min worktops (on the left side) are respected, \n
+    min distances and vertical continuity are not checked here, the model checks the layout (see find_solution.complete_start) \n
+    every cabinet of a pooled fixture (see Fixture.count) is placed as a fixture of its own and then replaced by the pooled one"""
+    cabinets = {cabinet: fixture for fixture in kitchen.fixtures
+                for cabinet in ([fixture] if fixture.count == 1 else [dataclasses.replace(fixture, count=1) for _ in range(fixture.count)])}
+    cabinet_kitchen = dataclasses.replace(kitchen, fixtures=list(cabinets))
+
+    for part in kitchen.parts:
+        part.position.padding = 0
+
+    for segment in kitchen.segments:
+        segment.fixture = None
+        segment.width = 0
+
+    # used fixtures and their groups
+    used: dict[Fixture, int] = {}
+    corner_fixtures = place_corner_fixtures(cabinet_kitchen, used)
+    leading_items: dict[KitchenPart, tuple[float, list[tuple[Fixture, float]]]] = {}
+    place_section_fixtures(cabinet_kitchen, corner_fixtures, leading_items, used)
+    place_tall_fixtures(cabinet_kitchen, corner_fixtures, leading_items, used)
+
+    for part in kitchen.parts:
+        fill_part(cabinet_kitchen, part, corner_fixtures, leading_items.get(part), used)
+
+    sort_interchangeable_fixtures(cabinet_kitchen, fixture_order_pairs)
+
+    for segment in kitchen.segments:
+        if segment.fixture is not None:
+            segment.fixture = cabinets[segment.fixture]
+
+
+def place_corner_fixtures(kitchen: Kitchen, used: dict[Fixture, int]) -> dict[tuple[KitchenPart, bool], tuple[Fixture, float]]:
+    """chooses a corner fixture (and its second part) for every corner \n
+    returns fixture and its minimum width for each (part, left) end of a part"""
+    corner_fixtures: dict[tuple[KitchenPart, bool], tuple[Fixture, float]] = {}
+
+    for corner in kitchen.corners:
+        for fixture in kitchen.fixtures:
+            second = fixture.second_corner_fixture
+
+            if second is None or fixture in used or fixture.complementary_fixture is not None:
+                continue
+
+            # the corner segment has to cover the depth of the other part
+            width1 = round_width(fixture, max(fixture.width_min, corner.part2.depth, kitchen.constants.min_fixture_width), up=True)
+            width2 = round_width(second, max(second.width_min, corner.part1.depth, kitchen.constants.min_fixture_width), up=True)
+
+            if (width1 <= min(fixture.width_max, corner.part1.width) and width2 <= min(second.width_max, corner.part2.width)
+                    and fits_part_end(kitchen, fixture, corner.part1, corner.part1_left)
+                    and fits_part_end(kitchen, second, corner.part2, corner.part2_left)):
+                corner_fixtures[(corner.part1, corner.part1_left)] = (fixture, width1)
+                corner_fixtures[(corner.part2, corner.part2_left)] = (second, width2)
+                used[fixture] = corner.part1.position.group_number
+                used[second] = corner.part2.position.group_number
+                break
+
+    return corner_fixtures
+
+
+def fits_part_end(kitchen: Kitchen, fixture: Fixture, part: KitchenPart, left: bool) -> bool:
+    segment = part.segments[0] if left else part.segments[-1]
+    return fixture_fits_segment(fixture, segment, kitchen.placement_rules, kitchen.corners)
+
+
+def place_tall_fixtures(kitchen: Kitchen, corner_fixtures: dict[tuple[KitchenPart, bool], tuple[Fixture, float]],
+                        leading_items: dict[KitchenPart, tuple[float, list[tuple[Fixture, float]]]], used: dict[Fixture, int]) -> None:
+    """places the tall fixtures required by rules into a bottom and a top part of the same group (at the same offset) \n
+    they are added to the leading fixtures of the parts (with their final widths), the rest of the parts is filled later"""
+    for bottom in kitchen.fixtures:
+        top = bottom.complementary_fixture
+
+        if top is None or bottom.is_top or bottom in used:
+            continue
+
+        width = max(get_min_width(kitchen, bottom), get_min_width(kitchen, top))
+
+        if width > min(bottom.width_max, top.width_max):
+            continue
+
+        for bottom_part, top_part in [(bottom_part, top_part) for bottom_part in kitchen.parts for top_part in kitchen.parts
+                                      if not bottom_part.is_top and top_part.is_top
+                                      and bottom_part.position.group_number == top_part.position.group_number]:
+            group = bottom_part.position.group_number
+
+            if not (needs_tall_fixture(kitchen, bottom, group, used) or needs_tall_fixture(kitchen, top, group, used)):
+                continue
+
+            # the tall fixture starts as soon as possible in both parts, or it ends with one of them
+            min_offset = max(get_min_offset(kitchen, bottom_part, bottom, corner_fixtures, leading_items, used),
+                             get_min_offset(kitchen, top_part, top, corner_fixtures, leading_items, used))
+            offsets = [min_offset] + sorted(offset for offset in [get_max_offset(bottom_part, width, corner_fixtures),
+                                                                  get_max_offset(top_part, width, corner_fixtures)]
+                                            if offset > min_offset)
+
+            for offset in offsets:
+                bottom_items = get_leading_items(kitchen, bottom_part, bottom, offset, width, corner_fixtures, leading_items, used)
+
+                if bottom_items is None:
+                    continue
+
+                used_bottom = used | {fixture: group for fixture, _ in bottom_items[1]}
+                top_items = get_leading_items(kitchen, top_part, top, offset, width, corner_fixtures, leading_items, used_bottom)
+
+                if top_items is None:
+                    continue
+
+                leading_items[bottom_part] = bottom_items
+                leading_items[top_part] = top_items
+                used.update({fixture: group for fixture, _ in bottom_items[1] + top_items[1]})
+                break
+
+            if bottom in used:
+                break
+
+
+def needs_tall_fixture(kitchen: Kitchen, fixture: Fixture, group: int, used: dict[Fixture, int]) -> bool:
+    """the fixture is required by an include rule which no other fixture (used in the parts later) can satisfy \n
+    the top half of a tall fixture never has a worktop, so tall fixtures of types with a min worktop are never used"""
+    if fixture.type in kitchen.relation_rules.min_worktops:
+        return False
+
+    return any(not any(attr_matches(rule, other) for other in kitchen.fixtures
+                       if other not in used and not other.is_corner and other.complementary_fixture is None)
+               for rule in get_missing_rules(kitchen, fixture, group, used))
+
+
+def place_section_fixtures(kitchen: Kitchen, corner_fixtures: dict[tuple[KitchenPart, bool], tuple[Fixture, float]],
+                           leading_items: dict[KitchenPart, tuple[float, list[tuple[Fixture, float]]]], used: dict[Fixture, int]) -> None:
+    """places a fixture for each include rule with a section to the beginning of the section \n
+    the fixtures and the padding before them are stored as the leading fixtures of the parts"""
+    for rule in kitchen.placement_rules:
+        if rule.type != 'include' or rule.area != 'group_section':
+            continue
+
+        if any(attr_matches(rule, fixture) and group == rule.group for fixture, group in used.items()):
+            continue
+
+        for part, fixture in [(part, fixture) for part in kitchen.parts if part.position.group_number == rule.group
+                              for fixture in get_candidates(kitchen, part, used) if attr_matches(rule, fixture)]:
+            width = get_min_width(kitchen, fixture)
+            offset = max(rule.section_offset, get_min_offset(kitchen, part, fixture, corner_fixtures, leading_items, used))
+
+            if offset + width > rule.section_offset + rule.section_width:
+                continue
+
+            items = get_leading_items(kitchen, part, fixture, offset, width, corner_fixtures, leading_items, used)
+
+            if items is not None:
+                leading_items[part] = items
+                used.update({item: rule.group for item, _ in items[1]})
+                break
+
+
+def get_min_offset(kitchen: Kitchen, part: KitchenPart, fixture: Fixture,
+                   corner_fixtures: dict[tuple[KitchenPart, bool], tuple[Fixture, float]],
+                   leading_items: dict[KitchenPart, tuple[float, list[tuple[Fixture, float]]]], used: dict[Fixture, int]) -> float:
+    """first offset (relative to the group) of the fixture in the part, \n
+    it follows the leading fixtures, the corner fixture or a fixture allowed at the edge"""
+    start = part.position.group_offset
+    left_corner = corner_fixtures.get((part, True))
+
+    if part in leading_items:
+        return start + leading_items[part][0] + sum(width for _, width in leading_items[part][1])
+    elif left_corner is not None:
+        return start + left_corner[1]
+    elif fixture_fits_segment(fixture, part.segments[0], kitchen.placement_rules, kitchen.corners):
+        return start
+
+    filler = next((filler for filler in get_candidates(kitchen, part, used)
+                   if fixture_fits_segment(filler, part.segments[0], kitchen.placement_rules, kitchen.corners)), None)
+    return start + (get_min_width(kitchen, filler) if filler is not None else 0)
+
+
+def get_max_offset(part: KitchenPart, width: float, corner_fixtures: dict[tuple[KitchenPart, bool], tuple[Fixture, float]]) -> float:
+    """offset (relative to the group) of a fixture of the given width at the end of the part (before the corner fixture)"""
+    right_corner = corner_fixtures.get((part, False))
+    return part.position.group_offset + part.width - width - (right_corner[1] if right_corner is not None else 0)
+
+
+def get_leading_items(kitchen: Kitchen, part: KitchenPart, fixture: Fixture, offset: float, width: float,
+                      corner_fixtures: dict[tuple[KitchenPart, bool], tuple[Fixture, float]],
+                      leading_items: dict[KitchenPart, tuple[float, list[tuple[Fixture, float]]]],
+                      used: dict[Fixture, int]) -> tuple[float, list[tuple[Fixture, float]]] | None:
+    """padding and fixtures (with their widths) which place the fixture to the offset, None if it is not possible \n
+    the gap before the fixture is closed by the padding, by widening the left corner fixture or by fixtures allowed there"""
+    left_corner = corner_fixtures.get((part, True))
+    right_corner = corner_fixtures.get((part, False))
+    right_width = right_corner[1] if right_corner is not None else 0
+    right_count = 1 if right_corner is not None else 0
+
+    if part in leading_items:
+        padding, items = leading_items[part][0], list(leading_items[part][1])
+    else:
+        padding, items = 0, [left_corner] if left_corner is not None else []
+
+    gap = offset - part.position.group_offset - padding - sum(item_width for _, item_width in items)
+    can_pad = part not in leading_items and left_corner is None
+
+    if gap < 0:
+        return None
+
+    def fits(fixture: Fixture, index: int) -> bool:
+        return (index < len(part.segments) - right_count
+                and fixture_fits_segment(fixture, part.segments[index], kitchen.placement_rules, kitchen.corners))
+
+    # indices of the items which can be widened (the new corner fixture and the fillers) and their max widths
+    flexible = [(0, min(left_corner[0].width_max, part.width))] if left_corner is not None and part not in leading_items else []
+
+    def get_capacity() -> float:
+        return sum(max_width - items[index][1] for index, max_width in flexible)
+
+    # fixtures with the least width needed are added until they can fill the gap
+    while gap > get_capacity() and not (can_pad and fits(fixture, len(items))):
+        filler = next((filler for filler in get_candidates(kitchen, part, used | {item: 0 for item, _ in items})
+                       if fits(filler, len(items)) and get_min_width(kitchen, filler) <= gap), None)
+
+        if filler is None:
+            break
+
+        items.append((filler, get_min_width(kitchen, filler)))
+        flexible.append((len(items) - 1, min(filler.width_max, part.width)))
+        gap -= items[-1][1]
+
+    # the items are widened (left to right) to fill the gap
+    for index, max_width in flexible:
+        extra_width = max(0, round_width(items[index][0], items[index][1] + min(gap, max_width - items[index][1])) - items[index][1])
+        items[index] = (items[index][0], items[index][1] + extra_width)
+        gap -= extra_width
+
+    if gap > 0 and not can_pad:
+        return None
+
+    padding += gap
+    rest = part.width - padding - sum(item_width for _, item_width in items) - width - right_width
+
+    if not fits(fixture, len(items)) or rest < 0:
+        return None
+
+    # the rest of the part before the corner fixture has to be filled later, so does the edge after a non-edge fixture
+    used_items = used | {item: 0 for item, _ in items} | {fixture: 0}
+    needs_edge = part.edge_right and right_corner is None and not fixture.allow_edge
+
+    if ((right_corner is not None and rest > 0) or needs_edge) and not any(
+            fits(filler, len(items) + 1) and get_min_width(kitchen, filler) <= rest and (filler.allow_edge or not needs_edge)
+            for filler in get_candidates(kitchen, part, used_items)):
+        return None
+
+    items.append((fixture, width))
+    return padding, items
+
+
+def fill_part(kitchen: Kitchen, part: KitchenPart, corner_fixtures: dict[tuple[KitchenPart, bool], tuple[Fixture, float]],
+              leading: tuple[float, list[tuple[Fixture, float]]] | None, used: dict[Fixture, int]) -> None:
+    """places fixtures in the part left to right (after the leading ones) and sizes them to fill the part"""
+    min_fixture_width = kitchen.constants.min_fixture_width
+    left_corner = corner_fixtures.get((part, True))
+    right_corner = corner_fixtures.get((part, False))
+
+    # (fixture, minimum width), the leading fixtures keep their widths
+    if leading is not None:
+        padding, items = leading[0], list(leading[1])
+    else:
+        padding, items = 0, [left_corner] if left_corner is not None else []
+
+    fixed_count = len(items)
+    reserved_width = padding + (right_corner[1] if right_corner is not None else 0)
+    reserved_count = 1 if right_corner is not None else 0
+
+    if len(items) + reserved_count > len(part.segments) or reserved_width + sum(item[1] for item in items) > part.width:
+        return
+
+    while len(items) + reserved_count < len(part.segments):
+        segment = part.segments[len(items)]
+        free_width = part.width - reserved_width - sum(item[1] for item in items)
+        fixture = next((fixture for fixture in get_candidates(kitchen, part, used)
+                        if fixture_fits_segment(fixture, segment, kitchen.placement_rules, kitchen.corners)
+                        and get_min_width(kitchen, fixture) <= free_width and fits_worktop(kitchen, fixture, items)), None)
+
+        if fixture is None:
+            break
+
+        items.append((fixture, get_min_width(kitchen, fixture)))
+        used[fixture] = part.position.group_number
+
+    if part.edge_right and right_corner is None:
+        # a non-edge fixture cannot be the last one
+        while len(items) > fixed_count and not items[-1][0].allow_edge:
+            del used[items.pop()[0]]
+
+    if right_corner is not None:
+        items.append(right_corner)
+
+    # the fixtures are widened (left to right) to fill the part
+    free_width = part.width - padding - sum(item[1] for item in items)
+    widths = []
+
+    for index, (fixture, width) in enumerate(items):
+        if index < fixed_count:
+            widths.append(width)
+            continue
+
+        width = max(width, min_fixture_width)
+        extra_width = max(0, round_width(fixture, width + min(free_width, min(fixture.width_max, part.width) - width)) - width)
+        widths.append(width + extra_width)
+        free_width -= extra_width
+
+    if right_corner is not None and left_corner is None and leading is None:
+        # the part has to end with the corner fixture
+        padding = free_width
+
+    part.position.padding = padding
+
+    for segment, (fixture, _), width in zip(part.segments, items, widths):
+        segment.fixture = fixture
+        segment.width = width
+
+
+def get_candidates(kitchen: Kitchen, part: KitchenPart, used: dict[Fixture, int]) -> list[Fixture]:
+    """unused fixtures which can be placed in the part, the ones required by rules go first, then the ones with most storage"""
+    group = part.position.group_number
+
+    def is_excluded(fixture: Fixture) -> bool:
+        return any(rule.type == 'exclude' and rule.area == 'group_section' and rule.group == group and attr_matches(rule, fixture)
+                   for rule in kitchen.placement_rules)
+
+    candidates = [fixture for fixture in kitchen.fixtures
+                  if fixture not in used and not fixture.is_corner and fixture.complementary_fixture is None
+                  and fixture.is_top == part.is_top and not is_excluded(fixture)]
+    return sorted(candidates, key=lambda fixture: (not is_required(kitchen, fixture, group, used), -fixture.storage))
+
+
+def is_required(kitchen: Kitchen, fixture: Fixture, group: int, used: dict[Fixture, int]) -> bool:
+    """the fixture (placed in the group) would satisfy an include rule or a one_wide rule which is not satisfied yet"""
+    return (len(get_missing_rules(kitchen, fixture, group, used)) > 0
+            or (fixture.type in kitchen.relation_rules.one_wide and not any(other.type == fixture.type for other in used)))
+
+
+def get_missing_rules(kitchen: Kitchen, fixture: Fixture, group: int, used: dict[Fixture, int]) -> list[PlacementRule]:
+    """include rules (of the kitchen or the group) which are not satisfied yet and which the fixture would satisfy"""
+    return [rule for rule in kitchen.placement_rules
+            if rule.type == 'include' and (rule.area == 'kitchen' or (rule.area == 'group' and rule.group == group))
+            and attr_matches(rule, fixture)
+            and not any(attr_matches(rule, other) and (rule.area == 'kitchen' or other_group == rule.group)
+                        for other, other_group in used.items())]
+
+
+def fits_worktop(kitchen: Kitchen, fixture: Fixture, items: list[tuple[Fixture, float]]) -> bool:
+    """the fixture placed after the items has enough worktop on its left side (if its type requires it)"""
+    if fixture.type not in kitchen.relation_rules.min_worktops:
+        return True
+
+    worktop = 0.0
+
+    for item, width in reversed(items):
+        if not item.has_worktop:
+            break
+
+        worktop += width
+
+    return worktop >= kitchen.relation_rules.min_worktops[fixture.type]
+
+
+def get_min_width(kitchen: Kitchen, fixture: Fixture) -> float:
+    """one fixture of each type with the one_wide rule has to be wide enough (rounded up to the width step)"""
+    width = max(fixture.width_min, kitchen.constants.min_fixture_width)
+
+    if fixture.type in kitchen.relation_rules.one_wide and kitchen.relation_rules.one_wide[fixture.type] <= fixture.width_max:
+        width = max(width, kitchen.relation_rules.one_wide[fixture.type])
+
+    return round_width(fixture, width, up=True)
+
+
+def sort_interchangeable_fixtures(kitchen: Kitchen, fixture_order_pairs: list[tuple[Fixture, Fixture]]) -> None:
+    """reassigns the fixtures of each chain of ordered fixtures (clones, interchangeable fixtures) \n
+    the model requires absent fixtures first and the present ones sorted by segment number (see sort_multiple_same_fixtures) \n
+    corner fixtures are linked to their second parts, so their chains are left as they are"""
+    next_fixtures = {fixture.older_sibling: fixture for fixture in kitchen.fixtures
+                     if fixture.older_sibling is not None and not fixture.is_corner}
+    next_fixtures.update(fixture_order_pairs)
+    has_previous = set(next_fixtures.values())
+
+    for first in kitchen.fixtures:
+        if first in has_previous or first not in next_fixtures:
+            continue
+
+        chain = [first]
+
+        while chain[-1] in next_fixtures:
+            chain.append(next_fixtures[chain[-1]])
+
+        segments = [segment for segment in kitchen.segments if segment.fixture in chain]
+
+        for segment, fixture in zip(segments, chain[len(chain)-len(segments):]):
+            segment.fixture = fixture
@@ -0,0 +1,72 @@
+from kitchen import *
+from typing import Any
+from result_cache import normalize
+import json
+
+# changes of these parts of the input can change the design of every kitchen part
+GLOBAL_FIELDS = ['relation_rules', 'preferences', 'constants', 'zones', 'available_fixtures']
+
+
+def get_unchanged_parts(kitchen: Kitchen, previous_document: Any) -> list[KitchenPart]:
+    """parts of the kitchen whose groups are not affected by the differences between its input and the previous input \n
+    a group is affected by its changed parts, walls and group rules, global changes affect all the groups, \n
+    corners join the groups (a corner fixture belongs to both parts)"""
+    changed_groups = get_changed_groups(kitchen.source, previous_document)
+
+    if changed_groups is None:
+        return []
+
+    # the corners spread the changes between the groups
+    while True:
+        spread = {corner.part1.position.group_number for corner in kitchen.corners if corner.part2.position.group_number in changed_groups}
+        spread |= {corner.part2.position.group_number for corner in kitchen.corners if corner.part1.position.group_number in changed_groups}
+
+        if spread <= changed_groups:
+            break
+
+        changed_groups |= spread
+
+    return [part for part in kitchen.parts if part.position.group_number not in changed_groups]
+
+
+def get_changed_groups(document: Any, previous_document: Any) -> set[float] | None:
+    """groups affected by the differences between the documents, None if everything is affected"""
+    if any(get_canonical(document.get(name)) != get_canonical(previous_document.get(name)) for name in GLOBAL_FIELDS):
+        return None
+
+    changed_groups: set[float] = set()
+
+    for part in get_changed_items(document, previous_document, 'kitchen_parts'):
+        changed_groups.add(part['position']['group_number'])
+
+    for wall in get_changed_items(document, previous_document, 'walls'):
+        changed_groups.add(wall['group'])
+
+    for rule in get_changed_items(document, previous_document, 'placement_rules'):
+        if rule['area'] == 'kitchen':
+            return None
+
+        changed_groups.add(rule['group'])
+
+    parts = {part['name']: part for part in document['kitchen_parts'] + previous_document['kitchen_parts']}
+
+    for corner in get_changed_items(document, previous_document, 'corners'):
+        for name in [corner['part1_name'], corner['part2_name']]:
+            if name in parts:
+                changed_groups.add(parts[name]['position']['group_number'])
+
+    return changed_groups
+
+
+def get_changed_items(document: Any, previous_document: Any, name: str) -> list[Any]:
+    """items of the list field which are only in one of the documents (the order of the items does not matter)"""
+    items = document.get(name, [])
+    previous_items = previous_document.get(name, [])
+    canonical = {get_canonical(item) for item in items}
+    previous_canonical = {get_canonical(item) for item in previous_items}
+    return ([item for item in items if get_canonical(item) not in previous_canonical]
+            + [item for item in previous_items if get_canonical(item) not in canonical])
+
+
+def get_canonical(value: Any) -> str:
+    return json.dumps(normalize(value), sort_keys=True)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+from typing import Any
 
 
 @dataclass
@@ -14,6 +15,9 @@ class Fixture:
     has_worktop: bool
     allow_edge: bool
     is_corner: bool = False
+    catalog_name: str = ''  # name of the fixture in the input (shared by all copies)
+    width_step: float = 0  # the width is a multiple of this (0 means any width)
+    count: int = 1  # the most cabinets of the fixture in a design (above 1 for the pooled multiple fixtures, see load_input.can_pool)
     complementary_fixture: Fixture | None = None
     second_corner_fixture: Fixture | None = None
     older_sibling: Fixture | None = field(default=None, repr=False)
@@ -126,6 +130,7 @@ class Zone:
     is_optimized: bool
     optimal_center: tuple[float, float] | None
     color: str
+    clustering: str | None = None  # how the fixtures are kept together (see get_zone_clustering), None for the default
 
 
 @dataclass
@@ -138,11 +143,20 @@ class Constants:
     width_different_tolerance: float = 0
     width_penult_similar_tolerance: float = 0
     max_segment_count: int = 0
+    max_part_segment_count: int = 0  # optional limit of the number of segments in one part (0 means no limit)
+    width_step: float = 0  # default width step of the fixtures (0 means any width)
+
+@dataclass
+class ObjectiveTier:
+    terms: list[str]  # names of the terms of the objective (see get_objective_terms) maximized together
+    gap: float = 0  # the tier can lose this part of its best value when the lower tiers are maximized
+
 
 @dataclass
 class Preferences:
     storage: float = 1
     worktop: float = 1
+    tiers: list[ObjectiveTier] = field(default_factory=list)  # hierarchical objective, the first tier has the highest priority
 
 @dataclass
 class Kitchen:
@@ -157,3 +171,4 @@ class Kitchen:
     constants: Constants
     zones: list[Zone]
     fixtures: list[Fixture]
+    source: Any = None  # the input document (the key of the result cache), None if the kitchen was not loaded from one
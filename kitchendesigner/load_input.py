@@ -3,26 +3,36 @@ import jsonschema
 import pathlib
 import math
 import dataclasses
+import functools
 from kitchen import *
 from typing import Any
-from utility_functions import attr_matches
+from utility_functions import attr_matches, fixture_fits_part
+
+# protects the segment count from rounding errors (e.g. 0.3/0.1 = 2.9999999999999996)
+SEGMENT_COUNT_EPSILON = 1e-9
 
 
 def load(file_name: str) -> Kitchen:
-    loaded_data = load_data_from_files(file_name)
+    return load_document(load_data_from_files(file_name))
+
+
+def load_document(loaded_data: Any) -> Kitchen:
+    """builds the kitchen from an input document which was already parsed (and validated, see validate)"""
     zones = load_zones(loaded_data['zones'])
-    fixtures = load_fixtures(loaded_data['available_fixtures'], [zone.name for zone in zones])
     constants = load_constants(loaded_data['constants'])
-    parts, segments = load_parts_segments(loaded_data['kitchen_parts'], constants)
+    parts = load_parts(loaded_data['kitchen_parts'])
     walls = load_walls(get_list_field(loaded_data, 'walls'))
     corners = load_corners(get_list_field(loaded_data, 'corners'), parts)
     placement_rules = load_placement_rules(get_list_field(loaded_data, 'placement_rules'))
     relation_rules = load_relation_rules(get_list_field(loaded_data, 'relation_rules'))
+    fixtures = load_fixtures(loaded_data['available_fixtures'], zones, constants, parts, placement_rules, corners, relation_rules)
     preferences_data = loaded_data['preferences'] if 'preferences' in loaded_data else {}
     preferences = load_preferences(preferences_data)
     remove_fixtures(fixtures, placement_rules, corners)
+    segments = load_segments(parts, fixtures, placement_rules, corners, constants)
     groups = list(set(part.position.group_number for part in parts))
-    return Kitchen(groups, parts, segments, walls, corners, placement_rules, relation_rules, preferences, constants, zones, fixtures)
+    return Kitchen(groups, parts, segments, walls, corners, placement_rules, relation_rules, preferences, constants, zones, fixtures,
+                   source=loaded_data)
 
 
 def get_list_field(data_dict: dict[str, list[dict[str, Any]]], key: str) -> list[dict[str, Any]]:
@@ -42,18 +52,33 @@ def get_bool_field(data_dict: dict[str, Any], key: str) -> Any:
 
 
 def load_data_from_files(file_name: str) -> Any:
-    with open(pathlib.Path(__file__).parent / 'input.schema.json') as schema_file:
-        schema = json.load(schema_file)
-
     with open(file_name) as data_file:
         # raises an exception if json is not valid
         loaded_data = json.load(data_file)
 
-    # raises an exception if validation fails
-    jsonschema.validate(instance=loaded_data, schema=schema)
+    validate(loaded_data)
     return loaded_data
 
 
+def validate(loaded_data: Any) -> None:
+    """raises an exception (the best matching error, as jsonschema.validate) if the document does not match the input schema"""
+    error = jsonschema.exceptions.best_match(get_validator().iter_errors(loaded_data))
+
+    if error is not None:
+        raise error
+
+
+@functools.cache
+def get_validator() -> Any:
+    """the input schema is loaded and checked once per process"""
+    with open(pathlib.Path(__file__).parent / 'input.schema.json') as schema_file:
+        schema = json.load(schema_file)
+
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
 def load_zones(zones_data: list[dict[str, Any]]) -> list[Zone]:
     zones = []
 
@@ -61,7 +86,7 @@ def load_zones(zones_data: list[dict[str, Any]]) -> list[Zone]:
         optimal_center = ((zone_data['optimal_center']['x'], zone_data['optimal_center']['y'])
                           if get_bool_field(zone_data, 'has_optimal_center') else None)
         color = zone_data['color'] if 'color' in zone_data else ''
-        zone = Zone(zone_data['name'], get_bool_field(zone_data, 'is_optimized'), optimal_center, color)
+        zone = Zone(zone_data['name'], get_bool_field(zone_data, 'is_optimized'), optimal_center, color, zone_data.get('clustering'))
         zones.append(zone)
 
     return zones
@@ -75,10 +100,22 @@ def load_constants(constants_data: dict[str, float]) -> Constants:
     constants.width_same_tolerance = constants_data['width_same_tolerance']
     constants.width_different_tolerance = constants_data['width_different_tolerance']
     constants.width_penult_similar_tolerance = constants_data['width_penult_similar_tolerance']
+
+    if 'max_part_segment_count' in constants_data:
+        constants.max_part_segment_count = int(constants_data['max_part_segment_count'])
+
+    if 'width_step' in constants_data:
+        constants.width_step = constants_data['width_step']
+
     return constants
 
-def load_fixtures(available_fixtures_data: list[dict[str, Any]], zones_str: list[str]) -> list[Fixture]:
+def load_fixtures(available_fixtures_data: list[dict[str, Any]], zones: list[Zone], constants: Constants, parts: list[KitchenPart],
+                  rules: list[PlacementRule], corners: list[Corner], relation_rules: RelationRules) -> list[Fixture]:
+    """the fixtures of the model: a multiple fixture is one fixture with the count of its cabinets if it can be pooled \n
+    (see can_pool), otherwise it is copied (at most MULTIPLE_FIXTURE_COPY_COUNT times, no more than the parts can hold)"""
     fixtures = []
+    zones_str = [zone.name for zone in zones]
+    optimized_zones = [zone.name for zone in zones if zone.is_optimized]
     MULTIPLE_FIXTURE_COPY_COUNT = 3
 
     for fixture_data in available_fixtures_data:
@@ -92,8 +129,8 @@ def load_fixtures(available_fixtures_data: list[dict[str, Any]], zones_str: list
         width_max = fixture_data['width_max']
         width_min2 = fixture_data['width_min2'] if 'width_min2' in fixture_data else width_min
         width_max2 = fixture_data['width_max2'] if 'width_max2' in fixture_data else width_max
+        width_step = fixture_data['width_step'] if 'width_step' in fixture_data else constants.width_step
         tall = position_top and position_bottom
-        fixture_copy_count = MULTIPLE_FIXTURE_COPY_COUNT if allow_multiple else 1
         previous_fixture_top: Fixture | None
         previous_fixture_bottom: Fixture | None
 
@@ -103,9 +140,23 @@ def load_fixtures(available_fixtures_data: list[dict[str, Any]], zones_str: list
         if not position_top and not position_bottom:
             continue
 
+        kitchen_fixture = Fixture(fixture_data['name'], fixture_data['type'], zone, width_min, width_max,
+                                  position_top, storage, get_bool_field(fixture_data, 'has_worktop'), get_bool_field(fixture_data, 'allow_edge'), is_corner,
+                                  fixture_data['name'], width_step)
+        fixture_copy_count = 1
+        count = 1
+
+        if allow_multiple:
+            capacity = max(1, min(get_fixture_capacity(dataclasses.replace(kitchen_fixture, is_top=is_top), parts, rules, corners, constants)
+                                  for is_top in [True, False] if (position_top if is_top else position_bottom)))
+
+            if not tall and can_pool(kitchen_fixture, optimized_zones, rules, relation_rules):
+                count = capacity
+            else:
+                fixture_copy_count = min(MULTIPLE_FIXTURE_COPY_COUNT, capacity)
+
         for i in range(fixture_copy_count):
-            kitchen_fixture_top = Fixture(fixture_data['name'], fixture_data['type'], zone, width_min, width_max,
-                                          position_top, storage, get_bool_field(fixture_data, 'has_worktop'), get_bool_field(fixture_data, 'allow_edge'), is_corner)
+            kitchen_fixture_top = dataclasses.replace(kitchen_fixture, count=count)
             kitchen_fixture_bottom = dataclasses.replace(kitchen_fixture_top, is_top=False)
 
             if i > 0:
@@ -145,29 +196,63 @@ def load_fixtures(available_fixtures_data: list[dict[str, Any]], zones_str: list
     return fixtures
 
 
-def load_parts_segments(kitchen_parts_data: list[dict[str, Any]], constants: Constants) -> tuple[list[KitchenPart], list[Segment]]:
-    segment: Segment | None = None
-    previous_segment: Segment | None = None
+def get_fixture_capacity(fixture: Fixture, parts: list[KitchenPart], rules: list[PlacementRule], corners: list[Corner],
+                         constants: Constants) -> int:
+    """the most cabinets of the fixture which fit in the parts (side by side at its minimum width)"""
+    min_width = max(fixture.width_min, constants.min_fixture_width, SEGMENT_COUNT_EPSILON)
+    capacity = 0
+
+    for part in parts:
+        if fixture_fits_part(fixture, part, rules, corners):
+            part_capacity = math.floor(part.width / min_width + SEGMENT_COUNT_EPSILON)
+
+            if constants.max_part_segment_count > 0:
+                part_capacity = min(part_capacity, constants.max_part_segment_count)
+
+            capacity += part_capacity
+
+    return capacity
+
 
+def can_pool(fixture: Fixture, optimized_zones: list[str], rules: list[PlacementRule], relation_rules: RelationRules) -> bool:
+    """the cabinets of the multiple fixture can be one fixture of the model if no rule needs the position of each of them \n
+    (it is not a corner fixture, its zone is not optimized, no target, distance, one_wide or section rule applies to it)"""
+    return (not fixture.is_corner and fixture.zone not in optimized_zones
+            and fixture.type not in relation_rules.targets and fixture.type not in relation_rules.wall_distances
+            and fixture.type not in relation_rules.one_wide
+            and not any(fixture.type in fixture_types for fixture_types in relation_rules.min_distances)
+            and not any(rule.area == 'group_section' and attr_matches(rule, fixture) for rule in rules))
+
+
+def load_parts(kitchen_parts_data: list[dict[str, Any]]) -> list[KitchenPart]:
     parts = []
-    kitchen_segments = []
-    segment_number = 1
 
     for part_data in kitchen_parts_data:
         width: float = part_data['width']
         is_top: bool = get_bool_field(part_data, 'is_top')
         edge_left: bool = get_bool_field(part_data, 'edge_left')
         edge_right: bool = get_bool_field(part_data, 'edge_right')
-        segment_count = math.ceil(width/constants.min_fixture_width)
-        part_segments: list[Segment] = []
         # TODO: 1) check that the entire kitchen can fit in positive coordinates
         #       2) check that group numbers are integers
         position = Position(part_data['position']['x'], part_data['position']['y'],
                             part_data['position']['angle'], part_data['position']['group_number'], part_data['position']['group_offset'])
         kitchen_part = KitchenPart(part_data['name'], is_top, position, width,
-                                   part_data['depth'], edge_left, edge_right, part_segments)
+                                   part_data['depth'], edge_left, edge_right, [])
         parts.append(kitchen_part)
 
+    return parts
+
+
+def load_segments(parts: list[KitchenPart], fixtures: list[Fixture], rules: list[PlacementRule], corners: list[Corner], constants: Constants) -> list[Segment]:
+    segment: Segment | None = None
+    previous_segment: Segment | None = None
+
+    kitchen_segments = []
+    segment_number = 1
+
+    for kitchen_part in parts:
+        segment_count = get_segment_count(kitchen_part, fixtures, rules, corners, constants)
+
         for i in range(segment_count):
             segment = Segment(segment_number, kitchen_part, 0, None, i == 0, i == segment_count - 1, previous_segment)
 
@@ -176,11 +261,34 @@ def load_parts_segments(kitchen_parts_data: list[dict[str, Any]], constants: Con
 
             previous_segment = segment
             segment_number += 1
-            part_segments.append(segment)
+            kitchen_part.segments.append(segment)
             kitchen_segments.append(segment)
 
     constants.max_segment_count = segment_number
-    return parts, kitchen_segments
+    return kitchen_segments
+
+
+def get_segment_count(part: KitchenPart, fixtures: list[Fixture], rules: list[PlacementRule], corners: list[Corner], constants: Constants) -> int:
+    """maximum number of fixtures which can fit in the part (at least one segment is always created) \n
+    n fixtures need at least n*min_width + (edge_left_min_width-min_width) + (edge_right_min_width-min_width)"""
+    part_fixtures = [fixture for fixture in fixtures if fixture_fits_part(fixture, part, rules, corners)]
+
+    if len(part_fixtures) == 0:
+        return 1
+
+    def get_min_width(fixtures: list[Fixture]) -> float:
+        return max([constants.min_fixture_width] + [min(fixture.width_min for fixture in fixtures)])
+
+    min_width = get_min_width(part_fixtures)
+    edge_fixtures = [fixture for fixture in part_fixtures if fixture.allow_edge]
+    edge_min_width = get_min_width(edge_fixtures) if len(edge_fixtures) > 0 else part.width
+    edge_extra_width = (edge_min_width - min_width) * (int(part.edge_left) + int(part.edge_right))
+    segment_count = max(1, math.floor((part.width - edge_extra_width) / min_width + SEGMENT_COUNT_EPSILON))
+
+    if constants.max_part_segment_count > 0:
+        segment_count = min(segment_count, constants.max_part_segment_count)
+
+    return segment_count
 
 
 def load_walls(walls_data: list[dict[str, Any]]) -> dict[int, Wall]:
@@ -258,6 +366,7 @@ def load_preferences(preferences_data: dict[str, Any]) -> Preferences:
 
     get_preference('storage')
     get_preference('worktop')
+    preferences.tiers = [ObjectiveTier(tier_data['terms'], tier_data.get('gap', 0)) for tier_data in preferences_data.get('tiers', [])]
     return preferences
 
 
@@ -270,3 +379,33 @@ def remove_fixtures(fixtures: list[Fixture], rules: list[PlacementRule], corners
 
     if len(corners) == 0:
         fixtures[:] = [fixture for fixture in fixtures if not fixture.is_corner]
+
+
+def load_output(file_name: str) -> Any:
+    """loads a design from an output file (the first one if the file contains more designs)"""
+    with open(file_name) as output_file:
+        output_data = json.load(output_file)
+
+    return output_data[0] if isinstance(output_data, list) else output_data
+
+
+def load_solution(kitchen: Kitchen, solution_data: dict[str, Any]) -> None:
+    """applies a solution in the output format to the kitchen (the inverse of produce_output.get_output) \n
+    parts and fixtures which do not exist in the kitchen are ignored, a fixture None leaves its segment empty"""
+    fixtures = {fixture.name: fixture for fixture in kitchen.fixtures}
+    # the cabinets of the pooled fixtures are numbered like copies (see produce_output.get_output)
+    fixtures.update({f'{fixture.name}_{i}': fixture for fixture in kitchen.fixtures for i in range(1, fixture.count)})
+
+    for part in kitchen.parts:
+        part_data = solution_data.get(part.name, {'padding': 0, 'fixtures': []})
+        part.position.padding = part_data['padding']
+        fixtures_data = [fixture_data for fixture_data in part_data['fixtures']
+                         if fixture_data['fixture'] is None or fixture_data['fixture'] in fixtures]
+
+        for i, segment in enumerate(part.segments):
+            if i < len(fixtures_data) and fixtures_data[i]['fixture'] is not None:
+                segment.fixture = fixtures[fixtures_data[i]['fixture']]
+                segment.width = fixtures_data[i]['width']
+            else:
+                segment.fixture = None
+                segment.width = 0
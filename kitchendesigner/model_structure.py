@@ -1,9 +1,104 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
 from typing import Any, Iterator
+import json
+import time
+import tracemalloc
 import pyomo.environ as pyo
 from pyomo.core.base.var import VarData
+from pyomo.core.expr.visitor import identify_variables
 from process_args import Args
 
 
+@dataclass
+class ComponentProfile:
+    """construction of one model component: time, allocated memory (MB) and size \n
+    rows are the active constraints (or the variables), skipped are the indices whose rule returned Constraint.Skip"""
+    name: str
+    kind: str
+    seconds: float
+    memory: float
+    rows: int = 0
+    skipped: int = 0
+    nonzeros: int = 0
+
+
+class BuildProfiler:
+    """measures the construction of the components of the model (see KitchenModel.add_component) \n
+    the memory is traced by tracemalloc, which slows the build down, so the times are relative"""
+
+    def __init__(self) -> None:
+        self.measurements: dict[str, tuple[float, float]] = {}
+        self.was_tracing = tracemalloc.is_tracing()
+
+        if not self.was_tracing:
+            tracemalloc.start()
+
+        self.start = time.perf_counter()
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        start_memory = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        self.measurements[name] = (time.perf_counter() - start, (tracemalloc.get_traced_memory()[0] - start_memory) / 1e6)
+
+    def finish(self, model: pyo.Model) -> list[ComponentProfile]:
+        """profiles of the components sorted by the construction time, the rest of the build is reported as (other)"""
+        total = time.perf_counter() - self.start
+
+        if not self.was_tracing:
+            tracemalloc.stop()
+
+        profiles = [get_component_profile(model.component(name), seconds, memory)
+                    for name, (seconds, memory) in self.measurements.items()]
+        profiles.append(ComponentProfile('(other)', '', total - sum(profile.seconds for profile in profiles), 0))
+        return sorted(profiles, key=lambda profile: -profile.seconds)
+
+
+def get_component_profile(component: Any, seconds: float, memory: float) -> ComponentProfile:
+    profile = ComponentProfile(component.name, component.ctype.__name__, seconds, memory)
+
+    if isinstance(component, pyo.Constraint):
+        constraints = [data for data in component.values() if data.active]
+        profile.rows = len(constraints)
+        profile.skipped = len(component.index_set()) - len(component) if component.is_indexed() else 0
+        profile.nonzeros = sum(count_nonzeros(data.body) for data in constraints)
+    elif isinstance(component, pyo.Var):
+        profile.rows = len(component)
+    elif isinstance(component, pyo.Objective):
+        profile.nonzeros = sum(count_nonzeros(data.expr) for data in component.values())
+
+    return profile
+
+
+def print_profile(profiles: list[ComponentProfile], destination: str) -> None:
+    """prints the profiles as a table ('-') or writes them to a JSON file"""
+    if destination != '-':
+        with open(destination, 'w') as profile_file:
+            json.dump([asdict(profile) for profile in profiles], profile_file, indent=4)
+        return
+
+    rows = [['component', 'kind', 'seconds', 'memory MB', 'rows', 'skipped', 'nonzeros']]
+    rows += [[profile.name, profile.kind, f'{profile.seconds:.3f}', f'{profile.memory:.2f}', str(profile.rows),
+              str(profile.skipped), str(profile.nonzeros)] for profile in profiles]
+    column_widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, column_widths)))
+
+
+def get_model_size(model: pyo.Model) -> tuple[int, int, int]:
+    """numbers of the free variables, the active constraints and the nonzero coefficients (variables in the constraints)"""
+    variables = sum(1 for var in model.component_data_objects(pyo.Var) if not var.fixed)
+    constraints = list(model.component_data_objects(pyo.Constraint, active=True))
+    return variables, len(constraints), sum(count_nonzeros(constraint.body) for constraint in constraints)
+
+
+def count_nonzeros(expression: Any) -> int:
+    return sum(1 for _ in identify_variables(expression, include_fixed=False))
+
+
 def print_structure(model: pyo.Model, args: Args) -> None:
     if not args.structure:
         return
@@ -0,0 +1,182 @@
+from kitchen import *
+from dataclasses import dataclass
+from utility_functions import attr_matches, get_sin_cos, round_width
+
+
+@dataclass
+class Bounds:
+    """upper bounds (and ranges) of the model variables derived from the kitchen geometry \n
+    they are capped by max_fixture_width and max_canvas_size, so they are never looser than the global constants"""
+    segments_width: dict[Segment, float]
+    segments_width_difference: dict[Segment, float]
+    segments_penult_width_difference: dict[Segment, float]
+    segments_x: dict[Segment, tuple[float, float]]
+    segments_y: dict[Segment, tuple[float, float]]
+    segments_offset: dict[Segment, tuple[float, float]]
+    fixtures_width: dict[Fixture, float]
+    fixtures_x: dict[Fixture, float]
+    fixtures_y: dict[Fixture, float]
+    fixtures_offset: dict[Fixture, float]
+    fixtures_segment_number: dict[Fixture, int]
+    zones_x: dict[str, float]
+    zones_y: dict[str, float]
+    fixtures_zone_distance: dict[Fixture, tuple[float, float]]
+    fixtures_target_distance: dict[Fixture, tuple[float, float]]
+    zones_distance: dict[str, tuple[float, float]]
+    worktop: float
+
+
+def get_bounds(kitchen: Kitchen, segment_fixtures: dict[Segment, list[Fixture]], fixture_segments: dict[Fixture, list[Segment]],
+               optimal_center_zones: list[str]) -> Bounds:
+    """computes the bounds from the parts (position, width, depth) and the fixtures that fit in their segments \n
+    the fixtures of the optimal_center_zones are measured from the optimal center instead of the zone center"""
+    max_fixture_width = kitchen.constants.max_fixture_width
+    max_canvas_size = kitchen.constants.max_canvas_size
+
+    def cap(value_range: tuple[float, float]) -> tuple[float, float]:
+        return max(0, value_range[0]), min(max_canvas_size, value_range[1])
+
+    segments_width = {segment: max([0] + [round_width(fixture, min(max_fixture_width, segment.part.width, fixture.width_max))
+                                          for fixture in segment_fixtures[segment]])
+                      for segment in kitchen.segments}
+
+    def get_width_difference(segment: Segment, other: Segment | None) -> float:
+        return max(segments_width[segment], segments_width[other] if other is not None else 0)
+
+    segments_x = {}
+    segments_y = {}
+    segments_offset = {}
+
+    for part in kitchen.parts:
+        x_range, y_range = get_part_center_ranges(part)
+        offset_range = get_part_offset_range(part)
+
+        for segment in part.segments:
+            segments_x[segment] = cap(x_range)
+            segments_y[segment] = cap(y_range)
+            segments_offset[segment] = cap(offset_range)
+
+    def get_fixture_bound(fixture: Fixture, segment_bounds: dict[Segment, float]) -> float:
+        # the pooled fixtures have no position or width of their own, their cabinets are in the segments (see Fixture.count)
+        return max([0] + [segment_bounds[segment] for segment in fixture_segments[fixture]]) if fixture.count == 1 else 0
+
+    segments_x_max = {segment: value_range[1] for segment, value_range in segments_x.items()}
+    segments_y_max = {segment: value_range[1] for segment, value_range in segments_y.items()}
+    segments_offset_max = {segment: value_range[1] for segment, value_range in segments_offset.items()}
+    segments_number = {segment: float(segment.number) for segment in kitchen.segments}
+    fixtures_x = {fixture: get_fixture_bound(fixture, segments_x_max) for fixture in kitchen.fixtures}
+    fixtures_y = {fixture: get_fixture_bound(fixture, segments_y_max) for fixture in kitchen.fixtures}
+
+    def get_zone_bound(zone: Zone, fixture_bounds: dict[Fixture, float]) -> float:
+        """the center of a zone is the average of the coordinates of its fixtures"""
+        return max([0] + [fixture_bounds[fixture] for fixture in kitchen.fixtures if fixture.zone == zone.name])
+
+    zones_x = {zone.name: get_zone_bound(zone, fixtures_x) for zone in kitchen.zones}
+    zones_y = {zone.name: get_zone_bound(zone, fixtures_y) for zone in kitchen.zones}
+
+    def get_zone_distance(zone: Zone) -> tuple[float, float]:
+        if zone.optimal_center is None:
+            return zones_x[zone.name], zones_y[zone.name]
+        else:
+            return (get_distance_bound((0, zones_x[zone.name]), (zone.optimal_center[0], zone.optimal_center[0])),
+                    get_distance_bound((0, zones_y[zone.name]), (zone.optimal_center[1], zone.optimal_center[1])))
+
+    optimal_centers = {zone.name: zone.optimal_center for zone in kitchen.zones if zone.name in optimal_center_zones}
+
+    def get_fixture_zone_distance(fixture: Fixture) -> tuple[float, float]:
+        center = optimal_centers.get(fixture.zone)
+
+        if center is None:
+            return max(fixtures_x[fixture], zones_x[fixture.zone]), max(fixtures_y[fixture], zones_y[fixture.zone])
+        else:
+            return (get_distance_bound((0, fixtures_x[fixture]), (center[0], center[0])),
+                    get_distance_bound((0, fixtures_y[fixture]), (center[1], center[1])))
+
+    def get_target_distance(fixture: Fixture) -> tuple[float, float]:
+        if fixture.type not in kitchen.relation_rules.targets:
+            return fixtures_x[fixture], fixtures_y[fixture]
+        else:
+            target_x, target_y = kitchen.relation_rules.targets[fixture.type]
+            return (get_distance_bound((0, fixtures_x[fixture]), (target_x, target_x)),
+                    get_distance_bound((0, fixtures_y[fixture]), (target_y, target_y)))
+
+    return Bounds(
+        segments_width=segments_width,
+        segments_width_difference={segment: get_width_difference(segment, segment.previous) for segment in kitchen.segments},
+        segments_penult_width_difference={
+            segment: get_width_difference(segment, segment.previous.previous if segment.previous is not None else None)
+            for segment in kitchen.segments},
+        segments_x=segments_x,
+        segments_y=segments_y,
+        segments_offset=segments_offset,
+        fixtures_width={fixture: round_width(fixture, min(fixture.width_max, get_fixture_bound(fixture, segments_width)))
+                        for fixture in kitchen.fixtures},
+        fixtures_x=fixtures_x,
+        fixtures_y=fixtures_y,
+        fixtures_offset={fixture: get_fixture_bound(fixture, segments_offset_max) for fixture in kitchen.fixtures},
+        fixtures_segment_number={fixture: int(get_fixture_bound(fixture, segments_number)) for fixture in kitchen.fixtures},
+        zones_x=zones_x,
+        zones_y=zones_y,
+        fixtures_zone_distance={fixture: get_fixture_zone_distance(fixture) for fixture in kitchen.fixtures},
+        fixtures_target_distance={fixture: get_target_distance(fixture) for fixture in kitchen.fixtures},
+        zones_distance={zone.name: get_zone_distance(zone) for zone in kitchen.zones},
+        worktop=min(max_canvas_size, max([0] + [part.width for part in kitchen.parts])),
+    )
+
+
+def get_part_center_ranges(part: KitchenPart) -> tuple[tuple[float, float], tuple[float, float]]:
+    """x and y ranges of the centers of the segments (they lie on the axis of the part, see get_segments_x)"""
+    sin_alpha, cos_alpha = get_sin_cos(part.position.angle)
+    vertical = part.depth/2
+    start = (part.position.x - vertical * sin_alpha, part.position.y + vertical * cos_alpha)
+    end = (start[0] + part.width * cos_alpha, start[1] + part.width * sin_alpha)
+    return (min(start[0], end[0]), max(start[0], end[0])), (min(start[1], end[1]), max(start[1], end[1]))
+
+
+def get_part_offset_range(part: KitchenPart) -> tuple[float, float]:
+    """range of the offsets (relative to the group) of everything inside the part"""
+    return part.position.group_offset, part.position.group_offset + part.width
+
+
+def get_distance_bound(range1: tuple[float, float], range2: tuple[float, float]) -> float:
+    """upper bound of |a - b| for a in range1 and b in range2"""
+    return max(0, range1[1] - range2[0], range2[1] - range1[0])
+
+
+def get_indicator_m(low: float, high: float) -> float:
+    """smallest M for the indicator constraint 0 <= expression + M*binary <= M \n
+    (binary = 0 => 0 <= expression <= M; binary = 1 => -M <= expression <= 0), where expression is in [low, high]"""
+    return max(0, high, -low)
+
+
+def get_continuity_ms(part1: KitchenPart, part2: KitchenPart, tolerance: float) -> tuple[float, float]:
+    """big-M constants of the "begins before" and "ends after" clauses of vertical continuity \n
+    offset1 lies in part1, offset2 and offset2 + width2 lie in part2"""
+    low1, high1 = get_part_offset_range(part1)
+    low2, high2 = get_part_offset_range(part2)
+    return (get_indicator_m(low2 - high1 + tolerance, high2 - low1 + tolerance),
+            get_indicator_m(low1 - high2 + tolerance, high1 - low2 + tolerance))
+
+
+def get_interchangeable_fixtures(kitchen: Kitchen) -> list[list[Fixture]]:
+    """groups of fixtures which the model cannot tell apart (same attributes and the same placement rules apply to them) \n
+    tall and corner fixtures are linked to other fixtures, so they are never interchangeable, \n
+    the pooled fixtures have no segment numbers to sort (see Fixture.count)"""
+    classes = [[fixture for fixture in fixtures if fixture.count == 1] for fixtures in get_fixture_classes(kitchen)]
+    return [fixtures for fixtures in classes if len(fixtures) > 1]
+
+
+def get_fixture_classes(kitchen: Kitchen) -> list[list[Fixture]]:
+    """all classes of interchangeable fixtures (including single fixtures), tall and corner fixtures are left out, \n
+    a pooled fixture is in its class once for every cabinet"""
+    classes: dict[tuple[object, ...], list[Fixture]] = {}
+
+    for fixture in kitchen.fixtures:
+        if fixture.is_corner or fixture.complementary_fixture is not None:
+            continue
+
+        key = (fixture.type, fixture.zone, fixture.is_top, fixture.width_min, fixture.width_max, fixture.width_step, fixture.storage,
+               fixture.has_worktop, fixture.allow_edge, tuple(attr_matches(rule, fixture) for rule in kitchen.placement_rules))
+        classes.setdefault(key, []).extend([fixture] * fixture.count)
+
+    return list(classes.values())
@@ -9,6 +9,73 @@ class Args:
     solver: str | None
     model: str | None
     structure: bool
+    time_limit: float | None = None
+    gap: float | None = None
+    incumbents: str | None = None
+    solutions: int = 1
+    symmetry_breaking: bool = True
+    greedy_start: bool = False
+    engine: str = 'mip'
+    grid: float = 5
+    threads: int | None = None
+    cache: str | None = None
+    cache_size: float = 100
+    previous: str | None = None
+    fix_unchanged: str | None = None
+    profile: str | None = None
+    backend: str = 'pyomo'
+    svg: str | None = None
+    draw: bool = True
+    decompose: bool = False
+    polish: float | None = None
+    decompose_groups: bool = False
+    group_jobs: int | None = None
+    zone_clustering: str = 'center'
+
+
+@dataclass
+class BatchArgs:
+    source: str
+    output: str
+    solver: str | None
+    jobs: int | None = None
+    threads: int = 1
+    time_limit: float | None = None
+    gap: float | None = None
+    engine: str = 'mip'
+    summary: str | None = None
+    cache: str | None = None
+    cache_size: float = 100
+
+
+@dataclass
+class ServeArgs:
+    host: str
+    port: int
+    solver: str | None
+    workers: int = 1
+    threads: int | None = None
+    time_limit: float | None = None
+    cache: str | None = None
+    cache_size: float = 100
+
+
+@dataclass
+class BenchArgs:
+    sources: list[str]
+    solvers: list[str] | None = None
+    time_limit: float | None = 60
+    report: str = 'bench.json'
+    baseline: str | None = None
+    threshold: float = 0.2
+    zone_clusterings: list[str] | None = None
+    backends: list[str] | None = None
+
+
+@dataclass
+class CacheArgs:
+    cache: str
+    clear: bool = False
 
 
 def process() -> Args:
@@ -18,5 +85,119 @@ def process() -> Args:
     parser.add_argument("-s", "--solver")
     parser.add_argument("-m", "--model")
     parser.add_argument("--structure", action='store_true')
+    parser.add_argument("-t", "--time-limit", type=float, help="stop the solver after this many seconds")
+    parser.add_argument("-g", "--gap", type=float, help="stop the solver when the relative MIP gap is below this value")
+    parser.add_argument("--incumbents", help="stream every improved solution to this file (JSON lines, '-' for stdout)")
+    parser.add_argument("-k", "--solutions", type=int, default=1, help="find this many distinct designs")
+    parser.add_argument("--no-symmetry-breaking", dest='symmetry_breaking', action='store_false',
+                        help="do not order interchangeable fixtures (to measure the effect of symmetry breaking)")
+    parser.add_argument("--greedy-start", action='store_true',
+                        help="pass a greedily constructed layout to the solver as a MIP start")
+    parser.add_argument("-e", "--engine", choices=['mip', 'dp'], default='mip',
+                        help="dp solves kitchens with one bottom part by dynamic programming (other kitchens use the MIP)")
+    parser.add_argument("--grid", type=float, default=5, help="widths and padding found by the dp engine are multiples of this")
+    parser.add_argument("--threads", type=int, help="number of threads used by the solver (glpk always uses one)")
+    add_cache_arguments(parser)
+    parser.add_argument("--previous", help="start the solver from the design in this output file (e.g. before a small change of the input)")
+    parser.add_argument("--fix-unchanged", metavar='PREVIOUS_INPUT',
+                        help="the input of the previous design, the parts not affected by the changes keep their fixtures")
+    parser.add_argument("--profile", nargs='?', const='-', metavar='FILE',
+                        help="print the construction time and the size of every model component (or write them to a JSON file)")
+    parser.add_argument("--backend", choices=['pyomo', 'gurobipy'], default='pyomo',
+                        help="gurobipy passes the constraints to gurobi directly, without pyomo expressions (faster build, one design only)")
+    parser.add_argument("--decompose", action='store_true',
+                        help="solve the bottom parts first (without vertical continuity) and then the top parts with the bottom ones fixed")
+    parser.add_argument("--decompose-groups", action='store_true',
+                        help="solve the groups (joined by corners) separately in parallel processes and then polish the merged design")
+    parser.add_argument("--group-jobs", type=int, help="number of processes solving the groups (default: one per group, up to the cores)")
+    parser.add_argument("--polish", type=float, metavar='SECONDS',
+                        help="with --decompose, finally improve the design by solving the whole model for this many seconds, "
+                             "with --decompose-groups, the longest joint solve (the groups get the rest of the time limit, "
+                             "without --polish three quarters of it)")
+    parser.add_argument("--zone-clustering", choices=['center', 'adjacency', 'optimal_center'], default='center',
+                        help="how the fixtures of the optimized zones are kept together (zones can choose it by their clustering)")
+    parser.add_argument("--svg", help="write the drawing of the kitchen to this SVG file")
+    parser.add_argument("--no-draw", dest='draw', action='store_false', help="do not show the kitchen in a matplotlib window")
     args = parser.parse_args()
-    return Args(args.input, args.output, args.solver, args.model, args.structure)
+
+    if args.fix_unchanged is not None and args.previous is None:
+        parser.error("--fix-unchanged requires --previous")
+
+    if args.polish is not None and not args.decompose and not args.decompose_groups:
+        parser.error("--polish requires --decompose or --decompose-groups")
+
+    return Args(args.input, args.output, args.solver, args.model, args.structure,
+                time_limit=args.time_limit, gap=args.gap, incumbents=args.incumbents, solutions=args.solutions,
+                symmetry_breaking=args.symmetry_breaking, greedy_start=args.greedy_start,
+                engine=args.engine, grid=args.grid, threads=args.threads, cache=args.cache, cache_size=args.cache_size,
+                previous=args.previous, fix_unchanged=args.fix_unchanged, profile=args.profile, backend=args.backend,
+                svg=args.svg, draw=args.draw, decompose=args.decompose, polish=args.polish,
+                decompose_groups=args.decompose_groups, group_jobs=args.group_jobs, zone_clustering=args.zone_clustering)
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--cache", help="reuse the results of kitchens already solved with the same settings (SQLite file)")
+    parser.add_argument("--cache-size", type=float, default=100, help="the cache keeps at most this many MB of results")
+
+
+def process_batch(argv: list[str]) -> BatchArgs:
+    """arguments of the batch command (argv without the command name)"""
+    parser = argparse.ArgumentParser(prog='batch', description="solve many kitchens in parallel")
+    parser.add_argument('source', help="directory with the input JSON files or a manifest (one input path per line)")
+    parser.add_argument('output', help="directory for the outputs, the logs and the summary")
+    parser.add_argument("-s", "--solver")
+    parser.add_argument("-j", "--jobs", type=int, help="number of kitchens solved at once (default: cores / threads)")
+    parser.add_argument("--threads", type=int, default=1, help="number of solver threads of every job")
+    parser.add_argument("-t", "--time-limit", type=float, help="stop the solver of every job after this many seconds")
+    parser.add_argument("-g", "--gap", type=float, help="stop the solver when the relative MIP gap is below this value")
+    parser.add_argument("-e", "--engine", choices=['mip', 'dp'], default='mip')
+    parser.add_argument("--summary", help="summary table file (default: summary.csv in the output directory)")
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+    return BatchArgs(args.source, args.output, args.solver, jobs=args.jobs, threads=args.threads,
+                     time_limit=args.time_limit, gap=args.gap, engine=args.engine, summary=args.summary,
+                     cache=args.cache, cache_size=args.cache_size)
+
+
+def process_serve(argv: list[str]) -> ServeArgs:
+    """arguments of the serve command (argv without the command name)"""
+    parser = argparse.ArgumentParser(prog='serve', description="solve kitchens sent over HTTP by a pool of warm workers")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-s", "--solver")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes (kitchens solved at once)")
+    parser.add_argument("--threads", type=int, help="number of solver threads of every worker")
+    parser.add_argument("-t", "--time-limit", type=float, help="time limit of the requests without a deadline")
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+    return ServeArgs(args.host, args.port, args.solver, workers=args.workers, threads=args.threads, time_limit=args.time_limit,
+                     cache=args.cache, cache_size=args.cache_size)
+
+
+def process_bench(argv: list[str]) -> BenchArgs:
+    """arguments of the bench command (argv without the command name)"""
+    parser = argparse.ArgumentParser(prog='bench', description="measure the model and the solvers on a set of kitchens")
+    parser.add_argument('sources', nargs='*', help="input files, directories or manifests (default: data_input)")
+    parser.add_argument("-s", "--solver", dest='solvers', action='append', help="benchmark this solver (default: all available)")
+    parser.add_argument("-t", "--time-limit", type=float, default=60, help="time limit of every run in seconds")
+    parser.add_argument("--report", default='bench.json', help="JSON report (a CSV table is written next to it)")
+    parser.add_argument("--baseline", help="report of an earlier benchmark to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative increase of the times, the memory or the gap which is reported as a regression")
+    parser.add_argument("--zone-clustering", dest='zone_clusterings', action='append', choices=['center', 'adjacency', 'optimal_center'],
+                        help="benchmark this zone clustering (default: center), the time saved against the first one is reported")
+    parser.add_argument("--backend", dest='backends', action='append', choices=['pyomo', 'gurobipy'],
+                        help="benchmark this backend (default: pyomo, gurobipy runs with gurobi only), "
+                             "the time saved against the first one is reported")
+    args = parser.parse_args(argv)
+    return BenchArgs(args.sources, solvers=args.solvers, time_limit=args.time_limit, report=args.report,
+                     baseline=args.baseline, threshold=args.threshold, zone_clusterings=args.zone_clusterings, backends=args.backends)
+
+
+def process_cache(argv: list[str]) -> CacheArgs:
+    """arguments of the cache command (argv without the command name)"""
+    parser = argparse.ArgumentParser(prog='cache', description="show the statistics of the result cache")
+    parser.add_argument('cache', help="the cache file")
+    parser.add_argument("--clear", action='store_true', help="remove all the results and reset the statistics")
+    args = parser.parse_args(argv)
+    return CacheArgs(args.cache, clear=args.clear)
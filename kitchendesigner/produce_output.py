@@ -1,15 +1,45 @@
-from kitchen import Kitchen
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+from dataclasses import dataclass
+from kitchen import Fixture, Kitchen
+from xml.sax.saxutils import escape, quoteattr
 import math
 import json
+import sys
 from typing import Any
 
+DEFAULT_COLOR = '#555555'
+# margin around the SVG drawing relative to its size
+SVG_MARGIN = 0.05
 
-def draw(kitchen: Kitchen) -> None:
-    font_size = 10
-    fig, ax = plt.subplots()
+
+@dataclass
+class Rectangle:
+    """rectangle rotated by angle (in degrees) around rotation_point, the colors are #rrggbbaa or None (not drawn)"""
+    x: float
+    y: float
+    width: float
+    height: float
+    angle: float
+    rotation_point: tuple[float, float]
+    fill: str | None
+    edge: str
+    hatch: bool = False
+
+
+@dataclass
+class Label:
+    x: float
+    y: float
+    text: str
+    color: str
+
+
+def get_shapes(kitchen: Kitchen) -> tuple[list[Rectangle], list[Label]]:
+    """the drawing of the kitchen (shared by draw and write_svg): outlines of the parts, top parts also at their real position, \n
+    segments in the colors of the zones of their fixtures, labels with the segment numbers and fixtures"""
     eps = 0.2
+    zone_colors = {zone.name: zone.color for zone in kitchen.zones if zone.color}
+    rectangles: list[Rectangle] = []
+    labels: list[Label] = []
 
     for part in kitchen.parts:
         x = part.position.x
@@ -17,36 +47,44 @@ def draw(kitchen: Kitchen) -> None:
         angle = part.position.angle
 
         if part.is_top:
-            rectangle_real = patches.Rectangle((x, y), part.width, part.depth, angle=angle,
-                                               rotation_point=(x, y), fill=False, ec='#00000019', hatch='//')
-            ax.add_patch(rectangle_real)
+            rectangles.append(Rectangle(x, y, part.width, part.depth, angle, (x, y), None, '#00000019', hatch=True))
             x, y = rotate_point_deg((x, y + part.depth * 1.5), (x, y), angle)
 
         rx = x
         ry = y
 
-        rectangle = patches.Rectangle((x-eps, y-eps), part.width+2*eps, part.depth + 2*eps,
-                                      angle=angle, rotation_point=(rx, ry), fill=False, ec='red')
-        ax.add_patch(rectangle)
+        rectangles.append(Rectangle(x-eps, y-eps, part.width+2*eps, part.depth + 2*eps, angle, (rx, ry), None, '#ff0000ff'))
 
         x += part.position.padding
 
         for segment in part.segments:
-            color = '#555555'
+            color = DEFAULT_COLOR if segment.fixture is None else zone_colors.get(segment.fixture.zone, DEFAULT_COLOR)
+            rectangles.append(Rectangle(x, y, segment.width, part.depth, angle, (rx, ry), color+'33', color+'77'))
+            lx, ly = rotate_point_deg((x+segment.width/2, y+part.depth/2), (rx, ry), angle)
+            labels.append(Label(lx, ly, f"{segment.number}. {segment.fixture}", color))
+            x += segment.width
 
-            if segment.fixture is not None:
-                zone_obj = next(z for z in kitchen.zones if z.name == segment.fixture.zone)
+    return rectangles, labels
 
-                if zone_obj.color:
-                    color = zone_obj.color
 
-            rectangle = patches.Rectangle((x, y), segment.width, part.depth, angle=angle,
-                                          rotation_point=(rx, ry), fc=color+'33', ec=color+'77')
-            ax.add_patch(rectangle)
-            lx, ly = rotate_point_deg((x+segment.width/2, y+part.depth/2), (rx, ry), angle)
-            ax.text(lx, ly, f"{segment.number}. {segment.fixture}", color=color, fontsize=font_size,
-                    verticalalignment='center', horizontalalignment='center')
-            x += segment.width
+def draw(kitchen: Kitchen) -> None:
+    """shows the kitchen in a matplotlib window (blocks until it is closed)"""
+    # matplotlib is slow to import and needs a display, so it is imported only when drawing
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+
+    font_size = 10
+    fig, ax = plt.subplots()
+    rectangles, labels = get_shapes(kitchen)
+
+    for rectangle in rectangles:
+        ax.add_patch(patches.Rectangle((rectangle.x, rectangle.y), rectangle.width, rectangle.height, angle=rectangle.angle,
+                                       rotation_point=rectangle.rotation_point, fill=rectangle.fill is not None,
+                                       fc=rectangle.fill, ec=rectangle.edge, hatch='//' if rectangle.hatch else None))
+
+    for label in labels:
+        ax.text(label.x, label.y, label.text, color=label.color, fontsize=font_size,
+                verticalalignment='center', horizontalalignment='center')
 
     # ax.invert_yaxis()
     # ax.set_axis_off()
@@ -54,6 +92,58 @@ def draw(kitchen: Kitchen) -> None:
     plt.show()
 
 
+def write_svg(kitchen: Kitchen, file_name: str) -> None:
+    """writes the drawing of draw to an SVG file (without matplotlib), the y axis points up as in draw"""
+    rectangles, labels = get_shapes(kitchen)
+    points = [rotate_point_deg(corner, rectangle.rotation_point, rectangle.angle) for rectangle in rectangles
+              for corner in [(rectangle.x, rectangle.y), (rectangle.x + rectangle.width, rectangle.y),
+                             (rectangle.x, rectangle.y + rectangle.height), (rectangle.x + rectangle.width, rectangle.y + rectangle.height)]]
+    points += [(label.x, label.y) for label in labels]
+
+    if len(points) == 0:
+        points = [(0, 0)]
+
+    min_x, max_x = min(x for x, _ in points), max(x for x, _ in points)
+    min_y, max_y = min(y for _, y in points), max(y for _, y in points)
+    margin = SVG_MARGIN * max(max_x - min_x, max_y - min_y, 1)
+    font_size = min([part.depth for part in kitchen.parts], default=10) / 8
+
+    # the shapes are drawn with the y axis flipped, the labels are placed at -y so that they are not mirrored
+    lines = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="{min_x - margin:g} {-max_y - margin:g} '
+             f'{max_x - min_x + 2 * margin:g} {max_y - min_y + 2 * margin:g}">',
+             '<defs><pattern id="hatch" width="4" height="4" patternUnits="userSpaceOnUse">'
+             '<path d="M0,0 L4,4" stroke="#000000" stroke-opacity="0.1" stroke-width="0.5"/></pattern></defs>',
+             '<g transform="scale(1,-1)">']
+
+    for rectangle in rectangles:
+        rx, ry = rectangle.rotation_point
+        fill = 'url(#hatch)' if rectangle.hatch else get_svg_paint(rectangle.fill, 'fill')
+        lines.append(f'<rect x="{rectangle.x:g}" y="{rectangle.y:g}" width="{rectangle.width:g}" height="{rectangle.height:g}" '
+                     f'transform="rotate({rectangle.angle:g} {rx:g} {ry:g})" {fill} {get_svg_paint(rectangle.edge, "stroke")} '
+                     f'vector-effect="non-scaling-stroke"/>')
+
+    lines.append('</g>')
+
+    for label in labels:
+        lines.append(f'<text x="{label.x:g}" y="{-label.y:g}" font-size="{font_size:g}" text-anchor="middle" '
+                     f'dominant-baseline="central" fill={quoteattr(label.color)}>{escape(label.text)}</text>')
+
+    lines.append('</svg>')
+
+    with open(file_name, 'w') as svg_file:
+        svg_file.write('\n'.join(lines) + '\n')
+
+
+def get_svg_paint(color: str | None, name: str) -> str:
+    """fill or stroke attributes of the #rrggbbaa color (SVG 1.1 does not support the alpha in the color)"""
+    if color is None:
+        return f'{name}="none"'
+    elif len(color) == 9 and color.startswith('#'):
+        return f'{name}={quoteattr(color[:7])} {name}-opacity="{int(color[7:], 16) / 255:.3g}"'
+    else:
+        return f'{name}={quoteattr(color)}'
+
+
 def rotate_point_deg(point: tuple[float, float], around: tuple[float, float], angle: float) -> tuple[float, float]:
     angle1 = math.radians(angle)
     px, py = point
@@ -63,8 +153,11 @@ def rotate_point_deg(point: tuple[float, float], around: tuple[float, float], an
     return qx, qy
 
 
-def write(kitchen: Kitchen, file_name: str) -> None:
+def get_output(kitchen: Kitchen) -> dict[str, dict[str, Any]]:
+    """the design in the output format, the cabinets of a pooled fixture (see Fixture.count) are numbered like the copies \n
+    of the other multiple fixtures (the first one keeps the name, then _1, _2, ...)"""
     output: dict[str, dict[str, Any]] = {}
+    cabinet_numbers: dict[Fixture, int] = {}
 
     for part in kitchen.parts:
         output[part.name] = {}
@@ -73,7 +166,38 @@ def write(kitchen: Kitchen, file_name: str) -> None:
 
         for segment in part.segments:
             if segment.fixture is not None:
-                output[part.name]['fixtures'].append({'fixture': segment.fixture.name, 'width': segment.width})
+                number = cabinet_numbers.get(segment.fixture, 0)
+                cabinet_numbers[segment.fixture] = number + 1
+                name = segment.fixture.name + (f'_{number}' if number > 0 else '')
+                output[part.name]['fixtures'].append({'fixture': name, 'width': segment.width})
+
+    return output
 
+
+def write(kitchen: Kitchen, file_name: str) -> None:
+    with open(file_name, 'w') as output_file:
+        json.dump(get_output(kitchen), output_file, indent=4)
+
+
+def write_designs(designs: list[dict[str, dict[str, Any]]], file_name: str) -> None:
     with open(file_name, 'w') as output_file:
-        json.dump(output, output_file, indent=4)
+        json.dump(designs, output_file, indent=4)
+
+
+def clear_stream(destination: str) -> None:
+    if destination != '-':
+        open(destination, 'w').close()
+
+
+def stream(kitchen: Kitchen, destination: str) -> None:
+    """appends the current solution as one JSON line (destination '-' means stdout, \n
+    the original one, the log is redirected to stderr meanwhile, see __main__.main)"""
+    line = json.dumps(get_output(kitchen)) + '\n'
+
+    if destination == '-':
+        stdout = sys.__stdout__ or sys.stdout
+        stdout.write(line)
+        stdout.flush()
+    else:
+        with open(destination, 'a') as output_file:
+            output_file.write(line)
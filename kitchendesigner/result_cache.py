@@ -0,0 +1,102 @@
+from process_args import CacheArgs
+from typing import Any
+import hashlib
+import json
+import math
+import sqlite3
+import time
+
+# other processes (batch jobs, service workers) may be writing to the cache at the same time
+LOCK_TIMEOUT = 30
+
+
+class ResultCache:
+    """solved designs stored in an SQLite database, the least recently used results are evicted above max_size bytes"""
+
+    def __init__(self, file_name: str, max_size: float) -> None:
+        self.max_size = max_size
+        self.connection = sqlite3.connect(file_name, timeout=LOCK_TIMEOUT, isolation_level=None)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                '(key TEXT PRIMARY KEY, result TEXT, size INTEGER, created REAL, last_used REAL, hits INTEGER)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS statistics (name TEXT PRIMARY KEY, value INTEGER)')
+
+    def __enter__(self) -> 'ResultCache':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.connection.close()
+
+    def get(self, key: str) -> Any:
+        """the stored result (None on a miss), a hit makes the result the most recently used one"""
+        row = self.connection.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+
+        if row is None:
+            self.count('misses')
+            return None
+
+        self.connection.execute('UPDATE results SET last_used = ?, hits = hits + 1 WHERE key = ?', (time.time(), key))
+        self.count('hits')
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Any) -> None:
+        content = json.dumps(result)
+        now = time.time()
+
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, 0)', (key, content, len(content), now, now))
+            self.evict()
+
+    def evict(self) -> None:
+        """removes the least recently used results until the cache fits in max_size"""
+        size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+        for key, result_size in self.connection.execute('SELECT key, size FROM results ORDER BY last_used').fetchall():
+            if size <= self.max_size:
+                break
+
+            self.connection.execute('DELETE FROM results WHERE key = ?', (key,))
+            self.count('evictions')
+            size -= result_size
+
+    def count(self, name: str) -> None:
+        self.connection.execute('INSERT INTO statistics VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1', (name,))
+
+    def get_statistics(self) -> dict[str, Any]:
+        results, size, hits = self.connection.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM results').fetchone()
+        counters = dict(self.connection.execute('SELECT name, value FROM statistics').fetchall())
+        return {'results': results, 'size': size, 'hits of stored results': hits,
+                'hits': counters.get('hits', 0), 'misses': counters.get('misses', 0), 'evictions': counters.get('evictions', 0)}
+
+    def clear(self) -> None:
+        self.connection.execute('DELETE FROM results')
+        self.connection.execute('DELETE FROM statistics')
+
+
+def show(args: CacheArgs) -> None:
+    """prints the statistics of the cache (the cache command), the sizes are in bytes"""
+    with ResultCache(args.cache, math.inf) as cache:
+        if args.clear:
+            cache.clear()
+
+        for name, value in cache.get_statistics().items():
+            print(f'{name}: {value}')
+
+
+def get_key(document: Any, settings: dict[str, Any]) -> str:
+    """hash of the input document and the settings which change the result (solver, its options, model version) \n
+    the order of the fields does not matter and integers are equal to the same floats (e.g. 60 and 60.0)"""
+    canonical = json.dumps({'input': normalize(document), 'settings': normalize(settings)}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(key): normalize(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    elif isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    else:
+        return value
@@ -0,0 +1,298 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from multiprocessing.connection import Connection
+from process_args import Args, ServeArgs
+from typing import Any
+import asyncio
+import itertools
+import json
+import multiprocessing
+import time
+import find_solution
+import load_input
+
+# the solver stops at the deadline, a worker which does not answer this many seconds later is replaced
+DEADLINE_GRACE = 5
+MAX_BODY_SIZE = 10_000_000
+
+
+class RequestError(Exception):
+    """error reported to the client with the HTTP status"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass(order=True)
+class Job:
+    """queued request, jobs with higher priority (and then older jobs) are solved first"""
+    key: tuple[float, int]
+    id: str = field(compare=False)
+    document: Any = field(compare=False)
+    args: Args = field(compare=False)
+    deadline: float | None = field(compare=False)
+    result: 'asyncio.Future[tuple[Any, dict[str, str]]]' = field(compare=False)
+    cancelled: asyncio.Event = field(compare=False, default_factory=asyncio.Event)
+    running: bool = field(compare=False, default=False)
+
+
+class Worker:
+    """process with load_input and find_solution imported and the input schema compiled, it solves one kitchen at a time"""
+
+    def __init__(self) -> None:
+        self.connection, worker_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=run_worker, args=(worker_connection,), daemon=True)
+        self.process.start()
+        worker_connection.close()
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+
+def run_worker(connection: Connection) -> None:
+    load_input.get_validator()
+
+    while True:
+        try:
+            document, args = connection.recv()
+        except EOFError:
+            return
+
+        connection.send(solve_document(document, args))
+
+
+def solve_document(document: Any, args: Args) -> tuple[int, Any, dict[str, str]]:
+    """solves the input document, returns the HTTP status, the body (in the output format) and the headers"""
+    report = find_solution.SolveReport()
+
+    try:
+        load_input.validate(document)
+        kitchen = load_input.load_document(document)
+    except Exception as error:
+        return HTTPStatus.UNPROCESSABLE_ENTITY, {'error': str(error).splitlines()[0]}, {}
+
+    try:
+        designs = find_solution.solve(kitchen, args, report)
+    except find_solution.NoSolutionError as error:
+        return HTTPStatus.UNPROCESSABLE_ENTITY, {'error': str(error)}, {'X-Status': report.status}
+    except Exception as error:
+        return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(error).splitlines()[0]}, {}
+
+    headers = {'X-Status': report.status, 'X-Build-Seconds': f'{report.build_seconds:.3f}',
+               'X-Solve-Seconds': f'{report.solve_seconds:.3f}'}
+
+    if report.objective is not None:
+        headers['X-Objective'] = str(report.objective)
+    if report.gap is not None:
+        headers['X-Gap'] = str(report.gap)
+
+    return HTTPStatus.OK, designs if args.solutions > 1 else designs[0], headers
+
+
+class KitchenService:
+    """HTTP server which queues the requests and dispatches them to the workers \n
+    POST /solve {"input": <input document>, "id", "priority", "deadline" (seconds), "engine", "grid", "solutions", "gap"} returns the output, \n
+    DELETE /solve/<id> cancels the request, GET /status returns the numbers of workers, busy workers and queued requests"""
+
+    def __init__(self, args: ServeArgs) -> None:
+        self.args = args
+        self.queue: asyncio.PriorityQueue[Job] = asyncio.PriorityQueue()
+        self.jobs: dict[str, Job] = {}
+        self.workers = [Worker() for _ in range(args.workers)]
+        self.busy = 0
+        self.sequence = itertools.count()
+        # every worker has one thread waiting for its answer
+        self.executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    async def run(self) -> None:
+        dispatchers = [asyncio.create_task(self.dispatch(index)) for index in range(len(self.workers))]
+        server = await asyncio.start_server(self.handle_connection, self.args.host, self.args.port)
+        print(f'serving on http://{self.args.host}:{self.args.port} with {len(self.workers)} workers')
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+
+            for worker in self.workers:
+                worker.close()
+
+            self.executor.shutdown(wait=False)
+
+    async def dispatch(self, index: int) -> None:
+        """passes the queued jobs to the worker with the index, the worker is replaced if its job is cancelled or late"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            job = await self.queue.get()
+
+            if job.result.done():
+                # cancelled while queued
+                continue
+
+            remaining = job.deadline - time.monotonic() if job.deadline is not None else None
+
+            if remaining is not None and remaining <= 0:
+                self.finish(job, RequestError(HTTPStatus.GATEWAY_TIMEOUT, 'the deadline passed while the request was queued'))
+                continue
+
+            job.args.time_limit = remaining if remaining is not None else self.args.time_limit
+            job.running = True
+            worker = self.workers[index]
+            self.busy += 1
+
+            try:
+                worker.connection.send((job.document, job.args))
+            except ConnectionError:
+                # the worker died while it was idle
+                self.replace_worker(index)
+                self.finish(job, RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, 'the worker failed'))
+                self.busy -= 1
+                continue
+
+            receive = loop.run_in_executor(self.executor, worker.connection.recv)
+            cancel = asyncio.ensure_future(job.cancelled.wait())
+            done, _ = await asyncio.wait([receive, cancel], return_when=asyncio.FIRST_COMPLETED,
+                                         timeout=remaining + DEADLINE_GRACE if remaining is not None else None)
+            cancel.cancel()
+
+            if receive in done and receive.exception() is None:
+                status, body, headers = receive.result()
+                headers['X-Request-Id'] = job.id
+                self.finish(job, (body, headers) if status == HTTPStatus.OK else RequestError(status, body['error']))
+            else:
+                # the solver cannot be interrupted, the worker is terminated (so its pipe is closed) and a new one is started
+                worker.process.terminate()
+                await asyncio.wait([receive])
+                self.replace_worker(index)
+
+                if receive in done:
+                    self.finish(job, RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, 'the worker failed'))
+                else:
+                    self.finish(job, RequestError(HTTPStatus.GATEWAY_TIMEOUT, 'the solver did not stop at the deadline'))
+
+            self.busy -= 1
+
+    def replace_worker(self, index: int) -> None:
+        self.workers[index].close()
+        self.workers[index] = Worker()
+
+    def finish(self, job: Job, result: tuple[Any, dict[str, str]] | RequestError) -> None:
+        self.jobs.pop(job.id, None)
+
+        if job.result.done():
+            return
+        elif isinstance(result, RequestError):
+            job.result.set_exception(result)
+        else:
+            job.result.set_result(result)
+
+    async def submit(self, body: bytes) -> tuple[Any, dict[str, str]]:
+        try:
+            request = json.loads(body)
+        except ValueError as error:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f'invalid JSON: {error}')
+
+        if not isinstance(request, dict) or 'input' not in request:
+            raise RequestError(HTTPStatus.BAD_REQUEST, 'the request has to be an object with the input document in "input"')
+
+        sequence = next(self.sequence)
+        job_id = str(request.get('id', f'request-{sequence}'))
+
+        if job_id in self.jobs:
+            raise RequestError(HTTPStatus.CONFLICT, f'request {job_id} is already being solved')
+
+        if request.get('engine', 'mip') not in ['mip', 'dp']:
+            raise RequestError(HTTPStatus.BAD_REQUEST, 'the engine has to be mip or dp')
+
+        try:
+            deadline = time.monotonic() + float(request['deadline']) if 'deadline' in request else None
+            args = Args('', '', self.args.solver, None, False, gap=request.get('gap'), solutions=int(request.get('solutions', 1)),
+                        engine=request.get('engine', 'mip'), grid=float(request.get('grid', 5)), threads=self.args.threads,
+                        cache=self.args.cache, cache_size=self.args.cache_size)
+            job = Job((-float(request.get('priority', 0)), sequence), job_id, request['input'], args, deadline,
+                      asyncio.get_running_loop().create_future())
+        except (TypeError, ValueError) as error:
+            raise RequestError(HTTPStatus.BAD_REQUEST, f'invalid request: {error}')
+
+        self.jobs[job_id] = job
+        self.queue.put_nowait(job)
+        return await job.result
+
+    def cancel(self, job_id: str) -> tuple[Any, dict[str, str]]:
+        if job_id not in self.jobs:
+            raise RequestError(HTTPStatus.NOT_FOUND, f'request {job_id} is not queued or being solved')
+
+        job = self.jobs[job_id]
+        job.cancelled.set()
+        self.finish(job, RequestError(HTTPStatus.CONFLICT, f'request {job_id} was cancelled'))
+        return {'cancelled': job_id}, {}
+
+    def get_status(self) -> tuple[Any, dict[str, str]]:
+        return {'workers': len(self.workers), 'busy': self.busy, 'queued': sum(not job.running for job in self.jobs.values())}, {}
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[Any, dict[str, str]]:
+        if method == 'POST' and path == '/solve':
+            return await self.submit(body)
+        elif method == 'DELETE' and path.startswith('/solve/'):
+            return self.cancel(path.removeprefix('/solve/'))
+        elif method == 'GET' and path == '/status':
+            return self.get_status()
+        else:
+            raise RequestError(HTTPStatus.NOT_FOUND, f'unknown endpoint {method} {path}')
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """one request per connection (the response is sent with Connection: close)"""
+        try:
+            method, path, body = await read_request(reader)
+            response, headers = await self.route(method, path, body)
+            status = HTTPStatus.OK
+        except RequestError as error:
+            status, response, headers = HTTPStatus(error.status), {'error': str(error)}, {}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+
+        content = json.dumps(response).encode()
+        head = [f'HTTP/1.1 {status.value} {status.phrase}', 'Content-Type: application/json',
+                f'Content-Length: {len(content)}', 'Connection: close'] + [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + content)
+
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+    """reads the method, the path and the body of an HTTP request"""
+    request_line = (await reader.readuntil(b'\r\n')).decode('latin-1').split()
+
+    if len(request_line) != 3:
+        raise RequestError(HTTPStatus.BAD_REQUEST, 'invalid request line')
+
+    content_length = 0
+
+    while (line := (await reader.readuntil(b'\r\n')).decode('latin-1').strip()) != '':
+        name, _, value = line.partition(':')
+
+        if name.strip().lower() == 'content-length':
+            content_length = int(value) if value.strip().isdigit() else -1
+
+    if content_length < 0 or content_length > MAX_BODY_SIZE:
+        raise RequestError(HTTPStatus.BAD_REQUEST, 'invalid content length')
+
+    return request_line[0], request_line[1], await reader.readexactly(content_length)
+
+
+def serve(args: ServeArgs) -> None:
+    async def run() -> None:
+        await KitchenService(args).run()
+
+    asyncio.run(run())
@@ -0,0 +1,78 @@
+from kitchen import Kitchen
+from process_args import Args
+from typing import Any
+import dataclasses
+import find_solution
+import heuristic
+import produce_output
+import pyomo.environ as pyo
+
+
+class KitchenSession:
+    """keeps the model of one kitchen (and the solver instance, if it is persistent) between solves \n
+    the preferences can be changed and the model re-solved without rebuilding it, re-solves are warm-started \n
+    the first solve starts from args.previous or the greedy layout (args.greedy_start) as in find_solution.solve, \n
+    kitchens with objective tiers are solved tier by tier (see find_solution.find_model_hierarchical, without the persistent solver) \n
+    usage (e.g. by a design tool re-solving after every change of the preferences): \n
+        session = KitchenSession(load_input.load('kitchen.json'), args) \n
+        design = session.resolve() \n
+        session.update_preferences(storage=2) \n
+        design = session.resolve()"""
+
+    def __init__(self, kitchen: Kitchen, args: Args) -> None:
+        self.kitchen = kitchen
+        self.args = args
+        self.model = find_solution.build_model(kitchen, args)
+        self.solver = find_solution.get_solver_name(args)
+        self.options = find_solution.get_solver_options(self.solver, args)
+        self.is_persistent = self.solver == 'gurobi_direct'
+
+        # the values of the variables are a MIP start (a start given by args or the previous solution)
+        self.has_start = find_solution.wants_warmstart(args)
+
+        if args.previous is not None:
+            find_solution.set_previous(kitchen, self.model, args)
+        elif args.greedy_start:
+            heuristic.build_layout(kitchen, list(self.model.fixture_order_pairs))
+            find_solution.set_start(kitchen, self.model)
+            # the layout is completed to a MIP start, it is not used if it is not feasible
+            self.has_start = find_solution.complete_start(kitchen, self.model, args, 'greedy layout', keep_partial=False).greedy_start
+
+        # the persistent solver reads the variables fixed by set_previous when the instance is set
+        if self.is_persistent:
+            self.opt = pyo.SolverFactory('gurobi_persistent')
+            self.opt.set_instance(self.model)
+        else:
+            self.opt = pyo.SolverFactory(self.solver)
+
+    def update_preferences(self, storage: float | None = None, worktop: float | None = None) -> None:
+        if storage is not None:
+            self.kitchen.preferences.storage = storage
+            self.model.param_storage.set_value(storage)
+
+        if worktop is not None:
+            self.kitchen.preferences.worktop = worktop
+            self.model.param_worktop.set_value(worktop)
+
+        if self.is_persistent:
+            # the persistent solver holds the objective with the old parameter values
+            self.opt.set_objective(self.model.fitness)
+
+    def resolve(self) -> dict[str, Any]:
+        """solves the model (starting from the previous solution) and returns the design in the output format"""
+        if len(self.kitchen.preferences.tiers) > 0:
+            # the tiers change the objective of the model, which the persistent solver would not see
+            results = find_solution.find_model_hierarchical(self.kitchen, self.model,
+                                                            dataclasses.replace(self.args, greedy_start=self.has_start, previous=None))
+        elif self.is_persistent:
+            results = self.opt.solve(tee=True, options=self.options, warmstart=self.has_start)
+        else:
+            results = self.opt.solve(self.model, tee=True, options=self.options,
+                                     warmstart=self.has_start and self.opt.warm_start_capable())
+
+        if not find_solution.has_solution(results):
+            raise Exception('no solution found')
+
+        self.has_start = True
+        find_solution.save_result(self.kitchen, self.model)
+        return produce_output.get_output(self.kitchen)
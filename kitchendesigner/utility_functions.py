@@ -1,6 +1,65 @@
 from kitchen import *
 from typing import Any
+import math
+
+SIN_COS_DECIMAL_PLACES = 5
+# widths closer to a multiple of the width step are taken as the multiple
+WIDTH_STEP_EPSILON = 1e-6
+# the width grid (see get_width_grid) is computed in these fractions of the width unit
+WIDTH_GRID_SCALE = 1000
 
 def attr_matches(rule: PlacementRule, fixture: Fixture) -> Any:
     """check if the fixture is affected by the rule"""
     return getattr(fixture, rule.attribute_name) == rule.attribute_value
+
+
+def fixture_fits_part(fixture: Fixture, part: KitchenPart, rules: list[PlacementRule], corners: list[Corner]) -> bool:
+    """check if the fixture can ever be placed in the kitchen part (level, group exclude rules, corners)"""
+    if fixture.is_top != part.is_top:
+        return False
+
+    if fixture.is_corner and not any(part is corner.part1 or part is corner.part2 for corner in corners):
+        return False
+
+    for rule in rules:
+        if (rule.type == 'exclude' and rule.area == 'group' and rule.group == part.position.group_number
+                and attr_matches(rule, fixture)):
+            return False
+
+    return True
+
+
+def fixture_fits_segment(fixture: Fixture, segment: Segment, rules: list[PlacementRule], corners: list[Corner]) -> bool:
+    """check if the fixture can ever be placed in the segment (see fixture_fits_part, edges)"""
+    part = segment.part
+
+    if not fixture.allow_edge and ((segment.is_first and part.edge_left) or (segment.is_last and part.edge_right)):
+        return False
+
+    return fixture_fits_part(fixture, part, rules, corners)
+
+
+def get_sin_cos(angle: float) -> tuple[float, float]:
+    """sine and cosine of the angle (in degrees), rounded so that the right angles are exact"""
+    sin_alpha = round(math.sin(math.radians(angle)), SIN_COS_DECIMAL_PLACES)
+    cos_alpha = round(math.cos(math.radians(angle)), SIN_COS_DECIMAL_PLACES)
+    return sin_alpha, cos_alpha
+
+
+def round_width(fixture: Fixture, width: float, up: bool = False) -> float:
+    """the width rounded down (or up) to a multiple of the width step of the fixture (unchanged if it has no step)"""
+    if fixture.width_step <= 0:
+        return width
+
+    steps = width / fixture.width_step
+    return (math.ceil(steps - WIDTH_STEP_EPSILON) if up else math.floor(steps + WIDTH_STEP_EPSILON)) * fixture.width_step
+
+
+def get_width_grid(fixtures: list[Fixture]) -> float | None:
+    """the widths of all the fixtures are multiples of this (the greatest common divisor of their width steps), \n
+    None if some fixture has no width step"""
+    if len(fixtures) == 0 or any(fixture.width_step <= 0 for fixture in fixtures):
+        return None
+
+    grid = math.gcd(*(round(fixture.width_step * WIDTH_GRID_SCALE) for fixture in fixtures))
+    return grid / WIDTH_GRID_SCALE if grid > 0 else None